@@ -5,7 +5,7 @@ viewGui
 
 Created by Bohdon Sayre on 2010-01-01.
 Copyright (c) 2012 Bohdon Sayre. All rights reserved.
-    
+
 The View GUI provides a way to easily create
 a window in maya based on using pages or 'views.'
 
@@ -16,25 +16,76 @@ by using the showView method. This method can be accessed
 through direct access to the Gui, but is also available
 to all viewGui.View subclasses.
 
+The gui, utils and view modules are imported the first time
+any of their contents are accessed through the package, so
+importing viewGui by itself does not import pymel.
+
 >>> import viewGui
->>> 
+>>>
 >>> class MyView(viewGui.View):
 >>>     def buildBody(self):
 >>>         self.viewItem(view='MyView')
 >>>         self.viewItem(view='MyView2')
 >>>         self.viewItem(view='MyView3')
->>> 
+>>>
 >>> gui = viewGui.Gui(viewClasses = [MyView, MyView, MyView])
 >>> gui.create()
 """
 
+import importlib
 import os
-import gui
-import utils
-import view
-from gui import *
-from utils import *
-from view import *
+import sys
+import types
 
 __version__ = '0.5.6'
-gui.VERSION = __version__
\ No newline at end of file
+
+# modules whose contents are exposed by the package, in star import order
+_MODULES = ('gui', 'utils', 'view')
+
+
+class _LazyPackage(types.ModuleType):
+    """
+    Replaces this package in sys.modules to import the submodules
+    and expose their contents the first time they are accessed.
+    """
+
+    def __init__(self, module):
+        super(_LazyPackage, self).__init__(module.__name__, module.__doc__)
+        self.__dict__.update(module.__dict__)
+        # keep the original module alive so its globals are not cleared
+        self.__dict__['_module'] = module
+        self.__dict__['_loaded'] = False
+        self.__dict__['_loading'] = False
+
+    def __getattr__(self, name):
+        if name == '__all__':
+            self._load()
+            return [k for k in self.__dict__ if not k.startswith('_')]
+        if name.startswith('__') or self._loading:
+            raise AttributeError(name)
+        self._load()
+        try:
+            return self.__dict__[name]
+        except KeyError:
+            raise AttributeError("'module' object has no attribute '{0}'".format(name))
+
+    def _load(self):
+        """ Import all submodules and add their contents to the package """
+        if self._loaded:
+            return
+        self.__dict__['_loading'] = True
+        try:
+            for modName in _MODULES:
+                module = importlib.import_module('{0}.{1}'.format(self.__name__, modName))
+                names = getattr(module, '__all__', None)
+                if names is None:
+                    names = [k for k in module.__dict__ if not k.startswith('_')]
+                for k in names:
+                    self.__dict__[k] = getattr(module, k)
+                self.__dict__[modName] = module
+            self.__dict__['_loaded'] = True
+        finally:
+            self.__dict__['_loading'] = False
+
+
+sys.modules[__name__] = _LazyPackage(sys.modules[__name__])
@@ -0,0 +1,958 @@
+#!/usr/bin/env mayapy
+# encoding: utf-8
+"""
+viewGui.backend
+
+Provides the ui command layer used throughout viewGui. The `pm` and
+`cmds` objects in this module forward to the current backend, which is
+pymel and maya.cmds by default. They are only imported when first used.
+
+A FakeBackend can be set to run viewGui without maya, eg. for testing
+or benchmarking. It keeps all controls in memory and records every
+create, edit and query that is issued.
+
+An Instrument counts and times ui commands per owning widget or view,
+for finding the code that makes the most round-trips to maya.
+
+>>> with backend.Instrument() as inst:
+>>>     lst.update()
+>>> print(inst.report())
+
+>>> from viewGui import backend, utils
+>>> fake = backend.FakeBackend()
+>>> with backend.useBackend(fake):
+>>>     with backend.pm.window():
+>>>         with backend.pm.formLayout():
+>>>             lst = utils.ItemList(items=range(100))
+>>> fake.commandCount
+"""
+
+import collections
+import logging
+import sys
+import threading
+import timeit
+import types
+
+__all__ = [
+    'pm',
+    'cmds',
+    'executeDeferred',
+    'getBackend',
+    'setBackend',
+    'useBackend',
+    'MayaBackend',
+    'FakeBackend',
+    'Instrument',
+]
+
+LOG = logging.getLogger(__name__)
+
+
+class MayaBackend(object):
+    """
+    Runs ui commands in maya using pymel and maya.cmds
+    """
+
+    name = 'maya'
+
+    def __init__(self):
+        self._pm = None
+        self._cmds = None
+
+    @property
+    def pm(self):
+        if self._pm is None:
+            import pymel.core
+            self._pm = pymel.core
+        return self._pm
+
+    @property
+    def cmds(self):
+        if self._cmds is None:
+            from maya import cmds
+            self._cmds = cmds
+        return self._cmds
+
+    def executeDeferred(self, fnc, *args):
+        """ Run the given function on the main thread when maya is idle. Thread-safe. """
+        import maya.utils
+        maya.utils.executeDeferred(fnc, *args)
+
+    def instrument(self, inst):
+        """
+        Wrap the methods of all pymel ui types to report to the given Instrument.
+        Returns a function that restores the original methods.
+        """
+        from pymel.core import uitypes
+        patched = []
+        for cls in list(vars(uitypes).values()):
+            if not isinstance(cls, type) or not issubclass(cls, uitypes.PyUI):
+                continue
+            cmd = lowerFirst(cls.__name__)
+            for name, fnc in list(vars(cls).items()):
+                if name.startswith('_') or not isinstance(fnc, types.FunctionType):
+                    continue
+                mode = 'query' if name.startswith('get') else 'edit'
+                setattr(cls, name, inst.wrap(fnc, cmd, mode))
+                patched.append((cls, name, fnc))
+        def restore():
+            for cls, name, fnc in patched:
+                setattr(cls, name, fnc)
+        return restore
+
+
+_BACKEND = None
+_INSTRUMENT = None
+
+def getBackend():
+    """ Return the current backend, creating a MayaBackend if none has been set """
+    global _BACKEND
+    if _BACKEND is None:
+        _BACKEND = MayaBackend()
+    return _BACKEND
+
+def setBackend(backend):
+    """ Set the current backend and return the previous one """
+    global _BACKEND
+    prev = _BACKEND
+    _BACKEND = backend
+    return prev
+
+
+class useBackend(object):
+    """
+    Context manager that sets the current backend and restores
+    the previous one on exit.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self.prev = None
+
+    def __enter__(self):
+        self.prev = setBackend(self.backend)
+        return self.backend
+
+    def __exit__(self, type, value, traceback):
+        setBackend(self.prev)
+
+
+class ModuleProxy(object):
+    """
+    Forwards attribute access to a module of the current backend,
+    eg. ModuleProxy('pm').button is the current backend's pm.button.
+    """
+    def __init__(self, attr):
+        self._attr = attr
+
+    def __repr__(self):
+        return '<ModuleProxy {0}>'.format(self._attr)
+
+    def __getattr__(self, name):
+        value = getattr(getattr(getBackend(), self._attr), name)
+        if _INSTRUMENT is not None and isinstance(value, (types.FunctionType, types.BuiltinFunctionType)):
+            return _INSTRUMENT.wrap(value, name)
+        return value
+
+
+pm = ModuleProxy('pm')
+cmds = ModuleProxy('cmds')
+
+def executeDeferred(fnc, *args):
+    """ Run the given function on the main thread during idle time. Thread-safe. """
+    getBackend().executeDeferred(fnc, *args)
+
+
+def getCommandMode(kwargs):
+    """ Return create, edit, query or exists for the given command flags """
+    if kwargs.get('q') or kwargs.get('query'):
+        return 'query'
+    if kwargs.get('e') or kwargs.get('edit'):
+        return 'edit'
+    if kwargs.get('ex') or kwargs.get('exists'):
+        return 'exists'
+    return 'create'
+
+def getCommandOwner(frame):
+    """
+    Return a name for the code that issued a command from the given frame,
+    which is the class of `self` for methods, eg. 'ItemList', or the module
+    and function name otherwise, eg. 'utils.layoutFormChildren'.
+    Frames within this module and pymel are skipped.
+    """
+    while frame is not None:
+        modName = frame.f_globals.get('__name__', '')
+        if modName != __name__ and not modName.startswith('pymel'):
+            obj = frame.f_locals.get('self')
+            if obj is not None:
+                return type(obj).__name__
+            return '{0}.{1}'.format(modName.rpartition('.')[2], frame.f_code.co_name)
+        frame = frame.f_back
+
+
+class Instrument(object):
+    """
+    Counts and times every ui command issued through the current backend
+    while active, grouped by the owning widget or view, the command and
+    its mode (create, edit, query or exists). Commands issued from within
+    another command, eg. by pymel itself, are counted as part of it.
+
+    Use as a context manager, or call start and stop.
+    """
+
+    def __init__(self):
+        # {(owner, command, mode): [count, seconds]}
+        self.stats = {}
+        self._depth = 0
+        self._restore = None
+        self._prev = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+    @property
+    def active(self):
+        return self._restore is not None
+
+    def start(self):
+        global _INSTRUMENT
+        if self.active:
+            return
+        self._prev = _INSTRUMENT
+        _INSTRUMENT = self
+        self._restore = getBackend().instrument(self)
+
+    def stop(self):
+        global _INSTRUMENT
+        if not self.active:
+            return
+        self._restore()
+        self._restore = None
+        _INSTRUMENT = self._prev
+        self._prev = None
+
+    def reset(self):
+        self.stats = {}
+
+    def wrap(self, fnc, cmd=None, mode=None):
+        """
+        Return a function that calls fnc and records it as the given command and mode.
+        If cmd is None, the first argument is used as the command name, and if mode
+        is None, it is determined from the command flags.
+        """
+        def wrapper(*args, **kwargs):
+            if self._depth:
+                return fnc(*args, **kwargs)
+            self._depth += 1
+            start = timeit.default_timer()
+            try:
+                return fnc(*args, **kwargs)
+            finally:
+                elapsed = timeit.default_timer() - start
+                self._depth -= 1
+                self.add(getCommandOwner(sys._getframe(1)), cmd or args[0],
+                    mode or getCommandMode(kwargs), elapsed)
+        return wrapper
+
+    def add(self, owner, cmd, mode, seconds):
+        key = (owner, str(cmd), mode)
+        stat = self.stats.get(key)
+        if stat is None:
+            self.stats[key] = [1, seconds]
+        else:
+            stat[0] += 1
+            stat[1] += seconds
+
+    @property
+    def count(self):
+        """ The total number of commands recorded """
+        return sum([s[0] for s in self.stats.values()])
+
+    @property
+    def time(self):
+        """ The total time in seconds spent in recorded commands """
+        return sum([s[1] for s in self.stats.values()])
+
+    def summary(self, key='owner'):
+        """
+        Return a list of (name, count, seconds) totals grouped by owner,
+        cmd or mode, sorted with the most commands first.
+        """
+        index = ('owner', 'cmd', 'mode').index(key)
+        totals = {}
+        for k, (count, seconds) in self.stats.items():
+            total = totals.setdefault(k[index], [0, 0.0])
+            total[0] += count
+            total[1] += seconds
+        return sorted([(k, v[0], v[1]) for k, v in totals.items()], key=lambda x: (-x[1], -x[2], str(x[0])))
+
+    def report(self, limit=20):
+        """ Return a table of the owners and commands with the most calls """
+        rows = sorted(self.stats.items(), key=lambda kv: (-kv[1][0], -kv[1][1], str(kv[0])))
+        if limit is not None:
+            rows = rows[:limit]
+        fmt = '{0:<32} {1:<20} {2:<7} {3:>8} {4:>10}'
+        lines = [fmt.format('owner', 'command', 'mode', 'calls', 'time')]
+        for (owner, cmd, mode), (count, seconds) in rows:
+            lines.append(fmt.format(owner, cmd, mode, count, '{0:.4f}s'.format(seconds)))
+        lines.append('total: {0} calls, {1:.4f}s'.format(self.count, self.time))
+        return '\n'.join(lines)
+
+
+
+
+# long names for all short flags used by viewGui
+FLAG_NAMES = dict(
+    a='append', aa='allowedArea', ac='attachControl', adj='adjustableColumn',
+    af='attachForm', al='align', ams='allowMultiSelection', an='attachNone',
+    ann='annotation', ap='attachPosition', bgc='backgroundColor', bs='borderStyle',
+    bv='borderVisible', c='command', ca='childArray', cc='changeCommand',
+    cl='collapse', cll='collapsable', con='content', cr='childResizable',
+    da='deselectAll', dai='deleteAllItems', dcc='doubleClickCommand', dgc='dragCallback',
+    dkc='deleteKeyCommand', dpc='dropCallback', e='edit', en='enable',
+    ex='exists', f='force', fl='floating', fn='font', h='height', i='image',
+    io='isObscured', k='kill', l='label', la='labelAlign', lv='labelVisible',
+    m='manage', mh='marginHeight', mm='markingMenu', mw='marginWidth',
+    nch='numberOfChildren', nd='numberOfDivisions', ofc='offCommand',
+    onc='onCommand', p='parent', q='query', rc='resizeCommand', rp='radialPosition',
+    rs='rowSpacing', sah='scrollAreaHeight', sav='scrollAreaValue',
+    saw='scrollAreaWidth', sc='selectCommand', st='style', t='title',
+    tlc='topLeftCorner', tx='text', v='value', vcc='visibleChangeCommand',
+    vis='visible', w='width', ww='wordWrap',
+)
+
+# short flags that mean something different for certain commands
+COMMAND_FLAG_NAMES = dict(
+    textScrollList=dict(
+        ai='allItems', ap='appendPosition', ni='numberOfItems',
+        nsi='numberOfSelectedItems', ra='removeAll', ri='removeItem',
+        rii='removeIndexedItem', shi='showIndexedItem', si='selectItem',
+        sii='selectIndexedItem',
+    ),
+    scriptJob=dict(e='event', ie='idleEvent', ro='runOnce', uid='uiDeleted'),
+    evalDeferred=dict(lp='lowestPriority'),
+)
+
+LAYOUT_COMMANDS = set([
+    'columnLayout', 'flowLayout', 'formLayout', 'frameLayout', 'gridLayout',
+    'horizontalLayout', 'menuBarLayout', 'paneLayout', 'rowColumnLayout',
+    'rowLayout', 'scrollLayout', 'shelfLayout', 'tabLayout', 'verticalLayout',
+])
+MENU_COMMANDS = set(['menu', 'optionMenu', 'popupMenu'])
+
+# commands that do not create controls, and their results
+NON_UI_COMMANDS = dict(
+    hwRender=None, ls=[], refresh=None, repeatLast=None, select=None,
+    selected=[], showWindow=None, undoInfo=None,
+)
+
+# default values returned when querying flags that were never set
+DEFAULT_FLAGS = dict(
+    enable=True, height=100, manage=True, numberOfDivisions=100,
+    visible=True, width=100,
+)
+
+
+def lowerFirst(value):
+    return value[:1].lower() + value[1:]
+
+
+class FakeControl(object):
+    """ The in-memory state of a control in a FakeBackend """
+
+    __slots__ = ('cmd', 'name', 'parent', 'children', 'flags', 'items', 'selected')
+
+    def __init__(self, cmd, name, parent, flags):
+        self.cmd = cmd
+        self.name = name
+        self.parent = parent
+        self.children = []
+        self.flags = flags
+        self.items = []
+        self.selected = set()
+
+    @property
+    def path(self):
+        if self.parent is None:
+            return self.name
+        return '{0}|{1}'.format(self.parent.path, self.name)
+
+    def iterTree(self):
+        yield self
+        for c in self.children:
+            for d in c.iterTree():
+                yield d
+
+
+class FakeUI(str):
+    """
+    Stand in for a pymel ui object. Like pymel, the object is the
+    full path name of the control, and all methods issue commands
+    through its backend, eg. getLabel() queries the label flag.
+    """
+
+    def __new__(cls, name, backend=None):
+        obj = str.__new__(cls, name)
+        obj._backend = backend if backend is not None else getBackend()
+        return obj
+
+    def __repr__(self):
+        return 'ui.{0}({1!r})'.format(type(self).__name__, str(self))
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        backend = self._backend
+        if name.startswith('get') and len(name) > 3:
+            flag = lowerFirst(name[3:])
+            return lambda: backend.call(self._cmd, self, q=True, **{flag: True})
+        if name.startswith('set') and len(name) > 3:
+            flag = lowerFirst(name[3:])
+            return lambda value: backend.call(self._cmd, self, e=True, **{flag: value})
+        def edit(*args):
+            if len(args) == 1:
+                value = args[0]
+            else:
+                value = list(args) if args else True
+            return backend.call(self._cmd, self, e=True, **{name: value})
+        return edit
+
+    def __enter__(self):
+        self._backend.pushParent(self)
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self._backend.popParent(self)
+
+    @property
+    def _cmd(self):
+        return self._backend.getControl(self).cmd
+
+    def name(self):
+        return str(self)
+
+    def shortName(self):
+        return str(self).split('|')[-1]
+
+    def exists(self):
+        return self._backend.find(self) is not None
+
+    def parent(self):
+        parent = self._backend.getControl(self).parent
+        if parent is not None:
+            return self._backend.wrap(parent)
+
+    getParent = parent
+
+    def getChildren(self):
+        return [self._backend.wrap(c) for c in self._backend.getControl(self).children]
+
+    children = getChildren
+
+    def delete(self):
+        self._backend.call('deleteUI', self)
+
+    def clear(self):
+        children = self.getChildren()
+        if len(children):
+            self._backend.call('deleteUI', children)
+
+    def show(self):
+        self._backend.call('showWindow', self)
+
+
+class FakeNamespace(object):
+    """ Namespace used for the fake pm, cmds and pm.ui modules """
+    def __init__(self, getter):
+        self._getter = getter
+        self._cache = {}
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        if name not in self._cache:
+            self._cache[name] = self._getter(name)
+        return self._cache[name]
+
+
+class FakeNode(object):
+    """ Placeholder for node and attribute types, which do not exist in a FakeBackend """
+    pass
+
+
+class FakeBackend(object):
+    """
+    Runs ui commands without maya by keeping all controls in memory.
+
+    Every command is recorded in `counts` by (command, mode), where mode
+    is one of create, edit, query or exists. Functions given to evalDeferred
+    and executeDeferred are queued until processDeferred is called, and
+    script jobs are only run by fireEvent or when their ui is deleted.
+    """
+
+    name = 'fake'
+
+    def __init__(self):
+        self.controls = {}
+        self.shortNames = {}
+        self.counts = collections.defaultdict(int)
+        self.recorder = None
+        self.windowPrefs = {}
+        self.jobs = {}
+        self._nextJob = 1
+        self._nameCounts = collections.defaultdict(int)
+        self._parentStack = []
+        self._currentParent = None
+        self._currentMenu = None
+        self._deferred = collections.deque()
+        self._idle = collections.deque()
+        self._lock = threading.Lock()
+        self._uiClasses = {}
+        self.pm = FakeNamespace(self._getPmAttr)
+        self.cmds = FakeNamespace(self._getCommand)
+        self.ui = FakeNamespace(self._getUIClass)
+
+    def __repr__(self):
+        return '<FakeBackend {0} controls, {1} commands>'.format(len(self.controls), self.commandCount)
+
+    @property
+    def commandCount(self):
+        """ Return the total number of commands issued """
+        return sum(self.counts.values())
+
+    def resetCounts(self):
+        self.counts.clear()
+
+    def instrument(self, inst):
+        """ Report all commands to the given Instrument, returns a function to stop """
+        prev = self.__dict__.get('call')
+        self.call = inst.wrap(self.call)
+        def restore():
+            if prev is None:
+                del self.call
+            else:
+                self.call = prev
+        return restore
+
+    # namespaces
+    # ----------
+
+    def _getPmAttr(self, name):
+        if name == 'ui':
+            return self.ui
+        if name in ('Attribute', 'PyNode', 'DependNode', 'Transform'):
+            return FakeNode
+        return self._getCommand(name)
+
+    def _getCommand(self, name):
+        def command(*args, **kwargs):
+            return self.call(name, *args, **kwargs)
+        command.__name__ = name
+        return command
+
+    def _getUIClass(self, name):
+        return self.uiClass(lowerFirst(name))
+
+    def uiClass(self, cmd):
+        """ Return the FakeUI subclass for controls of the given command """
+        if cmd not in self._uiClasses:
+            clsName = cmd[:1].upper() + cmd[1:]
+            self._uiClasses[cmd] = type(str(clsName), (FakeUI,), {})
+        return self._uiClasses[cmd]
+
+    def wrap(self, ctl):
+        return self.uiClass(ctl.cmd)(ctl.path, self)
+
+    # controls
+    # --------
+
+    def find(self, name):
+        """ Return the FakeControl for the given full or short name, if it exists """
+        if name is None:
+            return None
+        name = str(name)
+        ctl = self.controls.get(name)
+        if ctl is None and '|' not in name:
+            paths = self.shortNames.get(name)
+            if paths:
+                ctl = self.controls.get(paths[-1])
+        return ctl
+
+    def getControl(self, name):
+        ctl = self.find(name)
+        if ctl is None:
+            raise RuntimeError('Object not found: {0}'.format(name))
+        return ctl
+
+    def allControls(self):
+        return self.controls.values()
+
+    @property
+    def currentParent(self):
+        return self.find(self._currentParent)
+
+    def pushParent(self, ui):
+        self._parentStack.append(str(ui))
+        self._currentParent = str(ui)
+
+    def popParent(self, ui):
+        if len(self._parentStack):
+            self._parentStack.pop()
+        if len(self._parentStack):
+            self._currentParent = self._parentStack[-1]
+        else:
+            ctl = self.find(ui)
+            self._currentParent = ctl.parent.path if ctl is not None and ctl.parent is not None else None
+        ctl = self.find(ui)
+        if ctl is not None and ctl.cmd == 'window':
+            ctl.flags['visible'] = True
+
+    def _uniqueName(self, cmd, name, parent):
+        siblings = parent.children if parent is not None else [c for c in self.controls.values() if c.parent is None]
+        taken = set([c.name for c in siblings])
+        if name is None or name in taken:
+            base = name or cmd
+            while True:
+                self._nameCounts[base] += 1
+                candidate = '{0}{1}'.format(base, self._nameCounts[base])
+                if candidate not in taken:
+                    return candidate
+        return name
+
+    def _register(self, ctl):
+        for c in ctl.iterTree():
+            self.controls[c.path] = c
+            self.shortNames.setdefault(c.name, []).append(c.path)
+
+    def _unregister(self, ctl):
+        for c in ctl.iterTree():
+            self.controls.pop(c.path, None)
+            paths = self.shortNames.get(c.name)
+            if paths and c.path in paths:
+                paths.remove(c.path)
+
+    def createControl(self, cmd, name, flags):
+        parentName = flags.pop('parent', None)
+        if cmd == 'window':
+            parent = None
+        elif cmd == 'menuItem':
+            parent = self.find(parentName) if parentName else self.find(self._currentMenu)
+        elif parentName is not None:
+            parent = self.getControl(parentName)
+        else:
+            parent = self.currentParent
+        if parent is None and cmd != 'window':
+            raise RuntimeError('{0}: no parent layout or window for new control'.format(cmd))
+        ctl = FakeControl(cmd, self._uniqueName(cmd, name, parent), parent, flags)
+        if parent is not None:
+            parent.children.append(ctl)
+        self._register(ctl)
+        if cmd == 'window' or cmd in LAYOUT_COMMANDS:
+            self._currentParent = ctl.path
+        if cmd in MENU_COMMANDS:
+            self._currentMenu = ctl.path
+        if cmd == 'textScrollList':
+            self._editList(ctl, flags)
+        return self.wrap(ctl)
+
+    def reparent(self, ctl, parent):
+        self._unregister(ctl)
+        if ctl.parent is not None:
+            ctl.parent.children.remove(ctl)
+        ctl.parent = parent
+        ctl.name = self._uniqueName(ctl.cmd, ctl.name, parent)
+        parent.children.append(ctl)
+        self._register(ctl)
+
+    def deleteControl(self, ctl):
+        deleted = set([c.path for c in ctl.iterTree()])
+        self._unregister(ctl)
+        if ctl.parent is not None and ctl in ctl.parent.children:
+            ctl.parent.children.remove(ctl)
+        if self._currentParent in deleted:
+            self._currentParent = ctl.parent.path if ctl.parent is not None else None
+        # run and remove script jobs attached to the deleted ui
+        for j, job in sorted(self.jobs.items()):
+            if job.get('uiDeleted') and str(job['uiDeleted'][0]) in deleted:
+                del self.jobs[j]
+                self._run(job['uiDeleted'][1])
+            elif job.get('parent') is not None and str(job['parent']) in deleted:
+                del self.jobs[j]
+
+    def isObscured(self, ctl):
+        while ctl is not None:
+            if not ctl.flags.get('manage', True) or not ctl.flags.get('visible', True):
+                return True
+            ctl = ctl.parent
+        return False
+
+    # commands
+    # --------
+
+    def normalizeFlags(self, cmd, kwargs):
+        names = COMMAND_FLAG_NAMES.get(cmd, {})
+        flags = {}
+        for k, v in kwargs.items():
+            flags[names.get(k) or FLAG_NAMES.get(k, k)] = v
+        return flags
+
+    def record(self, cmd, mode, args):
+        self.counts[(cmd, mode)] += 1
+        if self.recorder is not None:
+            self.recorder(cmd, mode, args)
+
+    def call(self, cmd, *args, **kwargs):
+        """ Run the given command with maya style arguments """
+        flags = self.normalizeFlags(cmd, kwargs)
+        query = flags.pop('query', False)
+        edit = flags.pop('edit', False)
+        if flags.get('exists'):
+            mode = 'exists'
+        elif query:
+            mode = 'query'
+        elif edit:
+            mode = 'edit'
+        else:
+            mode = 'create'
+        self.record(cmd, mode, args)
+        handler = getattr(self, '_cmd_{0}'.format(cmd), None)
+        if handler is not None:
+            return handler(mode, args, flags)
+        if cmd in NON_UI_COMMANDS:
+            return NON_UI_COMMANDS[cmd]
+        return self.controlCommand(cmd, mode, args, flags)
+
+    def controlCommand(self, cmd, mode, args, flags):
+        name = args[0] if len(args) else None
+        if mode == 'exists':
+            return self.find(name) is not None
+        if mode == 'create':
+            return self.createControl(cmd, name, flags)
+        ctl = self.getControl(name if name is not None else self._currentParent)
+        if mode == 'edit':
+            self.editControl(ctl, flags)
+        else:
+            return self.queryControl(ctl, flags)
+
+    def editControl(self, ctl, flags):
+        if 'parent' in flags:
+            self.reparent(ctl, self.getControl(flags.pop('parent')))
+        if ctl.cmd == 'textScrollList':
+            self._editList(ctl, flags)
+        if flags.pop('deleteAllItems', False):
+            for child in list(ctl.children):
+                self.deleteControl(child)
+        ctl.flags.update(flags)
+
+    def queryControl(self, ctl, flags):
+        flag = list(flags.keys())[0]
+        if flag == 'childArray':
+            return [c.name for c in ctl.children] or None
+        if flag == 'numberOfChildren':
+            return len(ctl.children)
+        if flag == 'isObscured':
+            return self.isObscured(ctl)
+        if flag == 'parent':
+            return ctl.parent.path if ctl.parent is not None else None
+        if flag == 'fullPathName':
+            return ctl.path
+        if ctl.cmd == 'textScrollList':
+            if flag == 'allItems':
+                return list(ctl.items)
+            if flag == 'numberOfItems':
+                return len(ctl.items)
+            if flag == 'selectIndexedItem':
+                return [i + 1 for i in sorted(ctl.selected)]
+            if flag == 'selectItem':
+                return [ctl.items[i] for i in sorted(ctl.selected)]
+            if flag == 'numberOfSelectedItems':
+                return len(ctl.selected)
+        return ctl.flags.get(flag, DEFAULT_FLAGS.get(flag))
+
+    def _editList(self, ctl, flags):
+        """ Apply all item editing flags of a textScrollList """
+        def asList(value):
+            return list(value) if isinstance(value, (list, tuple)) else [value]
+        def asPairs(value):
+            if isinstance(value, (list, tuple)) and len(value) and isinstance(value[0], (list, tuple)):
+                return list(value)
+            return [value]
+        if flags.pop('removeAll', False):
+            ctl.items = []
+            ctl.selected = set()
+        if 'removeIndexedItem' in flags:
+            for i in sorted(asList(flags.pop('removeIndexedItem')), reverse=True):
+                self._removeListIndex(ctl, i - 1)
+        if 'removeItem' in flags:
+            for item in asList(flags.pop('removeItem')):
+                if item in ctl.items:
+                    self._removeListIndex(ctl, ctl.items.index(item))
+        if 'append' in flags:
+            ctl.items.extend([str(x) for x in asList(flags.pop('append'))])
+        if 'appendPosition' in flags:
+            for pos, item in asPairs(flags.pop('appendPosition')):
+                index = max(0, min(pos - 1, len(ctl.items)))
+                ctl.items.insert(index, str(item))
+                ctl.selected = set([s + 1 if s >= index else s for s in ctl.selected])
+        if flags.pop('deselectAll', False):
+            ctl.selected = set()
+        if 'selectIndexedItem' in flags:
+            for i in asList(flags.pop('selectIndexedItem')):
+                if 0 < i <= len(ctl.items):
+                    ctl.selected.add(i - 1)
+        if 'selectItem' in flags:
+            for item in asList(flags.pop('selectItem')):
+                if item in ctl.items:
+                    ctl.selected.add(ctl.items.index(item))
+        flags.pop('showIndexedItem', None)
+
+    def _removeListIndex(self, ctl, index):
+        if 0 <= index < len(ctl.items):
+            del ctl.items[index]
+            ctl.selected = set([s - 1 if s > index else s for s in ctl.selected if s != index])
+
+    def _cmd_layout(self, mode, args, flags):
+        return self.controlCommand('layout', mode, args, flags)
+
+    def _cmd_control(self, mode, args, flags):
+        return self.controlCommand('control', mode, args, flags)
+
+    def _cmd_deleteUI(self, mode, args, flags):
+        for arg in args:
+            names = arg if isinstance(arg, (list, tuple)) else [arg]
+            for name in names:
+                self.deleteControl(self.getControl(name))
+
+    def _cmd_setParent(self, mode, args, flags):
+        if mode == 'query':
+            return self._currentParent
+        name = args[0] if len(args) else None
+        if name == '..':
+            ctl = self.currentParent
+            self._currentParent = ctl.parent.path if ctl is not None and ctl.parent is not None else None
+        elif flags.get('menu'):
+            self._currentMenu = self.getControl(name).path
+        else:
+            self._currentParent = self.getControl(name).path
+
+    def _cmd_currentParent(self, mode, args, flags):
+        ctl = self.currentParent
+        if ctl is not None:
+            return self.wrap(ctl)
+
+    def _cmd_lsUI(self, mode, args, flags):
+        controls = self.controls.values()
+        if flags.get('windows') and not (flags.get('controls') or flags.get('controlLayouts')):
+            controls = [c for c in controls if c.cmd == 'window']
+        if flags.get('long'):
+            return sorted([c.path for c in controls])
+        return sorted([c.name for c in controls])
+
+    def _cmd_windowPref(self, mode, args, flags):
+        name = str(args[0])
+        if mode == 'exists':
+            return name in self.windowPrefs
+        if mode == 'query':
+            flag = list(flags.keys())[0]
+            return self.windowPrefs.get(name, {}).get(flag)
+        if flags.pop('remove', False):
+            self.windowPrefs.pop(name, None)
+            return
+        self.windowPrefs.setdefault(name, {}).update(flags)
+
+    def _cmd_scriptJob(self, mode, args, flags):
+        if mode == 'exists':
+            return flags['exists'] in self.jobs
+        if 'kill' in flags:
+            self.jobs.pop(flags['kill'], None)
+            return
+        if flags.get('listJobs'):
+            return sorted(self.jobs.keys())
+        j = self._nextJob
+        self._nextJob += 1
+        self.jobs[j] = flags
+        return j
+
+    def _cmd_evalDeferred(self, mode, args, flags):
+        fnc = args[0] if len(args) else None
+        if not hasattr(fnc, '__call__'):
+            LOG.debug('ignoring deferred code: {0!r}'.format(fnc))
+            return
+        with self._lock:
+            if flags.get('lowestPriority'):
+                self._idle.append(fnc)
+            else:
+                self._deferred.append(fnc)
+
+    # deferred evaluation and events
+    # ------------------------------
+
+    def executeDeferred(self, fnc, *args):
+        """ Queue the given function to run on the next call to processDeferred. Thread-safe. """
+        if len(args):
+            fnc = _Partial(fnc, args)
+        with self._lock:
+            self._deferred.append(fnc)
+
+    def hasDeferred(self):
+        return bool(len(self._deferred) or len(self._idle))
+
+    def processDeferred(self, limit=None):
+        """
+        Run all deferred functions, including any that are deferred while processing.
+        Lowest priority functions only run once no other functions are waiting,
+        similar to idle time in maya. Returns the number of functions that were run.
+        """
+        count = 0
+        while limit is None or count < limit:
+            with self._lock:
+                if len(self._deferred):
+                    fnc = self._deferred.popleft()
+                elif len(self._idle):
+                    fnc = self._idle.popleft()
+                else:
+                    break
+            self._run(fnc)
+            count += 1
+        return count
+
+    def fireEvent(self, event):
+        """ Run all script jobs for the given maya event """
+        for j, job in sorted(self.jobs.items()):
+            if job.get('event') and job['event'][0] == event:
+                if job.get('runOnce'):
+                    del self.jobs[j]
+                self._run(job['event'][1])
+
+    def invoke(self, ui, flag, *args):
+        """ Run the callback stored in the given flag of a control, eg. to simulate a click """
+        ctl = self.getControl(ui)
+        fnc = ctl.flags.get(FLAG_NAMES.get(flag, flag))
+        if hasattr(fnc, '__call__'):
+            return fnc(*args)
+
+    def selectListItems(self, ui, indices, command=True):
+        """ Set the selected 1-based indices of a textScrollList and run its select command """
+        ctl = self.getControl(ui)
+        ctl.selected = set([i - 1 for i in indices if 0 < i <= len(ctl.items)])
+        if command:
+            self.invoke(ui, 'selectCommand')
+
+    def _run(self, fnc):
+        try:
+            fnc()
+        except Exception:
+            LOG.exception('error running {0!r}'.format(fnc))
+
+
+class _Partial(object):
+    def __init__(self, fnc, args):
+        self.fnc = fnc
+        self.args = args
+
+    def __call__(self):
+        return self.fnc(*self.args)
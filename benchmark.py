@@ -0,0 +1,389 @@
+#!/usr/bin/env mayapy
+# encoding: utf-8
+"""
+viewGui.benchmark
+
+Benchmarks for measuring the performance of viewGui.
+The import benchmark needs mayapy (or any python that can import pymel),
+while the suite of ui benchmarks runs on a FakeBackend without maya, eg.
+
+    mayapy -m viewGui.benchmark import
+    python -m viewGui.benchmark suite --save baseline.json
+    python -m viewGui.benchmark suite --compare baseline.json
+"""
+
+import argparse
+import gc
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# default number of times to repeat each measurement
+REPEAT = 5
+
+IMPORT_CODE = """
+import time
+start = time.time()
+import {package}
+{access}
+print(time.time() - start)
+"""
+
+
+def packageName():
+    if __package__:
+        return __package__
+    return os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+
+def packageParentDir():
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def importTime(access=None, repeat=REPEAT, python=None):
+    """
+    Return the fastest time in seconds it takes to import viewGui
+    in a new interpreter, out of `repeat` runs.
+
+    `access` -- code to run after importing, where {package} is replaced
+        with the package name, eg. '{package}.Gui' to load the package contents
+    `python` -- the python executable to use, defaults to the current one
+    """
+    if python is None:
+        python = sys.executable
+    pkg = packageName()
+    code = IMPORT_CODE.format(
+        package=pkg,
+        access=access.format(package=pkg) if access else '',
+    )
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join([packageParentDir()] + [p for p in [env.get('PYTHONPATH')] if p])
+    times = []
+    for i in range(repeat):
+        out = subprocess.check_output([python, '-c', code], env=env)
+        times.append(float(out.strip().splitlines()[-1]))
+    return min(times)
+
+
+def importBenchmark(repeat=REPEAT, python=None):
+    """
+    Compare importing the package by itself against importing it and
+    using a ui class, which is what every import used to cost.
+    Returns a dict of {name: seconds}.
+    """
+    return dict(
+        lazy=importTime(None, repeat, python),
+        full=importTime('{package}.Gui; {package}.backend.pm.window', repeat, python),
+    )
+
+
+def printImportBenchmark(results):
+    print('import viewGui:            {0:8.4f}s'.format(results['lazy']))
+    print('import viewGui + use a ui: {0:8.4f}s'.format(results['full']))
+    if results['lazy'] > 0:
+        print('lazy import is {0:.1f}x faster'.format(results['full'] / results['lazy']))
+
+
+def getModule(name):
+    """ Return a submodule of the package, eg. getModule('utils') """
+    return importlib.import_module('{0}.{1}'.format(packageName(), name))
+
+
+class PeakMemory(object):
+    """
+    Context manager that measures the peak memory used within it, in bytes.
+    Uses tracemalloc when available, otherwise reports how much the peak
+    resident size of the process grew, which is 0 if the block stayed below
+    the highest peak the process reached before.
+    """
+    def __init__(self):
+        self.peak = None
+        self._startRss = None
+
+    @property
+    def kind(self):
+        return 'traced' if tracemalloc is not None else 'rssGrowth'
+
+    def getMaxRss(self):
+        # maxrss is in kilobytes on linux, bytes on mac
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+    def __enter__(self):
+        if tracemalloc is not None:
+            tracemalloc.start()
+        elif resource is not None:
+            self._startRss = self.getMaxRss()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if tracemalloc is not None:
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        elif resource is not None:
+            self.peak = self.getMaxRss() - self._startRss
+
+
+# benchmark cases
+# ---------------
+# Each case builds its ui inside a window on a FakeBackend and returns
+# a function that performs the operation to measure.
+
+def caseItemList(scale=1.0):
+    """ ItemList.update with 50k items and a search filter """
+    utils = getModule('utils')
+    items = ['item{0}'.format(i) for i in range(int(50000 * scale))]
+    lst = utils.ItemList(items=items)
+    def run():
+        lst.searchFilter = 'item1 item2,item3'
+    return run
+
+def caseItemListSearch(scale=1.0):
+    """ Type a search filter one key at a time into an ItemList with 50k items """
+    utils = getModule('utils')
+    items = ['item{0}'.format(i) for i in range(int(50000 * scale))]
+    lst = utils.ItemList(items=items)
+    def run():
+        text = 'item123'
+        for i in range(len(text)):
+            lst.searchFilter = text[:i+1]
+        lst.searchFilter = None
+    return run
+
+def caseFilterList(scale=1.0):
+    """ Refresh a chain of three FilterLists from a new parent selection """
+    utils = getModule('utils')
+    count = max(int(100 * scale), 2)
+    groups = {}
+    subs = {}
+    for i in range(count):
+        groups['group{0}'.format(i)] = ['sub{0}_{1}'.format(i, j) for j in range(20)]
+        for j in range(20):
+            subs['sub{0}_{1}'.format(i, j)] = ['leaf{0}_{1}_{2}'.format(i, j, k) for k in range(10)]
+    top = utils.FilterList(items=groups)
+    mid = utils.FilterList(parent=top, items=subs)
+    bottom = utils.FilterList(parent=mid, items={})
+    top.child = mid
+    mid.child = bottom
+    mid.update()
+    def run():
+        top.selectedIndeces = list(range(count // 2))
+        top._selectCommand()
+        mid.selectedIndeces = list(range(50))
+        mid._selectCommand()
+    return run
+
+def caseLibraryLayout(scale=1.0):
+    """ LibraryLayout.update on a directory of 5k assets """
+    utils = getModule('utils')
+    path = tempfile.mkdtemp(prefix='viewGuiBenchmark')
+    for i in range(int(5000 * scale)):
+        open(os.path.join(path, 'asset{0:05d}.ma'.format(i)), 'w').close()
+        if i % 2:
+            open(os.path.join(path, 'asset{0:05d}.png'.format(i)), 'w').close()
+    lib = utils.LibraryLayout()
+    lib._paths = [path]
+    def run():
+        try:
+            lib.update()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+    return run
+
+def caseLayoutFormChildren(scale=1.0):
+    """ layoutFormChildren with hundreds of fixed and expanding children """
+    backend = getModule('backend')
+    utils = getModule('utils')
+    count = int(400 * scale)
+    with backend.pm.formLayout() as fixed:
+        for i in range(count):
+            backend.pm.button(l=str(i))
+    with backend.pm.formLayout() as expanding:
+        for i in range(count):
+            backend.pm.button(l=str(i))
+    def run():
+        utils.layoutFormChildren(fixed, fixed.getChildren(), [0] * count)
+        utils.layoutFormChildren(expanding, expanding.getChildren(), [1] * count, vertical=True)
+    return run
+
+def caseShowView(scale=1.0):
+    """ Gui.showView churn across 100 views """
+    backend = getModule('backend')
+    gui = getModule('gui')
+    view = getModule('view')
+    def buildBody(self):
+        for i in range(10):
+            self.viewItem('{0}Item{1}'.format(self.viewName, i))
+    names = ['BenchmarkView{0}'.format(i) for i in range(int(100 * scale))]
+    classes = [type(str(n), (view.View,), dict(buildBody=buildBody)) for n in names]
+    g = gui.Gui(name='viewGuiBenchmarkWin', viewClasses=classes, defaultView=names[0])
+    g.create()
+    fake = backend.getBackend()
+    fake.processDeferred()
+    def run():
+        for i in range(3):
+            for n in names:
+                g.showView(n)
+        fake.processDeferred()
+    return run
+
+
+CASES = [
+    ('itemList', caseItemList),
+    ('itemListSearch', caseItemListSearch),
+    ('filterList', caseFilterList),
+    ('libraryLayout', caseLibraryLayout),
+    ('layoutFormChildren', caseLayoutFormChildren),
+    ('showView', caseShowView),
+]
+
+
+def runCase(case, repeat=REPEAT, scale=1.0):
+    """
+    Run a benchmark case `repeat` times, each on a new FakeBackend,
+    and return a dict with the fastest time in seconds, the number of
+    ui commands issued by the last run and the highest peak memory.
+    """
+    backend = getModule('backend')
+    times = []
+    commands = None
+    memory = None
+    for i in range(repeat):
+        fake = backend.FakeBackend()
+        with backend.useBackend(fake):
+            with backend.pm.window('viewGuiBenchmark'):
+                with backend.pm.formLayout():
+                    run = case(scale)
+            fake.processDeferred()
+            fake.resetCounts()
+            gc.collect()
+            with PeakMemory() as mem:
+                start = timeit.default_timer()
+                run()
+                times.append(timeit.default_timer() - start)
+            commands = fake.commandCount
+            if mem.peak is not None:
+                memory = mem.peak if memory is None else max(memory, mem.peak)
+    return dict(time=min(times), commands=commands, memory=memory, memoryKind=PeakMemory().kind)
+
+
+def instrumentCase(case, scale=1.0):
+    """ Run a benchmark case once with an Instrument and return the Instrument """
+    backend = getModule('backend')
+    fake = backend.FakeBackend()
+    with backend.useBackend(fake):
+        with backend.pm.window('viewGuiBenchmark'):
+            with backend.pm.formLayout():
+                run = case(scale)
+        fake.processDeferred()
+        with backend.Instrument() as inst:
+            run()
+    return inst
+
+
+def suiteBenchmark(names=None, repeat=REPEAT, scale=1.0):
+    """
+    Run all benchmark cases, or only those with the given names.
+    Returns a dict of {name: results}, see runCase.
+    """
+    results = {}
+    for name, case in CASES:
+        if names and name not in names:
+            continue
+        results[name] = runCase(case, repeat, scale)
+    return results
+
+
+def compareResults(results, baseline, threshold=1.2):
+    """
+    Compare results to a baseline and return a list of (name, key, ratio)
+    for all measurements that are more than `threshold` times the baseline.
+    """
+    regressions = []
+    for name, res in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key in ('time', 'commands', 'memory'):
+            if key == 'memory' and res.get('memoryKind') != base.get('memoryKind'):
+                continue
+            if res.get(key) is not None and base.get(key):
+                ratio = res[key] / float(base[key])
+                if ratio > threshold:
+                    regressions.append((name, key, ratio))
+    return regressions
+
+
+def formatMemory(value):
+    if value is None:
+        return '-'
+    return '{0:.1f}MB'.format(value / 1048576.0)
+
+
+def printSuiteBenchmark(results, baseline=None):
+    baseline = baseline or {}
+    if PeakMemory().kind == 'rssGrowth':
+        print('tracemalloc is not available, memory is the growth of the peak resident size')
+    print('{0:<20} {1:>10} {2:>10} {3:>10}'.format('case', 'time', 'commands', 'memory'))
+    for name, case in CASES:
+        res = results.get(name)
+        if res is None:
+            continue
+        print('{0:<20} {1:>9.4f}s {2:>10} {3:>10}'.format(name, res['time'], res['commands'], formatMemory(res['memory'])))
+        base = baseline.get(name)
+        if base is not None:
+            print('{0:<20} {1:>9.4f}s {2:>10} {3:>10}'.format('  baseline', base['time'], base['commands'], formatMemory(base.get('memory'))))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Run viewGui benchmarks')
+    parser.add_argument('benchmark', choices=['import', 'suite'], help='the benchmark to run')
+    parser.add_argument('-r', '--repeat', type=int, default=REPEAT, help='number of times to repeat each measurement')
+    parser.add_argument('-p', '--python', help='python executable to use for import benchmarks')
+    parser.add_argument('-c', '--case', action='append', choices=[n for n, c in CASES], help='only run the given suite cases')
+    parser.add_argument('--scale', type=float, default=1.0, help='scale the size of the suite cases')
+    parser.add_argument('--save', help='save the suite results to a json file to use as a baseline')
+    parser.add_argument('--compare', help='compare the suite results to a saved baseline')
+    parser.add_argument('--instrument', action='store_true', help='print the ui commands issued by each suite case')
+    parser.add_argument('--threshold', type=float, default=1.2, help='ratio to the baseline that counts as a regression')
+    opts = parser.parse_args(args)
+    if opts.benchmark == 'import':
+        printImportBenchmark(importBenchmark(opts.repeat, opts.python))
+    elif opts.benchmark == 'suite':
+        results = suiteBenchmark(opts.case, opts.repeat, opts.scale)
+        baseline = None
+        if opts.compare:
+            with open(opts.compare) as fp:
+                baseline = json.load(fp)
+        printSuiteBenchmark(results, baseline)
+        if opts.instrument:
+            for name, case in CASES:
+                if name in results:
+                    print('\n{0}\n{1}'.format(name, instrumentCase(case, opts.scale).report()))
+        if opts.save:
+            with open(opts.save, 'w') as fp:
+                json.dump(results, fp, indent=2, sort_keys=True)
+        if baseline is not None:
+            regressions = compareResults(results, baseline, opts.threshold)
+            for name, key, ratio in regressions:
+                print('regression: {0} {1} is {2:.2f}x the baseline'.format(name, key, ratio))
+            if regressions:
+                return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,37 +7,121 @@ Created by Bohdon Sayre on 2010-01-01.
 Copyright (c) 2012 Bohdon Sayre. All rights reserved.
 """
 
-import pymel.core as pm
+import backend
+from backend import cmds, pm
+import collections
+import heapq
 import logging
+import sys
+import threading
 import view
 import time
+import weakref
 from utils import Callback
 
-import mbotenv
+try:
+    import mbotenv
+except ImportError:
+    mbotenv = None
 
 __all__ = [
     'Gui',
     'ViewGui',
+    'ScriptJobHub',
+    'TimingStats',
     'IconCaptureGui',
     'DockControl',
     'ScriptedPanelTypes',
     'ScriptedPanel',
 ]
 
-LOG = mbotenv.get_logger(__name__)
+LOG = mbotenv.get_logger(__name__) if mbotenv else logging.getLogger(__name__)
 
-VERSION = '0.0'
+# version of the viewGui package
+VERSION = getattr(sys.modules.get(__name__.rpartition('.')[0]), '__version__', '0.0')
 DEFAULT_SIZE = (200, 200)
 DEFAULT_TLC = (200, 200)
 
+# maya events that trigger each view event
+EVENT_MAP = dict(
+    onSelectionChange=['SelectionChanged'],
+    onSceneChange=['SceneOpened', 'NewSceneOpened', 'PostSceneRead'],
+    onUndo=['Undo'],
+    onRedo=['Redo'],
+)
+VIEW_EVENTS = ('onSelectionChange', 'onSceneChange', 'onUndo', 'onRedo', 'onWindowClosed')
+
+# timer used for profiling views, time.clock is more precise on windows
+timer = time.clock if sys.platform == 'win32' else time.time
+
+
+class TimingStats(object):
+    """ Rolling timing statistics for one operation of a view, in seconds """
+
+    def __init__(self, size=20):
+        self.samples = collections.deque(maxlen=size)
+        self.calls = 0
+
+    def __repr__(self):
+        return '<TimingStats mean {0:.4f}s, max {1:.4f}s, {2} calls>'.format(self.mean, self.max, self.calls)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.calls += 1
+
+    @property
+    def last(self):
+        if len(self.samples):
+            return self.samples[-1]
+        return 0.0
+
+    @property
+    def mean(self):
+        if len(self.samples):
+            return sum(self.samples) / len(self.samples)
+        return 0.0
+
+    @property
+    def max(self):
+        if len(self.samples):
+            return max(self.samples)
+        return 0.0
+
+
 class Gui(object):
     """
     The main View Gui class. Contains a list of View subclasses that can be shown by name.
     
     The window has metrics, but Views may also have metrics that will be applied when
     the View is shown.  The gui can ignore View metrics by setting ignoreViewMetrics to True.
+    
+    When prebuild is True, views marked with `prebuild` are created one at a time
+    during idle time after the gui is created, so that they show instantly later.
+    
+    Hidden views are kept until the gui is closed unless maxCachedViews or
+    maxCachedControls is set, in which case the least recently shown hidden
+    views are destroyed whenever either budget is exceeded. The controls of
+    each view are only counted once, the first time it is checked against
+    maxCachedControls after being created.
+
+    Maya events are coalesced so that a burst of the same event results in a
+    single call to the view's event handler during the next idle cycle.
+    Handlers with a `count` argument receive the number of collapsed events.
+    Set eventDebounce to a dict of {event: seconds} to also wait until an event
+    has stopped firing for the given interval before dispatching it.
+
+    Set profileViews to True to time creating, building, showing and hiding
+    each view and calling its event handlers. The timings are kept in a
+    rolling table of the last statsHistory samples, see slowestViews and
+    slowestHandlers.
     """
-    def __init__(self, title='View Gui', name='viewGuiWin', viewClasses=None, defaultView=None, w=None, h=None, toolbox=False):
+    maxCachedViews = None
+    maxCachedControls = None
+    coalesceEvents = True
+    profileViews = False
+    statsHistory = 20
+    
+    def __init__(self, title='View Gui', name='viewGuiWin', viewClasses=None, defaultView=None, w=None, h=None, toolbox=False, prebuild=False):
         """
         `title` -- the title for the window
         `name` -- the maya name for the window, should be as unique as possible
@@ -45,20 +129,34 @@ class Gui(object):
         `defaultView` -- the name of the view to use as the default when showing
         `w` -- width of the window
         `h` -- heigth of the window
+        `prebuild` -- prebuild views marked for prebuilding during idle time
         """
         self.title = title
         self.name = name
         self.toolbox = toolbox
+        self.prebuild = prebuild
+        self.eventDebounce = {}
         self.metrics = {'w':w, 'h':h, 'tlc':None}
         
         self._win = None
         self._viewClasses = []
+        self._viewClassMap = {}
         self._viewInst = {}
         self._viewMetrics = {}
         self._defaultView = None
         self._curViewName = None
         self._mainLayout = None
         self._scriptJobs = {}
+        self._prebuildQueue = []
+        self._prebuildId = 0
+        self._viewHistory = []
+        self._controlCounts = {}
+        self._pendingEvents = {}
+        self._lastEventTimes = {}
+        self._scheduledEvents = set()
+        self._eventTimers = {}
+        self._eventId = 0
+        self._viewStats = {}
         
         if viewClasses is not None:
             if not isinstance(viewClasses, (list, tuple)):
@@ -80,20 +178,67 @@ class Gui(object):
     @viewClasses.setter
     def viewClasses(self, views):
         """ Set the available view classes """
-        self._viewClasses = [v for v in views if isinstance(v, type) and issubclass(v, view.View)]
+        self._viewClasses = [v for v in views if self._isViewClass(v)]
+        self._viewClassMap = dict([(v.__name__, v) for v in self._viewClasses])
         self._updateViews()
     
+    def _isViewClass(self, cls):
+        return isinstance(cls, type) and issubclass(cls, view.View)
+    
     def getViewClass(self, viewName):
         """ Return the class for the given view name """
-        for c in self.viewClasses:
-            if c.__name__ == viewName:
-                return c
+        return self._viewClassMap.get(viewName)
     
     @property
     def viewNames(self):
         """ Return all available view class names """
         return [v.__name__ for v in self.viewClasses]
     
+    def registerView(self, viewClass):
+        """
+        Register a single view class without updating all other views.
+        If a view with the same name is already registered, its class
+        is replaced and any existing instance is deleted.
+        Returns True if the view class was registered.
+        """
+        if not self._isViewClass(viewClass):
+            return False
+        viewName = viewClass.__name__
+        if viewName in self._viewClassMap:
+            index = self._viewClasses.index(self._viewClassMap[viewName])
+            self._viewClasses[index] = viewClass
+            self._viewClassMap[viewName] = viewClass
+            self.resetView(viewName)
+        else:
+            self._viewClasses.append(viewClass)
+            self._viewClassMap[viewName] = viewClass
+            self._viewInst[viewName] = None
+            LOG.debug('new view: {0}'.format(viewName))
+        return True
+    
+    def unregisterView(self, viewName):
+        """
+        Unregister a single view by name, deleting its instance.
+        If the view is currently shown, the default view is shown instead.
+        Returns True if the view was unregistered.
+        """
+        if not self.hasView(viewName):
+            return False
+        isCurrent = (viewName == self.curViewName)
+        if isCurrent:
+            self.hideCurView()
+            self._curViewName = None
+        self.deleteView(viewName)
+        self._viewClasses.remove(self._viewClassMap.pop(viewName))
+        self._viewInst.pop(viewName, None)
+        self._viewMetrics.pop(viewName, None)
+        if self._defaultView == viewName:
+            self._defaultView = None
+        LOG.debug('removed view: {0}'.format(viewName))
+        if isCurrent and self._mainLayout is not None:
+            self.showDefaultView()
+        return True
+    
     @property
     def views(self):
         """ Return all view instances in a dictionary by name """
@@ -101,11 +246,10 @@ class Gui(object):
     
     def hasView(self, viewName):
         """ Return True if this gui has the given viewName """
-        return viewName in self.viewNames
+        return viewName in self._viewClassMap
     
     def getView(self, viewName):
-        if self.hasView(viewName):
-            return self._viewInst[viewName]
+        return self._viewInst.get(viewName)
     
     @property
     def curViewName(self):
@@ -119,7 +263,7 @@ class Gui(object):
     def defaultView(self):
         if self._defaultView is None:
             if len(self.viewClasses) > 0:
-                return self.viewNames[0]
+                return self.viewClasses[0].__name__
         else:
             return self._defaultView
     @defaultView.setter
@@ -131,6 +275,11 @@ class Gui(object):
     def window(self):
         return self._win
     
+    @property
+    def exists(self):
+        """ Return True if the main layout of this gui exists """
+        return self._mainLayout is not None and pm.layout(self._mainLayout, q=True, ex=True)
+    
     def _updateViews(self):
         """
         Update current views. Removes views whose classes are no longer
@@ -144,6 +293,7 @@ class Gui(object):
         for n in self._viewInst.keys():
             if not self.hasView(n):
                 del self._viewInst[n]
+                self._controlCounts.pop(n, None)
                 LOG.debug('removed view: {0}'.format(n))
         
         for n in self._viewMetrics.keys():
@@ -151,8 +301,8 @@ class Gui(object):
                 del self._viewMetrics[n]
         
         if self.defaultView is None and len(self.viewClasses) > 0:
-            self.defaultView = self.viewNames[0]
-        if self.curViewName not in self.viewNames:
+            self.defaultView = self.viewClasses[0].__name__
+        if not self.hasView(self.curViewName):
             self._curViewName = self.defaultView
         self.showView(self.curViewName)
         
@@ -174,31 +324,89 @@ class Gui(object):
                 self.showDefaultView()
         
         pm.scriptJob(uid=(self._win, Callback(self.winClosed)))
+        self.schedulePrebuild()
 
     def setupScriptJob(self, event):
-        if not self._scriptJobs.has_key(event):
+        if EVENT_MAP.has_key(event):
+            # subscribe to the shared script jobs, has no effect if already subscribed
+            for key in EVENT_MAP[event]:
+                ScriptJobHub.subscribe(key, self, event)
+            self._scriptJobs[event] = []
+        elif not self._scriptJobs.has_key(event):
             # setup script job
-            eventmap = dict(
-                onSelectionChange=['SelectionChanged'],
-                onSceneChange=['SceneOpened', 'NewSceneOpened', 'PostSceneRead'],
-                onUndo=['Undo'],
-                onRedo=['Redo'],
-            )
             self._scriptJobs[event] = []
-            if eventmap.has_key(event):
-                for key in eventmap[event]:
-                    j = pm.scriptJob(e=(key, Callback(self.scriptJobUpdate, event)), p=self.mainControl)
-                    self._scriptJobs[event].append(j)
-            elif event == 'onWindowClosed':
+            if event == 'onWindowClosed':
                 j = pm.scriptJob(uid=(self.window, Callback(self.scriptJobUpdate, event)), runOnce=True)
                 self._scriptJobs[event].append(j)
 
-    def scriptJobUpdate(self, event):
+    def queueEvent(self, event):
+        """
+        Queue a view event to be dispatched during idle time, collapsing
+        repeated events into a single call. Waits for eventDebounce seconds
+        of inactivity first if a debounce interval is set for the event.
+        """
+        if not self.coalesceEvents:
+            self.scriptJobUpdate(event)
+            return
+        self._pendingEvents[event] = self._pendingEvents.get(event, 0) + 1
+        self._lastEventTimes[event] = time.time()
+        if event not in self._scheduledEvents:
+            self._scheduledEvents.add(event)
+            self._deferEvent(event, self.eventDebounce.get(event, 0))
+
+    def cancelEvents(self):
+        """ Cancel all queued events that have not been dispatched yet """
+        for t in self._eventTimers.values():
+            t.cancel()
+        self._eventTimers = {}
+        self._scheduledEvents = set()
+        self._pendingEvents = {}
+        self._lastEventTimes = {}
+        # invalidates any deferred event dispatches
+        self._eventId += 1
+
+    def _deferEvent(self, event, delay):
+        fnc = Callback(self._flushEvent, event, self._eventId)
+        if delay > 0:
+            t = threading.Timer(delay, backend.executeDeferred, [fnc])
+            t.daemon = True
+            self._eventTimers[event] = t
+            t.start()
+        else:
+            pm.evalDeferred(fnc, lowestPriority=True)
+
+    def _flushEvent(self, event, eventId):
+        """ Dispatch a queued event unless it fired again within its debounce interval """
+        if eventId != self._eventId:
+            return
+        self._eventTimers.pop(event, None)
+        count = self._pendingEvents.get(event, 0)
+        if count:
+            delay = self.eventDebounce.get(event, 0)
+            remaining = self._lastEventTimes[event] + delay - time.time()
+            if delay > 0 and remaining > 0:
+                self._deferEvent(event, remaining)
+                return
+        self._scheduledEvents.discard(event)
+        self._pendingEvents.pop(event, None)
+        if count:
+            self.scriptJobUpdate(event, count)
+
+    def scriptJobUpdate(self, event, count=1):
+        """
+        Call the current view's handler for the given event, and mark
+        any hidden views that track hidden events as dirty.
+        `count` -- the number of events that were collapsed into this call
+        """
         v = self.curView
         if v is not None:
-            fnc = getattr(v, event)
-            if hasattr(fnc, '__call__'):
-                fnc()
+            if v.hasEventHandler(event):
+                self.timeView(v.viewName, event, v.handleEvent, event, count)
+        if event == 'onWindowClosed':
+            return
+        for hv in self._viewInst.values():
+            if hv is not None and hv is not v and hv.trackHiddenEvents and hv.hasEventHandler(event):
+                hv.markDirty(event, count)
     
     def applyMetrics(self, m=None):
         """Set window size and position by editing the window prefs"""
@@ -218,22 +426,34 @@ class Gui(object):
             pm.windowPref(self.winName, e=True, tlc=m['tlc'])
     
     def winClosed(self):
+        ScriptJobHub.unsubscribe(self)
         self.deleteViews()
     
     def deleteViews(self):
         """ Delete all view instances """
+        self.cancelPrebuild()
         for viewName in self._viewInst.keys():
             self._viewInst[viewName] = None
+        self._viewHistory = []
+        self._controlCounts = {}
+        self.cancelEvents()
         self._curViewName = None
     
     def deleteView(self, viewName):
         if self.hasView(viewName):
             self._viewInst[viewName] = None
+            self._controlCounts.pop(viewName, None)
+            if viewName in self._viewHistory:
+                self._viewHistory.remove(viewName)
     
     def resetView(self, viewName):
         if self.hasView(viewName):
+            isCurrent = (viewName == self.curViewName)
+            if isCurrent:
+                self.hideCurView()
+                self._curViewName = None
             self.deleteView(viewName)
-            if viewName == self.curViewName:
+            if isCurrent:
                 self.showView(viewName)
     
     def showDefaultView(self):
@@ -254,11 +474,16 @@ class Gui(object):
         if v is None:
             self._createView(viewName)
             v = self.getView(viewName)
-        v.show()
+        self.timeView(viewName, 'show', v.show)
         # apply metrics
         if v.rememberMetrics and self._viewMetrics.has_key(viewName):
             self.applyMetrics(self._viewMetrics[viewName])
         self._curViewName = viewName
+        # move to the end of the recently shown list
+        if viewName in self._viewHistory:
+            self._viewHistory.remove(viewName)
+        self._viewHistory.append(viewName)
+        self.evictViews()
         LOG.debug('showed view {0}'.format(viewName))
     
     def _createView(self, viewName):
@@ -269,12 +494,12 @@ class Gui(object):
             c = self.getViewClass(viewName)
             v = c(self)
             with self._mainLayout:
-                v.create()
+                self.timeView(viewName, 'create', v.create)
             self._viewInst[viewName] = v
             if v.metrics is not None:
                 self._viewMetrics[viewName] = v.metrics.copy()
             # check if requires script jobs
-            for e in ('onSelectionChange', 'onSceneChange', 'onUndo', 'onRedo', 'onWindowClosed'):
+            for e in VIEW_EVENTS:
                 if hasattr(getattr(v, e), '__call__'):
                     self.setupScriptJob(e)
             LOG.debug('created view {0}'.format(viewName))
@@ -288,11 +513,203 @@ class Gui(object):
                     w = self._win.getWidth(),
                     h = self._win.getHeight()
                 )
-            v.hide()
+            self.timeView(self.curViewName, 'hide', v.hide)
+    
+    def timeView(self, viewName, key, fnc, *args):
+        """
+        Call fnc with the given args and record how long it took
+        as `key` in the stats of the given view, eg. 'create' or 'onUndo'.
+        """
+        if not self.profileViews:
+            return fnc(*args)
+        start = timer()
+        try:
+            return fnc(*args)
+        finally:
+            self.recordTiming(viewName, key, timer() - start)
+
+    def recordTiming(self, viewName, key, seconds):
+        stats = self._viewStats.setdefault(viewName, {})
+        if not stats.has_key(key):
+            stats[key] = TimingStats(self.statsHistory)
+        stats[key].add(seconds)
+
+    def viewStats(self, viewName):
+        """ Return a dict of {key: TimingStats} for the given view """
+        return self._viewStats.get(viewName, {}).copy()
+
+    def clearViewStats(self):
+        self._viewStats = {}
+
+    def slowestViews(self, limit=10, key='create'):
+        """
+        Return a list of (viewName, TimingStats) for the views with the
+        highest mean time for the given key, eg. create, build, buildHeader,
+        buildBody, show or hide.
+        """
+        results = [(k, v[key]) for k, v in self._viewStats.items() if v.has_key(key)]
+        results.sort(key=lambda x: -x[1].mean)
+        return results[:limit]
+
+    def slowestHandlers(self, limit=10):
+        """ Return a list of (viewName, event, TimingStats) for the slowest event handlers """
+        results = []
+        for viewName, stats in self._viewStats.items():
+            for event in VIEW_EVENTS:
+                if stats.has_key(event):
+                    results.append((viewName, event, stats[event]))
+        results.sort(key=lambda x: -x[2].mean)
+        return results[:limit]
+    
+    def evictViews(self):
+        """
+        Destroy the least recently shown hidden views until the number of
+        view instances and their estimated control count are within
+        maxCachedViews and maxCachedControls.
+        """
+        if self.maxCachedViews is None and self.maxCachedControls is None:
+            return
+        built = [n for n in self._viewHistory if self.getView(n) is not None]
+        counts = {}
+        if self.maxCachedControls is not None:
+            counts = self.getControlCounts(built)
+        total = sum(counts.values())
+        for n in list(built):
+            overViews = self.maxCachedViews is not None and len(built) > self.maxCachedViews
+            overControls = self.maxCachedControls is not None and total > self.maxCachedControls
+            if not overViews and not overControls:
+                break
+            if n == self.curViewName:
+                continue
+            self.getView(n).destroy()
+            self.deleteView(n)
+            built.remove(n)
+            total -= counts.get(n, 0)
+            LOG.debug('evicted view {0}'.format(n))
+    
+    def getControlCounts(self, viewNames):
+        """
+        Return a dict of {viewName: control count} for the given built views.
+        Counts are kept until the view is deleted, so all controls are only
+        listed when one of the views has not been counted yet.
+        """
+        missing = [n for n in viewNames if n not in self._controlCounts]
+        if len(missing):
+            allControls = cmds.lsUI(controls=True, controlLayouts=True, long=True) or []
+            for n in missing:
+                self._controlCounts[n] = self.getView(n).controlCount(allControls)
+        return dict([(n, self._controlCounts[n]) for n in viewNames])
+
+    def schedulePrebuild(self):
+        """
+        Schedule all persistent views marked for prebuilding to be
+        created one at a time during idle time, highest priority first.
+        Does nothing unless `prebuild` is enabled.
+        """
+        self.cancelPrebuild()
+        if not self.prebuild:
+            return
+        for i, c in enumerate(self.viewClasses):
+            if c.prebuild and c.persistent and self.getView(c.__name__) is None:
+                heapq.heappush(self._prebuildQueue, (-c.prebuildPriority, i, c.__name__))
+        if len(self._prebuildQueue):
+            self._deferPrebuild()
+    
+    def cancelPrebuild(self):
+        """ Cancel any views still waiting to be prebuilt """
+        self._prebuildQueue = []
+        # invalidates any deferred prebuild calls
+        self._prebuildId += 1
+    
+    def _deferPrebuild(self):
+        pm.evalDeferred(Callback(self._prebuildNext, self._prebuildId), lowestPriority=True)
+    
+    def _prebuildNext(self, prebuildId):
+        """ Create the next view in the prebuild queue and defer the rest """
+        if prebuildId != self._prebuildId or not len(self._prebuildQueue):
+            return
+        if self._mainLayout is None or not pm.layout(self._mainLayout, q=True, ex=True):
+            self.cancelPrebuild()
+            return
+        viewName = heapq.heappop(self._prebuildQueue)[2]
+        if self.getView(viewName) is None:
+            self._createView(viewName)
+            # prebuilt views have not been shown, so are evicted first
+            self._viewHistory.insert(0, viewName)
+            self.evictViews()
+            if self.getView(viewName) is None:
+                # no room left in the view cache
+                self.cancelPrebuild()
+                return
+            LOG.debug('prebuilt view {0}'.format(viewName))
+        if len(self._prebuildQueue):
+            self._deferPrebuild()
 
 ViewGui = Gui
 
 
+class ScriptJobHub(object):
+    """
+    Shares one script job per maya event between all gui instances.
+    Each job fans out to every subscribed gui, which are held by weak
+    reference and unsubscribed once they are deleted or no longer exist.
+    """
+
+    JOBS = {}
+    SUBSCRIBERS = {}
+
+    @staticmethod
+    def subscribe(mayaEvent, gui, event):
+        """ Queue the given view event on the gui whenever the maya event occurs """
+        subs = ScriptJobHub.SUBSCRIBERS.setdefault(mayaEvent, [])
+        for ref, e in subs:
+            if ref() is gui and e == event:
+                break
+        else:
+            subs.append((weakref.ref(gui), event))
+            LOG.debug('subscribed {0} to {1}'.format(event, mayaEvent))
+        ScriptJobHub.ensureJob(mayaEvent)
+
+    @staticmethod
+    def unsubscribe(gui, event=None):
+        """ Remove all subscriptions for the given gui, or only those for the given view event """
+        for mayaEvent in ScriptJobHub.SUBSCRIBERS.keys():
+            ScriptJobHub.SUBSCRIBERS[mayaEvent] = [s for s in ScriptJobHub.SUBSCRIBERS[mayaEvent]
+                if s[0]() is not gui or (event is not None and s[1] != event)]
+            ScriptJobHub.cleanup(mayaEvent)
+
+    @staticmethod
+    def ensureJob(mayaEvent):
+        """ Create the script job for the given maya event if it doesn't exist """
+        j = ScriptJobHub.JOBS.get(mayaEvent)
+        if j is None or not pm.scriptJob(ex=j):
+            ScriptJobHub.JOBS[mayaEvent] = pm.scriptJob(e=(mayaEvent, Callback(ScriptJobHub.fire, mayaEvent)))
+            LOG.debug('created shared script job for {0}'.format(mayaEvent))
+
+    @staticmethod
+    def cleanup(mayaEvent):
+        """ Kill the script job for the given maya event if it has no subscribers """
+        if len(ScriptJobHub.SUBSCRIBERS.get(mayaEvent, [])):
+            return
+        ScriptJobHub.SUBSCRIBERS.pop(mayaEvent, None)
+        j = ScriptJobHub.JOBS.pop(mayaEvent, None)
+        if j is not None and pm.scriptJob(ex=j):
+            pm.scriptJob(kill=j, force=True)
+            LOG.debug('killed shared script job for {0}'.format(mayaEvent))
+
+    @staticmethod
+    def fire(mayaEvent):
+        """ Send the given maya event to all live subscribers """
+        live = [s for s in ScriptJobHub.SUBSCRIBERS.get(mayaEvent, []) if s[0]() is not None and s[0]().exists]
+        ScriptJobHub.SUBSCRIBERS[mayaEvent] = live
+        for ref, event in list(live):
+            gui = ref()
+            if gui is not None:
+                gui.queueEvent(event)
+        ScriptJobHub.cleanup(mayaEvent)
+
+
+
 def IconCaptureGui(name='viewGuiIconCaptureWin', title='Capture Icon', size=(128, 128), cls=None):
     if cls is None:
         cls = view.IconCaptureView
@@ -372,6 +789,7 @@ class DockControl(Gui):
             self.showDefaultView()
 
         pm.scriptJob(uid=(self._win, Callback(self.winClosed)))
+        self.schedulePrebuild()
 
     def create(self):
         """ Show the dock control """
@@ -614,11 +1032,16 @@ class ScriptedPanel(Gui):
         self._win = self._mainLayout
         self.mainControl = self._mainLayout
         self.showDefaultView()
+        self.schedulePrebuild()
         pm.evalDeferred(self.refreshScriptJobs)
 
     def refreshScriptJobs(self):
         recreate = []
         for event in self._scriptJobs:
+            if EVENT_MAP.has_key(event):
+                # resubscribe in case the panel was unsubscribed while removed
+                recreate.append(event)
+                continue
             for j in self._scriptJobs[event]:
                 if not pm.scriptJob(ex=j):
                     recreate.append(event)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Base test case for running viewGui controls in a FakeBackend.
+
+The tests import the viewGui modules directly, so they can be run
+from the repository with `python -m unittest discover -s tests`.
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import backend
+
+
+class FakeTestCase(unittest.TestCase):
+    """ Runs each test inside a form layout of a new FakeBackend """
+
+    def setUp(self):
+        self.fake = backend.FakeBackend()
+        self._prevBackend = backend.setBackend(self.fake)
+        self.window = backend.pm.window()
+        self.form = backend.pm.formLayout()
+
+    def tearDown(self):
+        backend.setBackend(self._prevBackend)
+
+    def controlItems(self, ui):
+        """ Return the rows of the given textScrollList """
+        return list(self.fake.getControl(ui).items)
+
+    def controlSelection(self, ui):
+        """ Return the selected rows of the given textScrollList """
+        ctl = self.fake.getControl(ui)
+        return [ctl.items[i] for i in sorted(ctl.selected)]
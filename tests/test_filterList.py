@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import unittest
+
+from fakeTestCase import FakeTestCase
+import utils
+
+
+class TestFilterIndex(unittest.TestCase):
+
+    def testValues(self):
+        index = utils.FilterIndex({'a': ['c', 'a'], 'b': ['b', 'd'], 'c': 1})
+        self.assertEqual(index.run('a'), ['a', 'c'])
+        self.assertEqual(index.values(['b', 'a']), ['a', 'b', 'c', 'd'])
+        self.assertEqual(index.values(['a', 'a', 'x']), ['a', 'c'])
+        self.assertEqual(index.values(), ['1', 'a', 'b', 'c', 'd'])
+        self.assertEqual(index.values([]), index.values())
+
+    def testValidate(self):
+        index = utils.FilterIndex({'a': 'x', 'b': None}, validate=lambda v: [v.upper()] if v else [])
+        self.assertEqual(index.values(), ['X'])
+
+
+class TestFilterListCascade(FakeTestCase):
+
+    def setUp(self):
+        super(TestFilterListCascade, self).setUp()
+        self.kinds = utils.FilterList(items={'food': ['veg', 'fruit']})
+        self.names = utils.FilterList(parent=self.kinds, items={
+            'fruit': ['pear', 'apple'],
+            'veg': ['kale'],
+        })
+        self.colors = utils.FilterList(parent=self.names, items={
+            'apple': ['red', 'green'],
+            'pear': ['green'],
+            'kale': ['green'],
+        })
+        self.kinds.child = self.names
+        self.names.child = self.colors
+        self.updates = []
+        for lst in (self.names, self.colors):
+            self._countUpdates(lst)
+
+    def _countUpdates(self, lst):
+        refresh = lst._refresh
+        def countedRefresh():
+            self.updates.append(lst)
+            refresh()
+        lst._refresh = countedRefresh
+
+    def select(self, lst, items):
+        indeces = [lst.items.index(i) + 1 for i in items]
+        self.fake.selectListItems(lst.control, indeces)
+
+    def testCascade(self):
+        self.assertEqual(self.kinds.items, ['fruit', 'veg'])
+        self.select(self.kinds, ['fruit'])
+        self.assertEqual(self.names.items, ['apple', 'pear'])
+        self.assertEqual(self.controlItems(self.names.control), ['apple', 'pear'])
+        self.select(self.names, ['apple', 'pear'])
+        self.assertEqual(self.colors.items, ['green', 'green', 'red'])
+        self.select(self.kinds, ['veg'])
+        self.assertEqual(self.names.items, ['kale'])
+        self.assertEqual(self.names.selected, [])
+        # without a parent selection all values are shown
+        self.assertEqual(self.colors.items, ['green', 'green', 'green', 'red'])
+        self.select(self.names, ['kale'])
+        self.assertEqual(self.colors.items, ['green'])
+
+    def testSameSelectionDoesNotCascade(self):
+        self.select(self.kinds, ['fruit'])
+        self.assertEqual(self.updates, [self.names, self.colors])
+        del self.updates[:]
+        self.select(self.kinds, ['fruit'])
+        self.assertEqual(self.updates, [])
+
+    def testKeepSelectionAcrossParentChange(self):
+        self.select(self.kinds, ['fruit'])
+        self.select(self.names, ['pear'])
+        self.select(self.kinds, ['fruit', 'veg'])
+        self.assertEqual(self.names.items, ['apple', 'kale', 'pear'])
+        self.assertEqual(self.names.selected, ['pear'])
+        self.assertEqual(self.colors.items, ['green'])
+
+    def testUpdateClearsCache(self):
+        self.select(self.kinds, ['fruit'])
+        self.names.allItems['fruit'].append('fig')
+        self.names.update()
+        self.assertEqual(self.names.items, ['apple', 'fig', 'pear'])
+
+    def testCascadeReusesCache(self):
+        self.select(self.kinds, ['fruit'])
+        index = self.names.getIndex()
+        self.select(self.kinds, ['veg'])
+        self.select(self.kinds, ['fruit'])
+        self.assertIs(self.names.getIndex(), index)
+        self.names.allItems['fruit'].append('fig')
+        self.assertEqual(self.names.items, ['apple', 'pear'])
+
+    def testSearchReusesCache(self):
+        self.select(self.kinds, ['fruit'])
+        self.select(self.names, ['apple'])
+        index = self.colors.getIndex()
+        self.colors.searchFilter = 'gr'
+        self.assertEqual(self.colors.items, ['green'])
+        self.colors.searchFilter = None
+        self.assertEqual(self.colors.items, ['green', 'red'])
+        self.assertIs(self.colors.getIndex(), index)
+
+    def testSharedIndex(self):
+        index = utils.FilterIndex({'fruit': ['pear'], 'veg': ['kale']})
+        self.names.allItems = index
+        self.assertIs(self.names.getIndex(), index)
+        self.select(self.kinds, ['veg'])
+        self.assertEqual(self.names.items, ['kale'])
+
+
+if __name__ == '__main__':
+    unittest.main()
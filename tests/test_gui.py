@@ -0,0 +1,380 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import gc
+import time
+import unittest
+
+from fakeTestCase import FakeTestCase
+import backend
+import gui
+import view
+
+
+def makeView(name, **attrs):
+    """ Return a new View subclass with the given name and class attributes """
+    def buildBody(self):
+        backend.pm.button(l=self.viewName)
+    attrs.setdefault('buildBody', buildBody)
+    return type(name, (view.View,), attrs)
+
+
+class GuiTestCase(FakeTestCase):
+    """ Resets the shared script jobs around each test """
+
+    def setUp(self):
+        super(GuiTestCase, self).setUp()
+        self._resetHub()
+
+    def tearDown(self):
+        self._resetHub()
+        super(GuiTestCase, self).tearDown()
+
+    def _resetHub(self):
+        gui.ScriptJobHub.JOBS.clear()
+        gui.ScriptJobHub.SUBSCRIBERS.clear()
+
+    def makeGui(self, viewClasses, **kwargs):
+        g = gui.Gui(viewClasses=viewClasses, **kwargs)
+        g.create()
+        return g
+
+
+class TestGuiRegistry(GuiTestCase):
+
+    def setUp(self):
+        super(TestGuiRegistry, self).setUp()
+        self.A = makeView('A')
+        self.B = makeView('B')
+        self.gui = self.makeGui([self.A, self.B])
+
+    def testViewClasses(self):
+        self.assertEqual(self.gui.viewNames, ['A', 'B'])
+        self.assertIs(self.gui.getViewClass('B'), self.B)
+        self.assertIsNone(self.gui.getViewClass('C'))
+        self.assertTrue(self.gui.hasView('A'))
+        self.assertFalse(self.gui.hasView('C'))
+        self.assertEqual(self.gui.curViewName, 'A')
+        self.gui.viewClasses = [self.B, object]
+        self.assertEqual(self.gui.viewNames, ['B'])
+        self.assertEqual(sorted(self.gui.views), ['B'])
+
+    def testRegisterView(self):
+        C = makeView('C')
+        self.assertTrue(self.gui.registerView(C))
+        self.assertFalse(self.gui.registerView(object))
+        self.assertEqual(self.gui.viewNames, ['A', 'B', 'C'])
+        self.assertIsNone(self.gui.getView('C'))
+        self.gui.showView('C')
+        self.assertIsInstance(self.gui.curView, C)
+
+    def testReplaceCurrentView(self):
+        old = self.gui.curView
+        A = makeView('A')
+        self.assertTrue(self.gui.registerView(A))
+        self.assertEqual(self.gui.viewNames, ['A', 'B'])
+        self.assertIs(self.gui.getViewClass('A'), A)
+        self.assertIsInstance(self.gui.curView, A)
+        self.assertIsNot(self.gui.curView, old)
+
+    def testUnregisterView(self):
+        self.gui.defaultView = 'B'
+        self.gui.showView('A')
+        self.assertTrue(self.gui.unregisterView('A'))
+        self.assertFalse(self.gui.unregisterView('A'))
+        self.assertEqual(self.gui.viewNames, ['B'])
+        self.assertFalse(self.gui.hasView('A'))
+        self.assertNotIn('A', self.gui.views)
+        self.assertEqual(self.gui.curViewName, 'B')
+        self.assertTrue(self.gui.unregisterView('B'))
+        self.assertIsNone(self.gui.defaultView)
+        self.assertIsNone(self.gui.curView)
+
+
+class TestGuiPrebuild(GuiTestCase):
+
+    def setUp(self):
+        super(TestGuiPrebuild, self).setUp()
+        self.views = [
+            makeView('Main'),
+            makeView('Low', prebuild=True),
+            makeView('High', prebuild=True, prebuildPriority=10),
+            makeView('Temp', prebuild=True, persistent=False),
+        ]
+
+    def built(self, g):
+        return sorted([n for n, v in g.views.items() if v is not None])
+
+    def testPrebuildByPriority(self):
+        g = self.makeGui(self.views, prebuild=True)
+        self.assertEqual(self.built(g), ['Main'])
+        self.fake.processDeferred(limit=1)
+        self.assertEqual(self.built(g), ['High', 'Main'])
+        self.fake.processDeferred()
+        self.assertEqual(self.built(g), ['High', 'Low', 'Main'])
+        self.assertEqual(g.curViewName, 'Main')
+        self.assertFalse(g.getView('High').visible)
+
+    def testPrebuildDisabled(self):
+        g = self.makeGui(self.views)
+        self.fake.processDeferred()
+        self.assertEqual(self.built(g), ['Main'])
+
+    def testCancelPrebuild(self):
+        g = self.makeGui(self.views, prebuild=True)
+        self.fake.processDeferred(limit=1)
+        g.cancelPrebuild()
+        self.fake.processDeferred()
+        self.assertEqual(self.built(g), ['High', 'Main'])
+
+    def testRescheduleInvalidatesDeferredCalls(self):
+        g = self.makeGui(self.views, prebuild=True)
+        prebuildId = g._prebuildId
+        g.schedulePrebuild()
+        self.assertEqual(g._prebuildId, prebuildId + 1)
+        # the stale deferred call does nothing, the new one builds one view per call
+        self.assertEqual(self.fake.processDeferred(limit=2), 2)
+        self.assertEqual(self.built(g), ['High', 'Main'])
+        self.fake.processDeferred()
+        self.assertEqual(self.built(g), ['High', 'Low', 'Main'])
+
+    def testPrebuildSkipsBuiltViews(self):
+        g = self.makeGui(self.views, prebuild=True)
+        g.showView('High')
+        high = g.getView('High')
+        self.fake.processDeferred()
+        self.assertIs(g.getView('High'), high)
+        self.assertEqual(self.built(g), ['High', 'Low', 'Main'])
+
+    def testDeleteViewsCancelsPrebuild(self):
+        g = self.makeGui(self.views, prebuild=True)
+        g.deleteViews()
+        self.fake.processDeferred()
+        self.assertEqual(self.built(g), [])
+
+
+class TestGuiEviction(GuiTestCase):
+
+    def setUp(self):
+        super(TestGuiEviction, self).setUp()
+        def buildBody(self):
+            for i in range(self.buttons):
+                backend.pm.button(l=str(i))
+        self.views = [makeView(n, buttons=c, buildBody=buildBody) for n, c in (('A', 10), ('B', 20), ('C', 30))]
+
+    def built(self, g):
+        return sorted([n for n, v in g.views.items() if v is not None])
+
+    def testMaxCachedViews(self):
+        g = gui.Gui(viewClasses=self.views)
+        g.maxCachedViews = 2
+        g.create()
+        g.showView('B')
+        a = g.getView('A')
+        g.showView('A')
+        g.showView('C')
+        self.assertEqual(self.built(g), ['A', 'C'])
+        self.assertIs(g.getView('A'), a)
+        g.showView('B')
+        self.assertEqual(self.built(g), ['B', 'C'])
+        self.assertFalse(a.exists)
+
+    def testMaxCachedControls(self):
+        g = gui.Gui(viewClasses=self.views)
+        g.maxCachedControls = 50
+        g.create()
+        g.showView('B')
+        self.assertEqual(self.built(g), ['A', 'B'])
+        g.showView('C')
+        self.assertEqual(self.built(g), ['C'])
+        g.showView('A')
+        self.assertEqual(self.built(g), ['A', 'C'])
+
+    def testControlsAreCountedOnce(self):
+        g = gui.Gui(viewClasses=self.views)
+        g.maxCachedControls = 1000
+        g.create()
+        g.showView('B')
+        self.fake.resetCounts()
+        for i in range(3):
+            g.showView('A')
+            g.showView('B')
+        self.assertEqual(self.fake.counts[('lsUI', 'create')], 0)
+        g.showView('C')
+        self.assertEqual(self.fake.counts[('lsUI', 'create')], 1)
+        counts = g.getControlCounts(['A', 'B', 'C'])
+        self.assertTrue(counts['A'] < counts['B'] < counts['C'])
+
+    def testNoBudgetDoesNotCount(self):
+        g = self.makeGui(self.views)
+        self.fake.resetCounts()
+        g.showView('B')
+        g.showView('C')
+        self.assertEqual(self.fake.counts[('lsUI', 'create')], 0)
+        self.assertEqual(self.built(g), ['A', 'B', 'C'])
+
+
+class TestGuiEvents(GuiTestCase):
+
+    def setUp(self):
+        super(TestGuiEvents, self).setUp()
+        self.calls = []
+        calls = self.calls
+        def onSelectionChange(self, count=1):
+            calls.append(count)
+        self.A = makeView('A', onSelectionChange=onSelectionChange)
+
+    def fire(self, times=1):
+        for i in range(times):
+            self.fake.fireEvent('SelectionChanged')
+
+    def testCoalesceEvents(self):
+        self.makeGui([self.A])
+        self.fire(3)
+        self.assertEqual(self.calls, [])
+        self.fake.processDeferred()
+        self.assertEqual(self.calls, [3])
+        self.fire()
+        self.fake.processDeferred()
+        self.assertEqual(self.calls, [3, 1])
+
+    def testWithoutCoalescing(self):
+        g = self.makeGui([self.A])
+        g.coalesceEvents = False
+        self.fire(2)
+        self.assertEqual(self.calls, [1, 1])
+
+    def testDebounce(self):
+        g = self.makeGui([self.A])
+        g.eventDebounce = {'onSelectionChange': 0.05}
+        self.fire(2)
+        self.fake.processDeferred()
+        self.assertEqual(self.calls, [])
+        time.sleep(0.03)
+        self.fire()
+        time.sleep(0.03)
+        # the first timer fired, but the last event was too recent
+        self.fake.processDeferred()
+        self.assertEqual(self.calls, [])
+        time.sleep(0.1)
+        self.fake.processDeferred()
+        self.assertEqual(self.calls, [3])
+
+    def testDeleteViewsCancelsEvents(self):
+        g = self.makeGui([self.A])
+        g.eventDebounce = {'onSelectionChange': 0.05}
+        self.fire()
+        timers = list(g._eventTimers.values())
+        g.deleteViews()
+        self.assertTrue(all([t.finished.is_set() for t in timers]))
+        self.assertEqual(g._scheduledEvents, set())
+        time.sleep(0.1)
+        self.fake.processDeferred()
+        self.assertEqual(self.calls, [])
+
+    def testStaleFlushIsIgnored(self):
+        g = self.makeGui([self.A])
+        self.fire(2)
+        g.deleteViews()
+        g.showView('A')
+        self.fire()
+        self.fake.processDeferred()
+        self.assertEqual(self.calls, [1])
+
+
+class TestGuiProfiling(GuiTestCase):
+
+    def setUp(self):
+        super(TestGuiProfiling, self).setUp()
+        self.views = [makeView('A', onSelectionChange=lambda self: None), makeView('B')]
+
+    def testDisabledByDefault(self):
+        g = self.makeGui(self.views)
+        g.showView('B')
+        self.fake.fireEvent('SelectionChanged')
+        self.fake.processDeferred()
+        self.assertEqual(g.viewStats('A'), {})
+        self.assertEqual(g.slowestViews(), [])
+
+    def testProfileViews(self):
+        g = gui.Gui(viewClasses=self.views)
+        g.profileViews = True
+        g.create()
+        self.fake.fireEvent('SelectionChanged')
+        self.fake.processDeferred()
+        g.showView('B')
+        stats = g.viewStats('A')
+        for key in ('create', 'build', 'buildBody', 'show', 'hide', 'onSelectionChange'):
+            self.assertEqual(stats[key].calls, 1)
+        self.assertEqual(sorted([n for n, s in g.slowestViews()]), ['A', 'B'])
+        self.assertEqual([(n, e) for n, e, s in g.slowestHandlers()], [('A', 'onSelectionChange')])
+
+
+class Subscriber(object):
+    """ Records the events queued by the ScriptJobHub """
+
+    def __init__(self):
+        self.exists = True
+        self.events = []
+
+    def queueEvent(self, event):
+        self.events.append(event)
+
+
+class TestScriptJobHub(GuiTestCase):
+
+    def jobsFor(self, mayaEvent):
+        return [j for j, job in self.fake.jobs.items() if job.get('event') and job['event'][0] == mayaEvent]
+
+    def testShareOneJob(self):
+        a, b = Subscriber(), Subscriber()
+        gui.ScriptJobHub.subscribe('SelectionChanged', a, 'onSelectionChange')
+        gui.ScriptJobHub.subscribe('SelectionChanged', a, 'onSelectionChange')
+        gui.ScriptJobHub.subscribe('SelectionChanged', b, 'onSelectionChange')
+        self.assertEqual(len(self.jobsFor('SelectionChanged')), 1)
+        self.fake.fireEvent('SelectionChanged')
+        self.assertEqual(a.events, ['onSelectionChange'])
+        self.assertEqual(b.events, ['onSelectionChange'])
+
+    def testUnsubscribe(self):
+        a, b = Subscriber(), Subscriber()
+        gui.ScriptJobHub.subscribe('SelectionChanged', a, 'onSelectionChange')
+        gui.ScriptJobHub.subscribe('SelectionChanged', b, 'onSelectionChange')
+        gui.ScriptJobHub.unsubscribe(a)
+        self.fake.fireEvent('SelectionChanged')
+        self.assertEqual(a.events, [])
+        self.assertEqual(len(self.jobsFor('SelectionChanged')), 1)
+        gui.ScriptJobHub.unsubscribe(b)
+        self.assertEqual(self.jobsFor('SelectionChanged'), [])
+        self.assertNotIn('SelectionChanged', gui.ScriptJobHub.SUBSCRIBERS)
+
+    def testDropDeadSubscribers(self):
+        a, b = Subscriber(), Subscriber()
+        gui.ScriptJobHub.subscribe('SelectionChanged', a, 'onSelectionChange')
+        gui.ScriptJobHub.subscribe('SelectionChanged', b, 'onSelectionChange')
+        del a
+        gc.collect()
+        self.fake.fireEvent('SelectionChanged')
+        self.assertEqual(b.events, ['onSelectionChange'])
+        self.assertEqual(len(gui.ScriptJobHub.SUBSCRIBERS['SelectionChanged']), 1)
+        b.exists = False
+        self.fake.fireEvent('SelectionChanged')
+        self.assertEqual(b.events, ['onSelectionChange'])
+        self.assertEqual(self.jobsFor('SelectionChanged'), [])
+        self.assertNotIn('SelectionChanged', gui.ScriptJobHub.JOBS)
+
+    def testGuisShareJobs(self):
+        A = makeView('A', onSelectionChange=lambda self: None, onUndo=lambda self: None)
+        g1 = self.makeGui([A], name='gui1')
+        g2 = self.makeGui([A], name='gui2')
+        self.assertEqual(len(self.jobsFor('SelectionChanged')), 1)
+        self.assertEqual(len(self.jobsFor('Undo')), 1)
+        g1.winClosed()
+        self.assertEqual(len(self.jobsFor('SelectionChanged')), 1)
+        g2.winClosed()
+        self.assertEqual(self.jobsFor('SelectionChanged'), [])
+        self.assertEqual(self.jobsFor('Undo'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
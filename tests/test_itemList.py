@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import unittest
+
+from fakeTestCase import FakeTestCase
+import backend
+import utils
+
+
+class TestItemListBulk(FakeTestCase):
+
+    def edits(self):
+        return self.fake.counts[('textScrollList', 'edit')]
+
+    def testFillInChunks(self):
+        lst = utils.ItemList()
+        lst.appendChunkSize = 4
+        self.fake.resetCounts()
+        lst.items = [str(i) for i in range(10)]
+        self.assertEqual(self.edits(), 3)
+        self.assertEqual(self.controlItems(lst.control), [str(i) for i in range(10)])
+
+    def testReplaceKeepsSelection(self):
+        lst = utils.ItemList(items=['a', 'b', 'c', 'd', 'e'])
+        lst.selected = ['b', 'd']
+        self.fake.resetCounts()
+        lst.items = ['d', 'x', 'b', 'y']
+        self.assertEqual(self.controlItems(lst.control), ['d', 'x', 'b', 'y'])
+        self.assertEqual(self.controlSelection(lst.control), ['d', 'b'])
+        self.assertEqual(self.edits(), 1)
+
+    def testFormat(self):
+        lst = utils.ItemList(items=['a', 'b'], format='{index}. {name}')
+        self.assertEqual(self.controlItems(lst.control), ['1. a', '2. b'])
+        lst.selected = ['b']
+        self.assertEqual(self.controlSelection(lst.control), ['2. b'])
+
+    def testSetControlRows(self):
+        lst = utils.ItemList()
+        rows = [str(i) for i in range(10)]
+        lst._setControlRows(rows)
+        self.fake.resetCounts()
+        lst._setControlRows(rows[:4] + rows[5:])
+        self.assertEqual(self.edits(), 1)
+        lst._setControlRows(rows[:4] + ['x', 'y'] + rows[5:])
+        self.assertEqual(self.edits(), 2)
+        self.assertEqual(self.controlItems(lst.control), rows[:4] + ['x', 'y'] + rows[5:])
+        lst._setControlRows(rows[:4] + ['z'] + rows[5:])
+        self.assertEqual(self.edits(), 4)
+        self.assertEqual(self.controlItems(lst.control), rows[:4] + ['z'] + rows[5:])
+        self.fake.resetCounts()
+        lst._setControlRows(['a', 'b'])
+        self.assertEqual(self.edits(), 1)
+        self.assertEqual(self.controlItems(lst.control), ['a', 'b'])
+
+
+class TestItemListRows(FakeTestCase):
+
+    def testAppendIssuesOneCommand(self):
+        items = ['item{0:03d}'.format(i) for i in range(100)]
+        lst = utils.ItemList(items=items)
+        self.fake.resetCounts()
+        lst.append('new')
+        self.assertEqual(self.fake.commandCount, 1)
+        self.assertEqual(self.controlItems(lst.control), items + ['new'])
+
+    def testRemoveKeepsSelection(self):
+        lst = utils.ItemList(items=['a', 'b', 'c', 'd', 'e'])
+        lst.selected = ['a', 'd']
+        lst.items = ['a', 'b', 'd', 'e']
+        self.assertEqual(self.controlItems(lst.control), ['a', 'b', 'd', 'e'])
+        self.assertEqual(lst.selected, ['a', 'd'])
+        self.assertEqual(self.controlSelection(lst.control), ['a', 'd'])
+
+    def testInsertKeepsSelection(self):
+        lst = utils.ItemList(items=['a', 'b', 'c', 'd', 'e'])
+        lst.selected = ['d']
+        lst.items = ['a', 'b', 'x', 'c', 'd', 'e']
+        self.assertEqual(self.controlItems(lst.control), ['a', 'b', 'x', 'c', 'd', 'e'])
+        self.assertEqual(self.controlSelection(lst.control), ['d'])
+
+    def testReplaceAllRows(self):
+        lst = utils.ItemList(items=['a', 'b', 'c'])
+        lst.selected = ['b']
+        lst.items = ['x', 'b', 'y', 'z']
+        self.assertEqual(self.controlItems(lst.control), ['x', 'b', 'y', 'z'])
+        self.assertEqual(lst.selected, ['b'])
+
+    def testUnchangedItemsIssueNoCommands(self):
+        lst = utils.ItemList(items=['a', 'b', 'c'])
+        self.fake.resetCounts()
+        lst.update()
+        self.assertEqual(self.fake.commandCount, 0)
+
+
+class TestItemListSearch(FakeTestCase):
+
+    def testSearchFilter(self):
+        search = utils.SearchFilter('ab;cd')
+        self.assertEqual(search.terms, ('ab', 'cd'))
+        self.assertTrue(search.match('xabx'))
+        self.assertTrue(search.match('cd'))
+        self.assertFalse(search.match('ac'))
+        self.assertEqual(search.filter(['ab', 'ac', 'cd'], [2, 0, 1]), [2, 0])
+        self.assertTrue(utils.SearchFilter('a,').matchAll)
+
+    def testNarrows(self):
+        self.assertTrue(utils.SearchFilter('abc').narrows(utils.SearchFilter('ab')))
+        self.assertTrue(utils.SearchFilter('ab').narrows(utils.SearchFilter('ab ')))
+        self.assertFalse(utils.SearchFilter('ab').narrows(utils.SearchFilter('abc')))
+        self.assertFalse(utils.SearchFilter('ab cd').narrows(utils.SearchFilter('ab')))
+
+    def testTypingFilter(self):
+        lst = utils.ItemList(items=['cab', 'abc', 'bcd', 'abd', 'ab'])
+        results = []
+        for text in ['a', 'ab', 'abc', 'ab', '']:
+            lst.searchFilter = text
+            results.append(lst.items)
+        self.assertEqual(results, [
+            ['ab', 'abc', 'abd', 'cab'],
+            ['ab', 'abc', 'abd', 'cab'],
+            ['abc'],
+            ['ab', 'abc', 'abd', 'cab'],
+            ['ab', 'abc', 'abd', 'bcd', 'cab'],
+        ])
+        self.assertEqual(self.controlItems(lst.control), results[-1])
+
+    def testItemsChangeClearsSearchCache(self):
+        lst = utils.ItemList(items=['ab', 'cd'])
+        lst.searchFilter = 'a'
+        self.assertEqual(lst.items, ['ab'])
+        lst.items = ['ba', 'ac', 'cd']
+        self.assertEqual(lst.items, ['ac', 'ba'])
+        lst.searchFilter = 'ac'
+        self.assertEqual(lst.items, ['ac'])
+
+
+class TestVirtualItemList(FakeTestCase):
+
+    def setUp(self):
+        super(TestVirtualItemList, self).setUp()
+        self.items = ['item{0:02d}'.format(i) for i in range(25)]
+        self.lst = utils.VirtualItemList()
+        self.lst.pageSize = 10
+        self.lst.items = self.items
+
+    def testPages(self):
+        rows = self.controlItems(self.lst.control)
+        self.assertEqual(rows, self.items[:10] + ['... 15 more below'])
+        self.fake.selectListItems(self.lst.control, [11])
+        self.assertEqual(self.lst.offset, 10)
+        rows = self.controlItems(self.lst.control)
+        self.assertEqual(rows, ['... 10 more above'] + self.items[10:20] + ['... 5 more below'])
+        self.fake.selectListItems(self.lst.control, [12])
+        # the last page is full
+        self.assertEqual(self.lst.offset, 15)
+        rows = self.controlItems(self.lst.control)
+        self.assertEqual(rows, ['... 15 more above'] + self.items[15:])
+        self.fake.selectListItems(self.lst.control, [1])
+        self.assertEqual(self.lst.offset, 5)
+        self.assertEqual(self.lst.items, self.items)
+
+    def testSelectionAcrossPages(self):
+        selected = []
+        self.lst.selectCommand = lambda: selected.append(self.lst.selected)
+        self.fake.selectListItems(self.lst.control, [3])
+        self.assertEqual(selected, [['item02']])
+        self.lst.showNextPage()
+        self.assertEqual(self.controlSelection(self.lst.control), [])
+        self.fake.selectListItems(self.lst.control, [3])
+        self.assertEqual(self.lst.selected, ['item02', 'item11'])
+        self.lst.showPage(0)
+        self.assertEqual(self.controlSelection(self.lst.control), ['item02'])
+        self.assertEqual(self.lst.selectedIndeces, [2, 11])
+
+    def testSetSelection(self):
+        self.lst.selectedIndeces = [1, 24, 30]
+        self.assertEqual(self.lst.selectedIndeces, [1, 24])
+        self.assertEqual(self.controlSelection(self.lst.control), ['item01'])
+        self.lst.showIndex(24)
+        self.assertEqual(self.lst.offset, 15)
+        self.assertEqual(self.controlSelection(self.lst.control), ['item24'])
+
+    def testSearchShowsFirstPage(self):
+        self.lst.showPage(10)
+        self.lst.selected = ['item12', 'item03']
+        self.lst.searchFilter = 'item1'
+        self.assertEqual(self.lst.offset, 0)
+        self.assertEqual(self.controlItems(self.lst.control), self.items[10:20])
+        self.assertEqual(self.lst.selected, ['item12'])
+        self.lst.searchFilter = None
+        self.assertEqual(self.lst.selected, ['item12'])
+        self.assertEqual(self.lst.offset, 0)
+
+
+class TestItemListSelection(FakeTestCase):
+
+    def testFilterKeepsSelection(self):
+        lst = utils.ItemList(items=['b', 'a', 'c', 'd'])
+        lst.selected = ['c']
+        lst.searchFilter = 'c d'
+        self.assertEqual(lst.items, ['c', 'd'])
+        self.assertEqual(lst.selected, ['c'])
+        lst.searchFilter = ''
+        self.assertEqual(lst.selected, ['c'])
+        self.assertEqual(self.controlSelection(lst.control), ['c'])
+
+    def testLoadingRowIsNotSelectable(self):
+        lst = utils.ItemList()
+        lst.streamChunkSize = 2
+        lst.items = iter(['a', 'b', 'c'])
+        self.fake.processDeferred(limit=1)
+        self.assertTrue(lst.loading)
+        rows = self.controlItems(lst.control)
+        self.assertEqual(len(rows), 3)
+        lst.selectedIndeces = [0, 2]
+        self.assertEqual(lst.selectedIndeces, [0])
+        self.fake.selectListItems(lst.control, [1, 3])
+        self.assertEqual(lst.selected, ['a'])
+
+
+class TestItemListDelete(FakeTestCase):
+
+    def testDeleteRemovesSelectedRows(self):
+        deleted = []
+        lst = utils.ItemList(items=['a', 'b', 'a', 'c'])
+        lst.deleteCallback = deleted.append
+        lst.selectedIndeces = [2, 3]
+        self.fake.invoke(lst.control, 'dkc')
+        self.assertEqual(lst.items, ['a', 'b'])
+        self.assertEqual(deleted, [['a', 'c']])
+
+    def testDeleteFilteredRow(self):
+        lst = utils.ItemList(items=['b', 'a', 'c', 'a'])
+        lst.searchFilter = 'a'
+        self.assertEqual(lst.items, ['a', 'a'])
+        lst.selectedIndeces = [1]
+        self.fake.invoke(lst.control, 'dkc')
+        lst.searchFilter = None
+        self.assertEqual(lst.items, ['b', 'a', 'c'])
+
+
+class TestItemListStreaming(FakeTestCase):
+
+    def setUp(self):
+        super(TestItemListStreaming, self).setUp()
+        self.items = ['item{0:02d}'.format((i * 37) % 100) for i in range(100)]
+
+    def countSorts(self, lst):
+        """ Record the number of times all items are sorted """
+        sorts = []
+        getSortedIndeces = lst._getSortedIndeces
+        def countedGetSortedIndeces():
+            if lst._sortedIndeces is None:
+                sorts.append(len(lst._allItems))
+            return getSortedIndeces()
+        lst._getSortedIndeces = countedGetSortedIndeces
+        return sorts
+
+    def testStream(self):
+        progress = []
+        lst = utils.ItemList()
+        lst.streamChunkSize = 30
+        lst.progressCallback = lambda l, count, done: progress.append((count, done))
+        lst.items = iter(self.items)
+        self.fake.processDeferred()
+        self.assertFalse(lst.loading)
+        self.assertEqual(lst.items, self.items)
+        self.assertEqual(self.controlItems(lst.control), self.items)
+        self.assertEqual(progress, [(30, False), (60, False), (90, False), (100, True)])
+
+    def testStreamWhileSearching(self):
+        lst = utils.ItemList(searchFilter='item1 item2')
+        lst.streamChunkSize = 30
+        sorts = self.countSorts(lst)
+        lst.items = iter(self.items)
+        self.fake.processDeferred(limit=2)
+        self.assertTrue(lst.loading)
+        loaded = self.items[:60]
+        self.assertEqual(lst.items, sorted([i for i in loaded if i[4] in '12']))
+        self.fake.processDeferred()
+        self.assertEqual(lst.items, sorted([i for i in self.items if i[4] in '12']))
+        self.assertEqual(self.controlItems(lst.control), lst.items)
+        # only the first, empty list is sorted in full
+        self.assertEqual(sorts, [0])
+        lst.searchFilter = 'item3'
+        self.assertEqual(lst.items, ['item{0}'.format(i) for i in range(30, 40)])
+        self.assertEqual(sorts, [0])
+
+    def testCancelLoading(self):
+        lst = utils.ItemList()
+        lst.streamChunkSize = 30
+        lst.items = iter(self.items)
+        self.fake.processDeferred(limit=1)
+        lst.cancelLoading()
+        self.fake.processDeferred()
+        self.assertEqual(lst.items, self.items[:30])
+        self.assertEqual(self.controlItems(lst.control), self.items[:30])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from fakeTestCase import FakeTestCase
+import utils
+
+
+class CountingItem(utils.LibraryItem):
+    """ A LibraryItem that counts how many items were created from files """
+
+    created = 0
+
+    @classmethod
+    def fromFile(cls, filename):
+        item = super(CountingItem, cls).fromFile(filename)
+        if item is not None:
+            CountingItem.created += 1
+        return item
+
+    def getIndexData(self):
+        return {'name': os.path.basename(self.filename)}
+
+    def setIndexData(self, data):
+        self.indexData = data
+
+
+class OtherItem(CountingItem):
+    pass
+
+
+class TestLibraryIndex(FakeTestCase):
+
+    def setUp(self):
+        super(TestLibraryIndex, self).setUp()
+        CountingItem.created = 0
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'lib')
+        os.mkdir(self.path)
+        for i in range(5):
+            self.addFile('file{0}.ma'.format(i))
+        self.cacheDir = os.path.join(self.root, 'index')
+        self.index = utils.LibraryIndex(self.cacheDir)
+        self.lib = utils.LibraryLayout(itemClasses=[CountingItem])
+        self.lib.index = self.index
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        super(TestLibraryIndex, self).tearDown()
+
+    def addFile(self, name):
+        open(os.path.join(self.path, name), 'w').close()
+        self.setFolderAge(100)
+
+    def setFolderAge(self, age):
+        """ Set the modification time of the folder to the given number of seconds ago """
+        t = int(time.time()) - age
+        os.utime(self.path, (t, t))
+
+    def scan(self):
+        return sorted([os.path.basename(i.filename) for i in self.lib.getItemsForPath(self.path)])
+
+    def testScanSavesIndex(self):
+        self.assertEqual(self.scan(), ['file{0}.ma'.format(i) for i in range(5)])
+        self.assertEqual(CountingItem.created, 5)
+        self.assertTrue(os.path.isfile(self.index.getIndexFile(self.path)))
+        self.assertEqual(self.scan(), ['file{0}.ma'.format(i) for i in range(5)])
+        self.assertEqual(CountingItem.created, 5)
+
+    def testLoadFromDisk(self):
+        self.scan()
+        self.lib.index = utils.LibraryIndex(self.cacheDir)
+        items = self.lib.getItemsForPath(self.path)
+        self.assertEqual(CountingItem.created, 5)
+        self.assertEqual(sorted([i.indexData['name'] for i in items]),
+            ['file{0}.ma'.format(i) for i in range(5)])
+
+    def testFolderChangeInvalidates(self):
+        self.scan()
+        self.addFile('new.ma')
+        self.setFolderAge(50)
+        self.assertEqual(len(self.scan()), 6)
+        self.assertEqual(CountingItem.created, 11)
+        # the new scan is indexed again
+        self.scan()
+        self.assertEqual(CountingItem.created, 11)
+
+    def testRemovedFileInvalidates(self):
+        self.scan()
+        os.remove(os.path.join(self.path, 'file0.ma'))
+        self.setFolderAge(50)
+        self.assertEqual(self.scan(), ['file{0}.ma'.format(i) for i in range(1, 5)])
+
+    def testMtimeMismatch(self):
+        self.scan()
+        mtime = os.stat(self.path).st_mtime
+        self.assertNotEqual(self.index.getItems(self.path, mtime, [CountingItem]), None)
+        self.assertEqual(self.index.getItems(self.path, mtime + 1, [CountingItem]), None)
+
+    def testItemClassesInvalidate(self):
+        self.scan()
+        mtime = os.stat(self.path).st_mtime
+        self.assertEqual(self.index.getItems(self.path, mtime, [OtherItem]), None)
+        self.assertEqual(self.index.getItems(self.path, mtime, [CountingItem, OtherItem]), None)
+
+    def testRecentFolderNotSaved(self):
+        self.setFolderAge(0)
+        self.scan()
+        self.scan()
+        self.assertEqual(CountingItem.created, 10)
+        self.assertFalse(os.path.isfile(self.index.getIndexFile(self.path)))
+
+    def testClear(self):
+        self.scan()
+        self.index.clear(self.path)
+        self.assertFalse(os.path.isfile(self.index.getIndexFile(self.path)))
+        self.scan()
+        self.assertEqual(CountingItem.created, 10)
+        self.index.clear()
+        self.assertEqual(os.listdir(self.cacheDir), [])
+
+    def testCorruptIndex(self):
+        self.scan()
+        with open(self.index.getIndexFile(self.path), 'w') as fp:
+            fp.write('{not json')
+        self.lib.index = utils.LibraryIndex(self.cacheDir)
+        self.assertEqual(len(self.scan()), 5)
+        self.assertEqual(CountingItem.created, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
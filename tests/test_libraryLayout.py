@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from fakeTestCase import FakeTestCase
+import utils
+
+
+class LibraryTestCase(FakeTestCase):
+    """ Creates a LibraryLayout for two directories of files """
+
+    fileCount = 20
+
+    def setUp(self):
+        super(LibraryTestCase, self).setUp()
+        self.root = tempfile.mkdtemp()
+        self.dirs = []
+        for d in range(2):
+            path = os.path.join(self.root, 'dir{0}'.format(d))
+            os.mkdir(path)
+            for i in range(self.fileCount):
+                open(os.path.join(path, 'file{0:04d}.ma'.format(i)), 'w').close()
+            self.dirs.append(path)
+        self.lib = utils.LibraryLayout()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        super(LibraryTestCase, self).tearDown()
+
+    def gridChildren(self, path):
+        """ Return the names of the widgets in the grid of the given path """
+        section = self.lib._sections[path]
+        return sorted([c.name for c in self.fake.getControl(str(section['grid'])).children])
+
+    def sectionWidgets(self, path):
+        """ Return the names of the widgets of the items in the section of the given path """
+        section = self.lib._sections[path]
+        return sorted([self.fake.getControl(str(i.widget)).name for i in section['items']])
+
+    def assertSectionsBuilt(self):
+        for p in self.lib._sectionOrder:
+            self.assertEqual(self.gridChildren(p), self.sectionWidgets(p))
+
+    def widgets(self):
+        return dict([(i.filename, str(i.widget)) for i in self.lib.allItems() if i.widget is not None])
+
+
+class TestLibraryLayoutUpdate(LibraryTestCase):
+
+    def setUp(self):
+        super(TestLibraryLayoutUpdate, self).setUp()
+        self.lib.paths = self.dirs
+
+    def testBuild(self):
+        self.assertEqual(self.lib._sectionOrder, self.dirs)
+        for p in self.dirs:
+            self.assertEqual(len(self.gridChildren(p)), self.fileCount)
+        self.assertSectionsBuilt()
+
+    def testRenameKeepsOtherWidgets(self):
+        before = self.widgets()
+        old = os.path.join(self.dirs[0], 'file0005.ma')
+        new = os.path.join(self.dirs[0], 'renamed.ma')
+        os.rename(old, new)
+        self.lib.update()
+        after = self.widgets()
+        self.assertNotIn(old, after)
+        self.assertIn(new, after)
+        del before[old], after[new]
+        self.assertEqual(before, after)
+        self.assertSectionsBuilt()
+
+    def testItemFilter(self):
+        before = self.widgets()
+        self.lib.itemFilter = lambda i: '1' not in i.name
+        self.lib.updateContent()
+        self.assertEqual(len(self.gridChildren(self.dirs[0])), 9)
+        self.assertSectionsBuilt()
+        self.lib.itemFilter = None
+        self.lib.updateContent()
+        self.assertSectionsBuilt()
+        after = self.widgets()
+        self.assertEqual(len(after), len(before))
+        kept = [f for f in before if '1' not in os.path.basename(f)]
+        self.assertEqual([after[f] for f in kept], [before[f] for f in kept])
+
+    def testColumns(self):
+        before = self.widgets()
+        self.lib.columns = 4
+        self.assertEqual(self.widgets(), before)
+        section = self.lib._sections[self.dirs[0]]
+        items = section['items']
+        self.assertEqual(section['attach'][items[5]], (items[4], items[1]))
+        self.assertEqual(section['attach'][items[4]], (None, items[0]))
+
+    def testPathFilter(self):
+        self.lib.pathFilter = lambda p: p != self.dirs[0]
+        self.lib.updateContent()
+        self.assertEqual(self.lib._sectionOrder, self.dirs[1:])
+        self.assertEqual(list(self.lib._sections), self.dirs[1:])
+        self.lib.pathFilter = None
+        self.lib.updateContent()
+        self.assertEqual(self.lib._sectionOrder, self.dirs)
+        self.assertSectionsBuilt()
+
+
+class TestLibraryLayoutVirtual(LibraryTestCase):
+
+    fileCount = 300
+
+    def setUp(self):
+        super(TestLibraryLayoutVirtual, self).setUp()
+        self.scroll = self.fake.getControl(str(self.lib.scrollLayout))
+        self.scroll.flags['scrollAreaValue'] = [0, 0]
+        self.scroll.flags['scrollAreaHeight'] = 400
+        # the tests update the visible rows directly instead of polling the scroll position
+        self.lib._scrollWatched = True
+        self.lib.virtual = True
+        self.lib.paths = self.dirs
+
+    def builtRows(self, path):
+        height = self.lib.getCellSize()[1]
+        section = self.lib._sections[path]
+        return sorted(set([pos[1] // height for pos in section['attach'].values()]))
+
+    def testOnlyVisibleRowsAreBuilt(self):
+        columns = self.lib.columns
+        height = self.lib.getCellSize()[1]
+        rowCount = int(math.ceil(self.fileCount / float(columns)))
+        for p in self.dirs:
+            self.assertEqual(self.lib._sections[p]['height'], rowCount * height)
+        rows = self.builtRows(self.dirs[0])
+        self.assertEqual(rows[0], 0)
+        self.assertTrue(len(rows) < rowCount)
+        self.assertEqual(self.builtRows(self.dirs[1]), [])
+        self.assertEqual(len(self.widgets()), len(rows) * columns)
+        self.assertSectionsBuilt()
+
+    def scrollTo(self, value):
+        self.scroll.flags['scrollAreaValue'] = [value, 0]
+        self.lib.updateVisibleRows()
+
+    def testScrollRecyclesWidgets(self):
+        height = self.lib.getCellSize()[1]
+        self.scrollTo(height * 20)
+        rows = self.builtRows(self.dirs[0])
+        self.assertTrue(rows[0] > 0)
+        self.assertEqual(len(self.widgets()), len(rows) * self.lib.columns)
+        before = self.widgets()
+        controls = len(self.fake.controls)
+        self.scrollTo(height * 23)
+        self.assertEqual(self.builtRows(self.dirs[0]), [r + 3 for r in rows])
+        after = self.widgets()
+        self.assertEqual(len(after), len(before))
+        self.assertEqual(len(self.fake.controls), controls)
+        self.assertEqual(sorted(after.values()), sorted(before.values()))
+        self.assertSectionsBuilt()
+
+    def testDisableVirtual(self):
+        self.lib.virtual = False
+        self.assertEqual(len(self.widgets()), self.fileCount * 2)
+        self.assertSectionsBuilt()
+
+
+
+class TestLibraryLayoutScan(LibraryTestCase):
+
+    def setUp(self):
+        super(TestLibraryLayoutScan, self).setUp()
+        self.lib.asyncScan = True
+        self.scans = []
+        self.lib.scanCallback = lambda lib, path, count, done: self.scans.append((path, count, done))
+        # block the scan of the second path until released
+        self.release = threading.Event()
+        getItemsForPath = self.lib.getItemsForPath
+        def blockingGetItems(path):
+            if path == self.dirs[1]:
+                self.release.wait(5)
+            return getItemsForPath(path)
+        self.lib.getItemsForPath = blockingGetItems
+
+    def tearDown(self):
+        self.release.set()
+        self.lib.cancelScan()
+        super(TestLibraryLayoutScan, self).tearDown()
+
+    def waitForScan(self, path):
+        """ Process deferred results until the given path is no longer scanning """
+        end = time.time() + 5
+        while path in self.lib._scanning and time.time() < end:
+            time.sleep(0.01)
+            self.fake.processDeferred()
+        self.assertFalse(path in self.lib._scanning)
+
+    def itemCount(self, path):
+        return len(self.lib._items.get(path, []))
+
+    def testScanPaths(self):
+        self.lib.paths = self.dirs
+        self.waitForScan(self.dirs[0])
+        self.assertEqual(self.itemCount(self.dirs[0]), self.fileCount)
+        self.assertTrue(self.lib.scanning)
+        self.assertEqual(self.itemCount(self.dirs[1]), 0)
+        self.release.set()
+        self.waitForScan(self.dirs[1])
+        self.assertFalse(self.lib.scanning)
+        self.assertEqual(self.itemCount(self.dirs[1]), self.fileCount)
+        self.assertEqual([s for s in self.scans if s[2]],
+            [(self.dirs[0], self.fileCount, True), (self.dirs[1], self.fileCount, True)])
+
+    def testUpdateKeepsOtherScans(self):
+        self.lib.paths = self.dirs
+        self.waitForScan(self.dirs[0])
+        # rescan the first path while the second is still scanning
+        open(os.path.join(self.dirs[0], 'extra.ma'), 'w').close()
+        self.lib.update(self.dirs[0])
+        self.assertTrue(self.dirs[1] in self.lib._scanning)
+        self.waitForScan(self.dirs[0])
+        self.assertEqual(self.itemCount(self.dirs[0]), self.fileCount + 1)
+        self.release.set()
+        self.waitForScan(self.dirs[1])
+        self.assertEqual(self.itemCount(self.dirs[1]), self.fileCount)
+
+    def testRescanReplacesPendingScan(self):
+        self.lib.paths = self.dirs
+        scanId = self.lib._scanning[self.dirs[1]]
+        self.lib.update(self.dirs[1])
+        self.assertNotEqual(self.lib._scanning[self.dirs[1]], scanId)
+        self.assertFalse(self.lib.isScanCurrent(scanId, self.dirs[1]))
+        self.release.set()
+        self.waitForScan(self.dirs[1])
+        self.assertEqual(self.itemCount(self.dirs[1]), self.fileCount)
+        self.assertEqual(len([s for s in self.scans if s[0] == self.dirs[1] and s[2]]), 1)
+
+    def testRemovedPathCancelsScan(self):
+        self.lib.paths = self.dirs
+        self.lib.paths = self.dirs[:1]
+        self.assertFalse(self.dirs[1] in self.lib._scanning)
+        self.release.set()
+        self.waitForScan(self.dirs[0])
+        self.assertFalse(self.lib.scanning)
+        self.assertFalse(self.dirs[1] in self.lib._items)
+
+    def testCancelScan(self):
+        self.lib.paths = self.dirs
+        self.lib.cancelScan()
+        self.assertFalse(self.lib.scanning)
+        self.release.set()
+        time.sleep(0.1)
+        self.fake.processDeferred()
+        self.assertEqual(self.itemCount(self.dirs[0]), 0)
+        self.assertEqual(self.itemCount(self.dirs[1]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import gc
+import sys
+import types
+import unittest
+
+from fakeTestCase import FakeTestCase
+import utils
+
+
+class FakeOpenMaya(types.ModuleType):
+    """ Records the callbacks installed through maya.OpenMaya """
+
+    def __init__(self):
+        super(FakeOpenMaya, self).__init__('maya.OpenMaya')
+        self.callbacks = {}
+        self._nextId = 1
+        om = self
+        class MObject(object):
+            pass
+        class MNodeMessage(object):
+            @staticmethod
+            def addNameChangedCallback(obj, fnc):
+                return om.addCallback('nameChanged', fnc)
+        class MDGMessage(object):
+            @staticmethod
+            def addNodeRemovedCallback(fnc, nodeType):
+                return om.addCallback('nodeRemoved', fnc)
+        class MMessage(object):
+            @staticmethod
+            def removeCallback(callbackId):
+                del om.callbacks[callbackId]
+        self.MObject = MObject
+        self.MNodeMessage = MNodeMessage
+        self.MDGMessage = MDGMessage
+        self.MMessage = MMessage
+
+    def addCallback(self, kind, fnc):
+        callbackId = self._nextId
+        self._nextId += 1
+        self.callbacks[callbackId] = (kind, fnc)
+        return callbackId
+
+    def kinds(self):
+        return sorted([kind for kind, fnc in self.callbacks.values()])
+
+    def fire(self, kind):
+        for k, fnc in list(self.callbacks.values()):
+            if k == kind:
+                fnc()
+
+
+class Subscriber(object):
+
+    def __init__(self):
+        self.changes = 0
+
+    def nodeNamesChanged(self):
+        self.changes += 1
+
+
+class TestNodeNameCache(FakeTestCase):
+
+    def setUp(self):
+        super(TestNodeNameCache, self).setUp()
+        self.om = FakeOpenMaya()
+        self._modules = dict([(k, sys.modules.get(k)) for k in ('maya', 'maya.OpenMaya')])
+        maya = types.ModuleType('maya')
+        maya.OpenMaya = self.om
+        sys.modules['maya'] = maya
+        sys.modules['maya.OpenMaya'] = self.om
+        self.lsCalls = []
+        self.nodes = {'id1': 'pCube1', 'id2': 'pSphere1'}
+        # answer cmds.ls from the nodes dict
+        self.fake.cmds._cache['ls'] = self.ls
+
+    def tearDown(self):
+        utils.NodeNameCache.SUBSCRIBERS = []
+        utils.NodeNameCache.CALLBACK_IDS = []
+        utils.NodeNameCache.PENDING = False
+        utils.NodeNameCache.clear()
+        for k, module in self._modules.items():
+            if module is None:
+                sys.modules.pop(k, None)
+            else:
+                sys.modules[k] = module
+        super(TestNodeNameCache, self).tearDown()
+
+    def ls(self, names, long=False, uuid=False):
+        self.lsCalls.append(list(names))
+        if uuid:
+            ids = dict([(v, k) for k, v in self.nodes.items()])
+            return [ids[n] for n in names if n in ids]
+        return [self.nodes[n] for n in names if n in self.nodes]
+
+    def testCallbacksFollowSubscribers(self):
+        a, b = Subscriber(), Subscriber()
+        utils.NodeNameCache.subscribe(a)
+        utils.NodeNameCache.subscribe(b)
+        self.assertEqual(self.om.kinds(), ['nameChanged', 'nodeRemoved'])
+        utils.NodeNameCache.unsubscribe(a)
+        self.assertEqual(len(self.om.callbacks), 2)
+        utils.NodeNameCache.unsubscribe(b)
+        self.assertEqual(self.om.callbacks, {})
+        self.assertEqual(utils.NodeNameCache.CALLBACK_IDS, [])
+
+    def testDeadSubscribersRemoveCallbacks(self):
+        a = Subscriber()
+        utils.NodeNameCache.subscribe(a)
+        del a
+        gc.collect()
+        self.om.fire('nameChanged')
+        self.fake.processDeferred()
+        self.assertEqual(utils.NodeNameCache.SUBSCRIBERS, [])
+        self.assertEqual(self.om.callbacks, {})
+
+    def testNotifyOncePerIdle(self):
+        a = Subscriber()
+        utils.NodeNameCache.subscribe(a)
+        self.om.fire('nameChanged')
+        self.om.fire('nodeRemoved')
+        self.assertEqual(a.changes, 0)
+        self.fake.processDeferred()
+        self.assertEqual(a.changes, 1)
+
+    def testCacheNames(self):
+        a = Subscriber()
+        utils.NodeNameCache.subscribe(a)
+        names = utils.NodeNameCache.getNames(['id1', 'id2', None, 'id3'])
+        self.assertEqual(names, ['pCube1', 'pSphere1', None, None])
+        del self.lsCalls[:]
+        self.assertEqual(utils.NodeNameCache.getNames(['id2', 'id1']), ['pSphere1', 'pCube1'])
+        self.assertEqual(self.lsCalls, [])
+        self.nodes['id1'] = 'box'
+        self.om.fire('nameChanged')
+        self.assertEqual(utils.NodeNameCache.getNames(['id1', 'id2']), ['box', 'pSphere1'])
+        # long names are not cached
+        del self.lsCalls[:]
+        utils.NodeNameCache.getNames(['id1'], long=True)
+        utils.NodeNameCache.getNames(['id1'], long=True)
+        self.assertEqual(len(self.lsCalls), 4)
+
+    def testNoCacheWithoutSubscribers(self):
+        self.assertEqual(utils.NodeNameCache.getNames(['id1']), ['pCube1'])
+        self.assertEqual(self.om.callbacks, {})
+        self.assertEqual(utils.NodeNameCache.NAMES, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import os
+import shutil
+import struct
+import tempfile
+import time
+import unittest
+import zlib
+
+from fakeTestCase import FakeTestCase
+import thumbnails
+import utils
+
+
+def makePixels(width, height, channels):
+    """ Return a bytearray of varied pixel values """
+    return bytearray([(x * 7 + y * 13 + c * 50) & 0xff
+        for y in range(height) for x in range(width) for c in range(channels)])
+
+def filterLine(filterType, line, prev, bpp):
+    """ Apply a png filter to the given line """
+    result = bytearray(len(line))
+    for i in range(len(line)):
+        a = line[i-bpp] if i >= bpp else 0
+        b = prev[i]
+        c = prev[i-bpp] if i >= bpp else 0
+        if filterType == 1:
+            pred = a
+        elif filterType == 2:
+            pred = b
+        elif filterType == 3:
+            pred = (a + b) >> 1
+        else:
+            p = a + b - c
+            pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+            pred = a if pa <= pb and pa <= pc else (b if pb <= pc else c)
+        result[i] = (line[i] - pred) & 0xff
+    return result
+
+
+class TestPng(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.filename = os.path.join(self.root, 'image.png')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def testRoundTrip(self):
+        for channels in (1, 2, 3, 4):
+            pixels = makePixels(5, 3, channels)
+            thumbnails.writePng(self.filename, 5, 3, channels, pixels)
+            self.assertEqual(thumbnails.readPng(self.filename), (5, 3, channels, pixels))
+
+    def testFilters(self):
+        width, height, channels = 6, 5, 3
+        pixels = makePixels(width, height, channels)
+        stride = width * channels
+        raw = bytearray()
+        prev = bytearray(stride)
+        for y in range(height):
+            line = pixels[y*stride:(y+1)*stride]
+            raw.append(y)
+            raw.extend(line if y == 0 else filterLine(y, line, prev, channels))
+            prev = line
+        def chunk(kind, data):
+            crc = zlib.crc32(kind + data) & 0xffffffff
+            return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', crc)
+        with open(self.filename, 'wb') as fp:
+            fp.write(thumbnails.PNG_SIGNATURE)
+            fp.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+            fp.write(chunk(b'IDAT', zlib.compress(bytes(raw))))
+            fp.write(chunk(b'IEND', b''))
+        self.assertEqual(thumbnails.readPng(self.filename), (width, height, channels, pixels))
+
+    def testUnsupported(self):
+        with open(self.filename, 'wb') as fp:
+            fp.write(b'not a png')
+        self.assertRaises(ValueError, thumbnails.readPng, self.filename)
+
+    def testScalePixels(self):
+        pixels = bytearray([
+            0, 2, 10, 20,
+            4, 6, 30, 40,
+            1, 1, 5, 5,
+            1, 1, 5, 5,
+        ])
+        self.assertEqual(thumbnails.scalePixels(4, 4, 1, pixels, 2), (2, 2, bytearray([3, 25, 1, 5])))
+        # images that already fit are unchanged
+        self.assertEqual(thumbnails.scalePixels(4, 4, 1, pixels, 4), (4, 4, pixels))
+
+    def testScalePixelsChannels(self):
+        pixels = makePixels(9, 4, 4)
+        width, height, result = thumbnails.scalePixels(9, 4, 4, pixels, 3)
+        self.assertEqual((width, height, len(result)), (3, 1, 12))
+        # the alpha of the first pixel is the average of its 3x3 box
+        box = [pixels[(y * 9 + x) * 4 + 3] for y in range(3) for x in range(3)]
+        self.assertEqual(result[3], sum(box) // 9)
+
+    @unittest.skipIf(thumbnails.Image is not None, 'the pure python scaling is only used without PIL')
+    def testScaleImage(self):
+        thumbnails.writePng(self.filename, 64, 32, 4, makePixels(64, 32, 4))
+        thumb = os.path.join(self.root, 'thumb.png')
+        thumbnails.scaleImage(self.filename, thumb, 16)
+        self.assertEqual(thumbnails.readPng(thumb)[:3], (16, 8, 4))
+        # small or unreadable images are copied
+        thumbnails.scaleImage(self.filename, thumb, 64)
+        self.assertEqual(open(thumb, 'rb').read(), open(self.filename, 'rb').read())
+        other = os.path.join(self.root, 'other.png')
+        with open(other, 'wb') as fp:
+            fp.write(b'data')
+        thumbnails.scaleImage(other, thumb, 16)
+        self.assertEqual(open(thumb, 'rb').read(), b'data')
+
+
+class TestThumbnailCache(FakeTestCase):
+
+    def setUp(self):
+        super(TestThumbnailCache, self).setUp()
+        self.root = tempfile.mkdtemp()
+        self.cache = thumbnails.ThumbnailCache(os.path.join(self.root, 'cache'))
+        self.filename = os.path.join(self.root, 'scene.ma')
+        open(self.filename, 'w').close()
+        self.icon = utils.getIconFilename(self.filename)
+        self.writeIcon(100)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        super(TestThumbnailCache, self).tearDown()
+
+    def writeIcon(self, age):
+        """ Write the icon with a modification time of the given number of seconds ago """
+        thumbnails.writePng(self.icon, 200, 200, 3, makePixels(200, 200, 3))
+        t = int(time.time()) - age
+        os.utime(self.icon, (t, t))
+
+    def waitForThumbnails(self):
+        """ Process deferred callbacks until no thumbnails are pending """
+        end = time.time() + 5
+        while time.time() < end:
+            self.fake.processDeferred()
+            if not self.cache._pending:
+                break
+            time.sleep(0.01)
+        self.fake.processDeferred()
+        self.assertEqual(self.cache._pending, {})
+
+    def testGetBucket(self):
+        self.assertEqual(self.cache.getBucket(10), 32)
+        self.assertEqual(self.cache.getBucket(32), 32)
+        self.assertEqual(self.cache.getBucket(33), 64)
+        self.assertEqual(self.cache.getBucket(256), 256)
+        self.assertEqual(self.cache.getBucket(257), None)
+
+    def testThumbnailFilename(self):
+        name = self.cache.getThumbnailFilename(self.icon, 100.0, 64)
+        self.assertEqual(name, self.cache.getThumbnailFilename(self.icon, 100.0, 64))
+        self.assertNotEqual(name, self.cache.getThumbnailFilename(self.icon, 101.0, 64))
+        self.assertNotEqual(name, self.cache.getThumbnailFilename(self.icon, 100.0, 32))
+
+    def testGetThumbnail(self):
+        results = []
+        self.assertEqual(self.cache.getThumbnail(self.icon, 50, results.append), None)
+        self.waitForThumbnails()
+        self.assertEqual(len(results), 1)
+        self.assertEqual(self.cache.getThumbnail(self.icon, 50), results[0])
+        self.assertTrue(max(thumbnails.readPng(results[0])[:2]) <= 64)
+        # large sizes use the icon
+        self.assertEqual(self.cache.getThumbnail(self.icon, 300), self.icon)
+
+    def testIconItemFollowsIconChanges(self):
+        item = utils.LibraryIconItem(self.filename, size=50)
+        item.thumbnails = self.cache
+        self.assertEqual(item.getIconImage(), item.defaultIcon)
+        self.waitForThumbnails()
+        first = item.getIconImage()
+        self.assertTrue(os.path.isfile(first))
+        self.assertNotEqual(first, self.icon)
+        # a modified icon gets a new thumbnail
+        self.writeIcon(50)
+        self.assertEqual(item.getIconImage(), item.defaultIcon)
+        self.waitForThumbnails()
+        second = item.getIconImage()
+        self.assertTrue(os.path.isfile(second))
+        self.assertNotEqual(second, first)
+
+
+if __name__ == '__main__':
+    unittest.main()
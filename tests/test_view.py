@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import unittest
+
+from fakeTestCase import FakeTestCase
+
+import view
+
+
+class FakeGui(object):
+    def showView(self, viewName):
+        pass
+
+
+class EventView(view.View):
+    def __init__(self, gui):
+        super(EventView, self).__init__(gui)
+        self.calls = []
+
+    def onSelectionChange(self, force=False):
+        self.calls.append(('onSelectionChange', force))
+
+    def onSceneChange(self, count=1):
+        self.calls.append(('onSceneChange', count))
+
+
+class TestViewEvents(FakeTestCase):
+
+    def setUp(self):
+        super(TestViewEvents, self).setUp()
+        self.view = EventView(FakeGui())
+
+    def testHandlerWithoutCountArgument(self):
+        self.view.handleEvent('onSelectionChange', 3)
+        self.assertEqual(self.view.calls, [('onSelectionChange', False)])
+
+    def testHandlerWithCountArgument(self):
+        self.view.handleEvent('onSceneChange', 3)
+        self.assertEqual(self.view.calls, [('onSceneChange', 3)])
+
+    def testCatchUp(self):
+        self.view.markDirty('onSelectionChange', 2)
+        self.view.markDirty('onSceneChange', 2)
+        self.view.markDirty('onSceneChange')
+        self.view.onCatchUp(self.view._dirtyEvents)
+        self.assertEqual(self.view.calls, [('onSceneChange', 3), ('onSelectionChange', False)])
+
+
+if __name__ == '__main__':
+    unittest.main()
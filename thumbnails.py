@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+viewGui.thumbnails
+
+Downscaled copies of icons, created in the background and cached on disk.
+PIL is used to scale icons when it is available, otherwise 8-bit png files
+are scaled in pure python.
+"""
+
+import backend
+import hashlib
+import logging
+import math
+import os
+import shutil
+import struct
+import threading
+import zlib
+from multiprocessing.pool import ThreadPool
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import mbotenv
+except ImportError:
+    mbotenv = None
+
+__all__ = [
+    'ThumbnailCache',
+    'readPng',
+    'scaleImage',
+    'scalePixels',
+    'writePng',
+]
+
+LOG = mbotenv.get_logger(__name__) if mbotenv else logging.getLogger(__name__)
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# number of channels for each supported png color type
+PNG_CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+
+
+def readPngHeader(data):
+    """ Return the width, height, bit depth, color type and interlace method of the given png data """
+    if data[:8] != PNG_SIGNATURE or data[12:16] != b'IHDR':
+        raise ValueError('not a png file')
+    width, height, depth, colorType, compression, filterMethod, interlace = struct.unpack('>IIBBBBB', data[16:29])
+    return width, height, depth, colorType, interlace
+
+def readPng(filename):
+    """
+    Return (width, height, channels, pixels) for the given png file, where
+    pixels is a bytearray of all rows. Only 8-bit, non-interlaced gray,
+    gray alpha, rgb and rgba pngs are supported, others raise a ValueError.
+    """
+    with open(filename, 'rb') as fp:
+        data = fp.read()
+    width, height, depth, colorType, interlace = readPngHeader(data)
+    if depth != 8 or colorType not in PNG_CHANNELS or interlace:
+        raise ValueError('unsupported png format: {0}'.format(filename))
+    # collect the image data
+    chunks = []
+    pos = 8
+    while pos < len(data):
+        length, kind = struct.unpack('>I4s', data[pos:pos+8])
+        if kind == b'IDAT':
+            chunks.append(data[pos+8:pos+8+length])
+        elif kind == b'IEND':
+            break
+        pos += length + 12
+    raw = bytearray(zlib.decompress(b''.join(chunks)))
+    channels = PNG_CHANNELS[colorType]
+    stride = width * channels
+    pixels = bytearray(stride * height)
+    prev = bytearray(stride)
+    for y in range(height):
+        start = y * (stride + 1)
+        line = raw[start+1:start+1+stride]
+        _unfilter(raw[start], line, prev, channels)
+        pixels[y*stride:(y+1)*stride] = line
+        prev = line
+    return width, height, channels, pixels
+
+def _unfilter(filterType, line, prev, bpp):
+    """ Reverse the png filter of the given line in place """
+    if filterType == 0:
+        return
+    n = len(line)
+    if filterType == 1:
+        for i in range(bpp, n):
+            line[i] = (line[i] + line[i-bpp]) & 0xff
+    elif filterType == 2:
+        for i in range(n):
+            line[i] = (line[i] + prev[i]) & 0xff
+    elif filterType == 3:
+        for i in range(n):
+            left = line[i-bpp] if i >= bpp else 0
+            line[i] = (line[i] + ((left + prev[i]) >> 1)) & 0xff
+    elif filterType == 4:
+        for i in range(n):
+            a = line[i-bpp] if i >= bpp else 0
+            b = prev[i]
+            c = prev[i-bpp] if i >= bpp else 0
+            p = a + b - c
+            pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+            if pa <= pb and pa <= pc:
+                pred = a
+            elif pb <= pc:
+                pred = b
+            else:
+                pred = c
+            line[i] = (line[i] + pred) & 0xff
+    else:
+        raise ValueError('invalid png filter type: {0}'.format(filterType))
+
+def writePng(filename, width, height, channels, pixels):
+    """ Write the given 8-bit pixels to a png file """
+    colorType = dict([(v, k) for k, v in PNG_CHANNELS.items()])[channels]
+    stride = width * channels
+    raw = bytearray()
+    for y in range(height):
+        raw.append(0)
+        raw.extend(pixels[y*stride:(y+1)*stride])
+    def chunk(kind, data):
+        crc = zlib.crc32(kind + data) & 0xffffffff
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', crc)
+    header = struct.pack('>IIBBBBB', width, height, 8, colorType, 0, 0, 0)
+    with open(filename, 'wb') as fp:
+        fp.write(PNG_SIGNATURE)
+        fp.write(chunk(b'IHDR', header))
+        fp.write(chunk(b'IDAT', zlib.compress(bytes(raw))))
+        fp.write(chunk(b'IEND', b''))
+
+def scalePixels(width, height, channels, pixels, size):
+    """
+    Return (width, height, pixels) scaled down by a whole factor to fit within
+    the given size, averaging each box of pixels
+    """
+    factor = max(int(math.ceil(max(width, height) / float(size))), 1)
+    if factor == 1:
+        return width, height, pixels
+    w, h = max(width // factor, 1), max(height // factor, 1)
+    stride = width * channels
+    step = factor * channels
+    count = factor * factor
+    result = bytearray(w * h * channels)
+    i = 0
+    for y in range(h):
+        rows = [r * stride for r in range(y * factor, min((y + 1) * factor, height))]
+        for x in range(w):
+            for c in range(channels):
+                offset = x * step + c
+                total = 0
+                for r in rows:
+                    total += sum(pixels[r+offset:r+offset+step:channels])
+                result[i] = total // count
+                i += 1
+    return w, h, result
+
+def scaleImage(source, filename, size):
+    """
+    Write a copy of the source image scaled down to fit within the given size.
+    Images that are already small enough, or that cannot be scaled, are copied.
+    """
+    if Image is not None:
+        image = Image.open(source)
+        if max(image.size) > size:
+            image.thumbnail((size, size), getattr(Image, 'LANCZOS', getattr(Image, 'ANTIALIAS', None)))
+            image.save(filename, 'PNG')
+            return
+    else:
+        try:
+            width, height, channels, pixels = readPng(source)
+        except ValueError as e:
+            LOG.debug('cannot scale {0}: {1}'.format(source, e))
+        else:
+            if max(width, height) > size:
+                width, height, pixels = scalePixels(width, height, channels, pixels, size)
+                writePng(filename, width, height, channels, pixels)
+                return
+    shutil.copyfile(source, filename)
+
+
+class ThumbnailCache(object):
+    """
+    Creates and caches downscaled copies of icons on disk. Thumbnails are keyed
+    by the icon filename, its modification time and a size bucket, and are
+    created in a background thread. Icons are used at full size for sizes
+    larger than the largest bucket.
+    """
+
+    defaultDir = os.path.join(os.path.expanduser('~'), '.viewGui', 'thumbnails')
+    buckets = (32, 64, 128, 256)
+    threads = 2
+
+    def __init__(self, cacheDir=None):
+        self.cacheDir = cacheDir if cacheDir is not None else self.defaultDir
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def __repr__(self):
+        return '<ThumbnailCache {0}>'.format(self.cacheDir)
+
+    def getBucket(self, size):
+        """ Return the smallest bucket that fits the given size, or None if the size is larger than all buckets """
+        for b in sorted(self.buckets):
+            if size <= b:
+                return b
+
+    def getThumbnailFilename(self, icon, mtime, bucket):
+        key = '{0}|{1!r}|{2}'.format(os.path.normpath(icon), mtime, bucket)
+        if not isinstance(key, bytes):
+            key = key.encode('utf-8')
+        return os.path.join(self.cacheDir, '{0}.png'.format(hashlib.md5(key).hexdigest()))
+
+    def getThumbnail(self, icon, size, callback=None):
+        """
+        Return the filename of the thumbnail of the given icon for the given size,
+        or the icon itself if the size is larger than all buckets. Returns None if
+        the thumbnail doesn't exist yet, in which case it is created in the
+        background and the callback is called with its filename in the main thread.
+        """
+        bucket = self.getBucket(size)
+        if bucket is None:
+            return icon
+        try:
+            mtime = os.stat(icon).st_mtime
+        except OSError:
+            return None
+        thumb = self.getThumbnailFilename(icon, mtime, bucket)
+        if os.path.isfile(thumb):
+            return thumb
+        with self._lock:
+            if thumb in self._pending:
+                self._pending[thumb].append(callback)
+                return None
+            self._pending[thumb] = [callback]
+        self.getPool().apply_async(self._createThumbnail, (icon, thumb, bucket))
+        return None
+
+    def getPool(self):
+        if self._pool is None:
+            self._pool = ThreadPool(self.threads)
+        return self._pool
+
+    def _createThumbnail(self, icon, thumb, bucket):
+        """ Create the given thumbnail. Runs in a worker thread """
+        result = thumb
+        tmp = '{0}.{1}.tmp'.format(thumb, threading.current_thread().ident)
+        try:
+            if not os.path.isdir(self.cacheDir):
+                os.makedirs(self.cacheDir)
+            scaleImage(icon, tmp, bucket)
+            if os.path.isfile(thumb):
+                os.remove(thumb)
+            os.rename(tmp, thumb)
+        except Exception as e:
+            LOG.warning('could not create thumbnail for {0}: {1}'.format(icon, e))
+            result = icon
+        with self._lock:
+            callbacks = self._pending.pop(thumb, [])
+        for c in callbacks:
+            if c is not None:
+                backend.executeDeferred(c, result)
+
+    def clear(self):
+        """ Remove all cached thumbnails """
+        if os.path.isdir(self.cacheDir):
+            for f in os.listdir(self.cacheDir):
+                if f.endswith('.png'):
+                    os.remove(os.path.join(self.cacheDir, f))
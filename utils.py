@@ -7,8 +7,11 @@ Created by Bohdon Sayre on 2012-06-21.
 Copyright (c) 2012 Moonbot Studios. All rights reserved.
 """
 
-from maya import cmds
-import pymel.core as pm
+import backend
+from backend import cmds, pm
+from thumbnails import ThumbnailCache
+import hashlib
+import json
 import logging
 import math
 import os
@@ -17,15 +20,40 @@ import shutil
 import subprocess
 import sys
 import textwrap
+import time
 import inspect
+import itertools
+import heapq
+import threading
+import weakref
+from multiprocessing.pool import ThreadPool
+
+try:
+    import mbotenv
+except ImportError:
+    mbotenv = None
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
 
-import mbotenv
-
-LOG = mbotenv.get_logger(__name__)
+LOG = mbotenv.get_logger(__name__) if mbotenv else logging.getLogger(__name__)
 
 SHOW_MSG = 'Show in ' + ('Finder' if sys.platform == 'darwin' else 'Explorer')
 
 
+def acceptsKeyword(fnc, name):
+    """ Return True if the given function or method has an argument with the given name """
+    try:
+        spec = inspect.getargspec(fnc)
+    except TypeError:
+        return False
+    return name in spec.args
+
 def asList(value):
     if value is None:
         return []
@@ -33,6 +61,13 @@ def asList(value):
         return [value]
     return value
 
+def isIterator(value):
+    """ Return True if the given value is an iterator, eg. a generator """
+    try:
+        return iter(value) is value
+    except TypeError:
+        return False
+
 def getAttrTitle(attr):
     n = attr.longName()
     return toTitle(n)
@@ -767,6 +802,129 @@ class FrameLayout(object):
             self.body.setManage(not self._collapsed)
 
 
+class SearchFilter(object):
+    """
+    A search filter compiled from text. Names match if they contain any
+    of the terms in the text, which are separated by ';', ' ', '|' or ','.
+    An empty term, eg. from a trailing separator, matches all names.
+    """
+    SEPARATORS = '[; |,]'
+
+    def __init__(self, text):
+        self.text = text
+        terms = []
+        for t in re.split(self.SEPARATORS, text):
+            if t not in terms:
+                terms.append(t)
+        self.terms = tuple(terms)
+        self.matchAll = '' in self.terms
+        self._regex = None
+        if not self.matchAll:
+            self._regex = re.compile('|'.join([re.escape(t) for t in self.terms]))
+
+    def __repr__(self):
+        return '<SearchFilter {0!r}>'.format(self.text)
+
+    def match(self, name):
+        return self.matchAll or self._regex.search(name) is not None
+
+    def filter(self, names, indeces=None):
+        """
+        Return the indeces of the names that match this filter,
+        only checking the given indeces if any are given.
+        """
+        if indeces is None:
+            indeces = range(len(names))
+        if self.matchAll:
+            return list(indeces)
+        search = self._regex.search
+        return [i for i in indeces if search(names[i])]
+
+    def narrows(self, other):
+        """
+        Return True if every name matching this filter also matches the other,
+        eg. when a term of the other filter was extended while typing.
+        """
+        if other.matchAll:
+            return True
+        if self.matchAll:
+            return False
+        return all([any([t in term for t in other.terms]) for term in self.terms])
+
+
+class FilterIndex(object):
+    """
+    An index of {key: values} data for use with FilterList. The values of each
+    key are validated and sorted once, the first time they are needed, and the
+    values for several keys are merged from these presorted runs, so looking up
+    a selection takes time proportional to the number of results.
+
+    The returned lists are shared by the index and should not be modified.
+    """
+
+    def __init__(self, data=None, validate=None):
+        self.data = data if data is not None else {}
+        if validate is not None:
+            self.validate = validate
+        self._runs = {}
+        self._allValues = None
+
+    def __repr__(self):
+        return '<FilterIndex {0} keys>'.format(len(self.data))
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def keys(self):
+        return self.data.keys()
+
+    def validate(self, value):
+        """ Return the given value as a list of strings """
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            value = [value]
+        return [str(x) for x in value]
+
+    def run(self, key):
+        """ Return the sorted values for the given key """
+        if key not in self._runs:
+            values = self.validate(self.data[key])
+            values.sort()
+            self._runs[key] = values
+        return self._runs[key]
+
+    def values(self, keys=None):
+        """
+        Return the sorted values for the given keys,
+        or for all keys if no keys are given
+        """
+        if not keys:
+            if self._allValues is None:
+                self._allValues = self._merge(self.data.keys())
+            return self._allValues
+        return self._merge(keys)
+
+    def _merge(self, keys):
+        runs = []
+        visited = set()
+        for k in keys:
+            if k in visited or k not in self.data:
+                continue
+            visited.add(k)
+            run = self.run(k)
+            if run:
+                runs.append(run)
+        if not runs:
+            return []
+        if len(runs) == 1:
+            return runs[0]
+        return list(heapq.merge(*runs))
+
+
 class ItemList(object):
     """
     ItemList wraps a textScrollList control allowing you to
@@ -774,7 +932,26 @@ class ItemList(object):
 
     The displayed names for each item are determined by
     the encode method, which can be overridden.
+
+    Updates only insert and remove the rows that changed when possible,
+    otherwise the control is filled using one command for every appendChunkSize
+    items. The selected items are kept when updating.
+
+    Encoded names are cached until the items or encode function change,
+    and extending the search filter only searches the previous results.
+
+    Items can also be set to an iterator, eg. a generator that walks a
+    directory, which is consumed in chunks of streamChunkSize items during
+    idle time. Loaded items are shown and searchable as they arrive, and
+    the last row shows the loadingLabel until the iterator is exhausted.
     """
+
+    # max number of names sent to the control in one command
+    appendChunkSize = 5000
+    # number of items consumed from an iterator per idle callback
+    streamChunkSize = 2000
+    loadingLabel = 'Loading... {count} items'
+
     def __init__(self, items=None, format='{name}', encode=None, **kwargs):
         self._format = format
         self._customEncode = encode
@@ -788,6 +965,19 @@ class ItemList(object):
         kwargs['dgc'] = self._dragCallback
         kwargs['dpc'] = self._dropCallback
         kwargs['dkc'] = self._deleteCallback
+        self.progressCallback = None
+        self._source = None
+        self._sourceId = 0
+        self._loadedCount = 0
+        self._items = []
+        self._itemIndeces = []
+        self._itemNames = []
+        self._itemIndex = None
+        self._nameIndex = None
+        self._controlNames = []
+        self._hasLoadingRow = False
+        self._compiledFilter = None
+        self._invalidateNames()
         self.build(**kwargs)
         self._allItems = items
         self.items = items
@@ -800,9 +990,99 @@ class ItemList(object):
         return self._items
     @items.setter
     def items(self, value):
+        if isIterator(value):
+            self.setItemSource(value)
+            return
+        self._stopLoading()
         value = asList(value)
         self._allItems = value
+        self._invalidateNames()
+        self.update()
+
+    @property
+    def loading(self):
+        """ True while items are being loaded from an iterator """
+        return self._source is not None
+
+    def setItemSource(self, source):
+        """
+        Set the items to those from the given iterator, consuming
+        streamChunkSize items at a time during idle time.
+        `progressCallback`, if set, is called with this list, the number of
+        items loaded so far, and whether all items have been loaded.
+        """
+        self._stopLoading()
+        self._allItems = []
+        self._invalidateNames()
+        self._source = iter(source)
+        self._loadedCount = 0
+        self.update()
+        self._deferLoad()
+
+    def cancelLoading(self):
+        """ Stop loading items from the current iterator, keeping those already loaded """
+        if self._stopLoading():
+            self.update()
+            if self.progressCallback is not None:
+                self.progressCallback(self, self._loadedCount, True)
+
+    def _stopLoading(self):
+        """ Invalidate any deferred loading, returns True if items were loading """
+        self._sourceId += 1
+        loading = self._source is not None
+        self._source = None
+        return loading
+
+    def _deferLoad(self):
+        pm.evalDeferred(Callback(self._loadNext, self._sourceId), lowestPriority=True)
+
+    def _loadNext(self, sourceId):
+        """ Load the next chunk of items from the current iterator """
+        if sourceId != self._sourceId or self._source is None:
+            return
+        if not pm.textScrollList(self.control, q=True, ex=True):
+            self._stopLoading()
+            return
+        size = max(int(self.streamChunkSize), 1)
+        chunk = list(itertools.islice(self._source, size))
+        done = len(chunk) < size
+        if len(chunk):
+            # extend the cached names instead of encoding all items again
+            start = len(self._allItems)
+            names = self._names if self._namesSource is self._allItems else None
+            sortedIndeces, lastSearch = self._sortedIndeces, self._lastSearch
+            self._allItems.extend(chunk)
+            self._loadedCount += len(chunk)
+            self._invalidateNames()
+            if names is not None:
+                names.extend(self._encodeItems(chunk))
+                self._names = names
+                self._namesSource = self._allItems
+                self._mergeSortedIndeces(start, sortedIndeces, lastSearch)
+        if done:
+            self._source = None
         self.update()
+        if self.progressCallback is not None:
+            self.progressCallback(self, self._loadedCount, done)
+        if not done:
+            self._deferLoad()
+
+    def _mergeSortedIndeces(self, start, sortedIndeces, lastSearch):
+        """
+        Restore the cached sort order and search results after items were
+        appended from the given index, sorting and searching only the new items
+        """
+        if sortedIndeces is None:
+            return
+        items = self._allItems
+        key = lambda i: items[i]
+        added = sorted(range(start, len(items)), key=key)
+        # sorting two sorted runs only merges them
+        self._sortedIndeces = sorted(sortedIndeces + added, key=key)
+        if lastSearch is not None:
+            search, indeces = lastSearch
+            matches = search.filter(self._names, added)
+            self._lastSearch = (search, sorted(indeces + matches, key=key))
 
     @property
     def encode(self):
@@ -811,6 +1091,7 @@ class ItemList(object):
     def encode(self, value):
         if hasattr(value, '__call__') or value is None:
             self._customEncode = value
+            self._invalidateNames()
             self.update()
 
     @property
@@ -829,28 +1110,26 @@ class ItemList(object):
         return []
     @selected.setter
     def selected(self, value):
-        value = asList(value)
-        indeces = [i for i in range(len(self.items)) if self.items[i] in value]
-        self.selectedIndeces = indeces
+        self.selectedIndeces = self.indecesOfItems(asList(value))
 
     @property
     def selectedNames(self):
-        sel = self.selected
+        sel = self.selectedIndeces
         if sel:
-            return [self._encode(i) for i in self.selected]
+            return [self._itemNames[i] for i in sel]
     @selectedNames.setter
     def selectedNames(self, value):
-        value = asList(value)
-        indeces = [i for i in range(len(self.items)) if self._encode(self.items[i]) in value]
-        self.selectedIndeces = indeces
+        self.selectedIndeces = self.indecesOfNames(asList(value))
 
     @property
     def selectedIndeces(self):
-        return [i-1 for i in self.control.getSelectIndexedItem()]
+        count = self._getItemRowCount()
+        return [i-1 for i in self.control.getSelectIndexedItem() if i <= count]
     @selectedIndeces.setter
     def selectedIndeces(self, value):
         value = asList(value)
-        indeces = [i+1 for i in value if i in range(len(self.items))]
+        count = self._getItemRowCount()
+        indeces = [i+1 for i in value if 0 <= i < count]
         self.control.deselectAll()
         self.control.setSelectIndexedItem(indeces)
 
@@ -866,7 +1145,7 @@ class ItemList(object):
         self.update()
 
     def append(self, item):
-        self._items.append(item)
+        self._allItems = list(asList(self._allItems)) + [item]
         self.update()
 
     def build(self, **kwargs):
@@ -880,35 +1159,222 @@ class ItemList(object):
             return ''
         return str(val)
 
+    def _encodeItems(self, items):
+        """ Return the encoded names of the given items """
+        return [self._encode(i) for i in items]
+
+    def _invalidateNames(self):
+        """ Clear the cached encoded names and search results """
+        self._names = None
+        self._namesSource = None
+        self._sortedIndeces = None
+        self._lastSearch = None
+
+    def _getNames(self):
+        """ Return the encoded names of all items, encoding them only when they have changed """
+        if self._names is None or self._namesSource is not self._allItems or len(self._names) != len(self._allItems):
+            self._invalidateNames()
+            self._names = self._encodeItems(self._allItems)
+            self._namesSource = self._allItems
+        return self._names
+
+    def _getSortedIndeces(self):
+        """ Return the indeces of all items, sorted by item """
+        if self._sortedIndeces is None:
+            items = self._allItems
+            self._sortedIndeces = sorted(range(len(items)), key=lambda i: items[i])
+        return self._sortedIndeces
+
+    def _getSearchFilter(self):
+        """ Return the compiled SearchFilter for the current searchFilter """
+        if self._searchFilter is None:
+            return None
+        if self._compiledFilter is None or self._compiledFilter.text != self._searchFilter:
+            self._compiledFilter = SearchFilter(self._searchFilter)
+        return self._compiledFilter
+
     def _getFilteredItems(self):
         ''' Filter the supplied items based on the searchFilter '''
         if self._allItems is None:
             return []
-        items = [(i,self._encode(i)) for i in self._allItems]
-        if self._searchFilter is not None:
-            results = []
-            for i,name in items:
-                searches = re.split('[; |,]',self._searchFilter)
-                found = False
-                for search in searches:
-                    if search in name:
-                        found = True
-                if found: results.append((i,name))
-            results.sort(key=lambda w:w[0])
+        names = self._getNames()
+        search = self._getSearchFilter()
+        if search is not None:
+            # results are sorted by item, only search the last results if they contain all matches
+            last = self._lastSearch
+            if last is not None and search.narrows(last[0]):
+                indeces = search.filter(names, last[1])
+            else:
+                indeces = search.filter(names, self._getSortedIndeces())
+            self._lastSearch = (search, indeces)
         else:
-            results = items
-        self._items = [i[0] for i in results]
-        return [i[1] for i in results]
+            indeces = range(len(names))
+            self._lastSearch = None
+        allItems = self._allItems
+        self._items = [allItems[i] for i in indeces]
+        self._itemIndeces = indeces
+        return [names[i] for i in indeces]
 
     def update(self):
         """ Update the list to represent the current items """
+        prevItems = self._items
         names = self._getFilteredItems()
-        self.control.removeAll()
-        if names:
-            for i, n in enumerate(names):
-                # format encoded name
-                n = self.format.format(index=i+1, name=n)
-                self.control.append(n)
+        self.setControlNames(names, self._selectionMapper(prevItems))
+
+    def _indecesOf(self, items, values):
+        """ Return the indeces of all items that are in values """
+        if not values:
+            return []
+        try:
+            values = set(values)
+            return [i for i, item in enumerate(items) if item in values]
+        except TypeError:
+            # unhashable items
+            values = list(values)
+            return [i for i, item in enumerate(items) if item in values]
+
+    def _withoutItems(self, items, values):
+        """ Return the given items without any that are in values """
+        if not values:
+            return list(items)
+        try:
+            values = set(values)
+            return [item for item in items if item not in values]
+        except TypeError:
+            # unhashable items
+            values = list(values)
+            return [item for item in items if item not in values]
+
+    def _buildIndex(self, keys):
+        """ Return a dict of {key: [indeces]}, or None if the keys are unhashable """
+        index = {}
+        try:
+            for i, k in enumerate(keys):
+                index.setdefault(k, []).append(i)
+        except TypeError:
+            return None
+        return index
+
+    def _lookupIndex(self, index, values):
+        result = set()
+        for v in values:
+            try:
+                result.update(index.get(v, ()))
+            except TypeError:
+                # unhashable values cannot equal hashable items
+                pass
+        return sorted(result)
+
+    def indecesOfItems(self, values):
+        """ Return the sorted indeces of all current items that are in values """
+        if self._itemIndex is None or self._itemIndex[0] is not self._items:
+            self._itemIndex = (self._items, self._buildIndex(self._items))
+        index = self._itemIndex[1]
+        if index is None:
+            return self._indecesOf(self._items, values)
+        return self._lookupIndex(index, values)
+
+    def indecesOfNames(self, names):
+        """ Return the sorted indeces of all current items whose encoded name is in names """
+        if self._nameIndex is None or self._nameIndex[0] is not self._itemNames:
+            self._nameIndex = (self._itemNames, self._buildIndex(self._itemNames))
+        return self._lookupIndex(self._nameIndex[1], names)
+
+    def _selectionMapper(self, prevItems):
+        """
+        Return a function that maps the selected indeces of the given
+        previous items to the indeces of the same items in the current items.
+        """
+        def mapSelection(indeces):
+            sel = [prevItems[i] for i in indeces if i < len(prevItems)]
+            return self.indecesOfItems(sel)
+        return mapSelection
+
+    def formatNames(self, names, start=0):
+        """ Return the given encoded names formatted for display, starting at the given index """
+        if self._format == '{name}':
+            return list(names)
+        return [self._format.format(index=start+i+1, name=n) for i, n in enumerate(names)]
+
+    def setControlNames(self, names, mapSelection=None):
+        """
+        Update the control to show the given encoded names. When only a few rows
+        changed, they are removed and inserted individually, which keeps the
+        scroll position and selection. Otherwise all rows are replaced.
+
+        `mapSelection` -- a function that receives the previously selected indeces
+            and returns the indeces to select after the update. Only called when
+            rows were removed, since inserted rows do not change the selection.
+        """
+        self._itemNames = list(names)
+        rows = self.formatNames(names)
+        hasLoadingRow = bool(self.loading and self.loadingLabel)
+        if hasLoadingRow:
+            rows.append(self.loadingLabel.format(count=self._loadedCount))
+        self._setControlRows(rows, mapSelection)
+        self._hasLoadingRow = hasLoadingRow
+
+    def _getItemRowCount(self):
+        """ Return the number of rows in the control that show items, excluding the loading row """
+        return len(self._controlNames) - int(self._hasLoadingRow)
+
+    def _setControlRows(self, names, mapSelection=None):
+        """ Update the control to show the given formatted names, see setControlNames """
+        old = self._controlNames
+        # find the changed range between the common prefix and suffix
+        count = min(len(old), len(names))
+        start = 0
+        while start < count and old[start] == names[start]:
+            start += 1
+        end = 0
+        while end < count - start and old[-1-end] == names[-1-end]:
+            end += 1
+        removed = len(old) - start - end
+        inserted = names[start:len(names)-end]
+        if not removed and not len(inserted):
+            pass
+        elif removed + len(inserted) < len(names):
+            prevSel = self.selectedIndeces if removed and mapSelection else None
+            if removed:
+                # remove from the end so that the indeces do not shift
+                indeces = list(range(start + removed, start, -1))
+                pm.textScrollList(self.control, e=True, removeIndexedItem=indeces)
+            if len(inserted):
+                positions = [(start+i+1, n) for i, n in enumerate(inserted)]
+                pm.textScrollList(self.control, e=True, appendPosition=positions)
+            if prevSel:
+                # only reselect if rows other than the removed ones were affected
+                shift = len(inserted) - removed
+                kept = [i for i in prevSel if i < start] + [i + shift for i in prevSel if i >= start + removed]
+                sel = mapSelection(prevSel)
+                if sorted(sel) != kept:
+                    kw = dict(e=True, deselectAll=True)
+                    if sel:
+                        kw['selectIndexedItem'] = [i+1 for i in sel]
+                    pm.textScrollList(self.control, **kw)
+        else:
+            sel = None
+            if mapSelection and len(old):
+                sel = mapSelection(self.selectedIndeces)
+            self._replaceControlNames(names, sel)
+        self._controlNames = names
+
+    def _replaceControlNames(self, names, selectedIndeces=None):
+        """
+        Replace all rows in the control with the given formatted names and select
+        the given indeces, using one command for every appendChunkSize names.
+        """
+        size = max(int(self.appendChunkSize), 1)
+        chunks = [names[i:i+size] for i in range(0, len(names), size)] or [[]]
+        for i, chunk in enumerate(chunks):
+            kw = dict(e=True)
+            if i == 0:
+                kw['removeAll'] = True
+            if len(chunk):
+                kw['append'] = chunk
+            if i == len(chunks) - 1 and selectedIndeces:
+                kw['selectIndexedItem'] = [x+1 for x in selectedIndeces]
+            pm.textScrollList(self.control, **kw)
 
     def _dragCallback(self, dragCtrlName, x, y, modifiers):
         s = self.selected
@@ -925,20 +1391,177 @@ class ItemList(object):
 
     def _deleteCallback(self):
         sel = self.selected
-        for i in sel:
-            self._items.remove(i)
+        # delete the selected rows, so only one copy of duplicate items is removed
+        itemIndeces = self._itemIndeces
+        delete = set([itemIndeces[i] for i in self.selectedIndeces if i < len(itemIndeces)])
+        self._allItems = [item for i, item in enumerate(asList(self._allItems)) if i not in delete]
         if self.deleteCallback is not None and hasattr(self.deleteCallback, '__call__'):
             self.deleteCallback(sel) # Passes deleted items
         self.update()
 
+class VirtualItemList(ItemList):
+    """
+    An ItemList that only keeps a page of rows in the control, for lists
+    that are too large to show at once. Rows at the top and bottom of the
+    page show how many items come before and after, and selecting them
+    shows the previous or next page. Searching shows the first page.
+
+    The items, selected and searchFilter api works the same as ItemList,
+    where indeces always refer to all filtered items rather than rows.
+    The selection is kept in python so that items on other pages stay
+    selected while paging.
+    """
+
+    # max number of item rows in the control
+    pageSize = 1000
+    prevPageLabel = '... {count} more above'
+    nextPageLabel = '... {count} more below'
+
+    def __init__(self, *args, **kwargs):
+        self._offset = 0
+        self._selected = set()
+        self._hasPrevRow = False
+        self._shownFilter = None
+        self.selectCommand = None
+        for k in ('sc', 'selectCommand'):
+            if kwargs.has_key(k):
+                self.selectCommand = kwargs.pop(k)
+        kwargs['sc'] = Callback(self._onSelect)
+        super(VirtualItemList, self).__init__(*args, **kwargs)
+
+    @property
+    def offset(self):
+        """ The index of the first item on the current page """
+        return self._offset
+
+    @property
+    def pageEnd(self):
+        return min(self._offset + self.pageSize, len(self._items))
+
+    @property
+    def selectedIndeces(self):
+        self._syncSelection()
+        return sorted(self._selected)
+    @selectedIndeces.setter
+    def selectedIndeces(self, value):
+        count = len(self._items)
+        self._selected = set([i for i in asList(value) if 0 <= i < count])
+        self._applySelection()
+
+    def rowToIndex(self, row):
+        """ Return the item index for a 0-based row of the control, or None for page rows """
+        index = self._offset + row - int(self._hasPrevRow)
+        if self._offset <= index < self.pageEnd:
+            return index
+        return None
+
+    def indexToRow(self, index):
+        """ Return the 0-based row of the control for an item index, or None if it is on another page """
+        if self._offset <= index < self.pageEnd:
+            return index - self._offset + int(self._hasPrevRow)
+        return None
+
+    def update(self):
+        """ Update the current page to represent the current items """
+        self._syncSelection()
+        prevItems = self._items
+        sel = [prevItems[i] for i in sorted(self._selected) if i < len(prevItems)]
+        names = self._getFilteredItems()
+        self._itemNames = names
+        self._selected = set(self.indecesOfItems(sel)) if sel else set()
+        if self._searchFilter != self._shownFilter:
+            self._shownFilter = self._searchFilter
+            self._offset = 0
+        self.showPage(self._offset)
+
+    def showPage(self, offset):
+        """ Show the page of items starting at the given index """
+        pageSize = max(int(self.pageSize), 1)
+        self._offset = max(0, min(offset, len(self._items) - pageSize))
+        end = self.pageEnd
+        rows = self.formatNames(self._itemNames[self._offset:end], self._offset)
+        self._hasPrevRow = self._offset > 0
+        if self._hasPrevRow:
+            rows.insert(0, self.prevPageLabel.format(count=self._offset))
+        if end < len(self._items):
+            rows.append(self.nextPageLabel.format(count=len(self._items) - end))
+        elif self.loading and self.loadingLabel:
+            rows.append(self.loadingLabel.format(count=self._loadedCount))
+        self._setControlRows(rows)
+        self._applySelection()
+
+    def showNextPage(self):
+        self.showPage(self._offset + self.pageSize)
+        self.control.showIndexedItem(1)
+
+    def showPrevPage(self):
+        self.showPage(self._offset - self.pageSize)
+        self.control.showIndexedItem(len(self._controlNames))
+
+    def showIndex(self, index):
+        """ Show the page containing the item at the given index and scroll to it """
+        if not 0 <= index < len(self._items):
+            return
+        if self.indexToRow(index) is None:
+            self.showPage(index - self.pageSize // 2)
+        self.control.showIndexedItem(self.indexToRow(index) + 1)
+
+    def _syncSelection(self):
+        """ Update the python selection from the rows selected in the control """
+        if not len(self._controlNames):
+            return
+        start, end = self._offset, self.pageEnd
+        sel = set([i for i in self._selected if not start <= i < end])
+        for row in self.control.getSelectIndexedItem():
+            index = self.rowToIndex(row - 1)
+            if index is not None:
+                sel.add(index)
+        self._selected = sel
+
+    def _applySelection(self):
+        """ Select the rows in the control for the selected items on the current page """
+        rows = [self.indexToRow(i) + 1 for i in self._selected if self._offset <= i < self.pageEnd]
+        kw = dict(e=True, deselectAll=True)
+        if rows:
+            kw['selectIndexedItem'] = sorted(rows)
+        pm.textScrollList(self.control, **kw)
+
+    def _onSelect(self):
+        # selecting a page row replaces the row selection in the control,
+        # so keep the python selection and restore it on the new page
+        rows = self.control.getSelectIndexedItem()
+        if self._hasPrevRow and 1 in rows:
+            self.showPrevPage()
+        elif self.pageEnd < len(self._items) and len(self._controlNames) in rows:
+            self.showNextPage()
+        else:
+            self._syncSelection()
+            if self.selectCommand is not None:
+                self.selectCommand()
+
 class FilterList(ItemList):
     """
     FilterList provides an easy way to create a collection of textScrollLists
     whos contents represent parent-child relationships. A FilterList's selection
     will determine the contents of it's child FilterList, if any. FilterLists
     can be chained together to form any number of list collections.
+
+    The items are indexed by a FilterIndex, which sorts the values of each key
+    once and merges them for the parent's selection. allItems can also be set
+    to a FilterIndex directly, eg. to share one between lists. The index and
+    the items for each parent selection are cached until allItems is set again
+    or update is called, so call update after modifying allItems in place.
+    Selecting items and searching reuse the cache, and the child is only
+    updated when the selection changes.
     """
+
+    # max number of parent selections to remember the items for
+    maxCachedSelections = 64
+
     def __init__(self, parent=None, child=None, items={}, *args, **kwargs):
+        self._index = None
+        self._selectionCache = {}
+        self._cascadedSelection = None
         self.allItems = items
         items = None
         self.parent = parent
@@ -950,39 +1573,83 @@ class FilterList(ItemList):
         kwargs['doubleClickCommand'] = Callback(self._doubleClickCommand)
         super(FilterList, self).__init__(*args, **kwargs)
 
+    @property
+    def allItems(self):
+        return self._allItemsDict
+    @allItems.setter
+    def allItems(self, value):
+        self._allItemsDict = value
+        self.clearCache()
+
+    def clearCache(self):
+        """ Clear the cached index and items for each parent selection """
+        self._index = None
+        self._selectionCache = {}
+
+    @ItemList.searchFilter.setter
+    def searchFilter(self, value):
+        if value is not None:
+            self._searchFilter = str(value)
+        else:
+            self._searchFilter = None
+        self._refresh()
+
     def update(self):
+        """
+        Update the list and its child to reflect the current items. Clears the
+        cache first, so changes made to allItems in place are shown.
+        """
+        self.clearCache()
+        self._refresh()
+
+    def _refresh(self):
+        """ Update the list and its child using the cached index and parent selections """
         # maintain the current selection
-        sel = self.selectedNames
+        prevItems = self._items
         self._items = self._getFilteredItems()
         names = [self._encode(i) for i in self.items]
-        self.control.removeAll()
-        for i, n in enumerate(names):
-            # format encoded name
-            n = self.format.format(index=i+1, name=n)
-            self.control.append(n)
-        if isinstance(self.child, FilterList):
-            self.child.update()
-        # Reapply the selection
-        self.selectedNames = sel
+        self.setControlNames(names, self._selectionMapper(prevItems))
+        self.updateChild()
+
+    def updateChild(self, force=False):
+        """ Update the child list if the selection changed since it was last updated """
+        if not isinstance(self.child, FilterList):
+            return
+        sel = tuple(self.selected)
+        if force or sel != self._cascadedSelection:
+            self._cascadedSelection = sel
+            self.child._refresh()
+
+    def getIndex(self):
+        """ Return the FilterIndex of allItems """
+        if isinstance(self.allItems, FilterIndex):
+            return self.allItems
+        if self._index is None:
+            self._index = FilterIndex(self.allItems, self._validate)
+        return self._index
 
     def _filterDict(self, dictionary, keys=None):
         '''
         Filter the items from the supplied dictionary
         based on the supplied keys (Top-Level Only)
         '''
-        result = {}
-        for k, v in dictionary.items():
-            v = self._validate(v)
-            add = False
-            if keys:
-                if k in keys:
-                    add = True
-            else:
-                add = True
-            if add:
-                if not result.has_key(k):
-                    result[k] = []
-                result[k].extend(v)
+        if dictionary is self.allItems:
+            index = self.getIndex()
+        else:
+            index = FilterIndex(dictionary, self._validate)
+        if not keys:
+            keys = index.keys()
+        return dict([(k, list(index.run(k))) for k in set(keys) if k in index])
+
+    def _getSelectionItems(self, parentSel):
+        """ Return the sorted values for the given parent selection """
+        key = tuple(parentSel) if parentSel else None
+        result = self._selectionCache.get(key)
+        if result is None:
+            result = self.getIndex().values(parentSel)
+            if len(self._selectionCache) >= self.maxCachedSelections:
+                self._selectionCache = {}
+            self._selectionCache[key] = result
         return result
 
     def _getFilteredItems(self):
@@ -991,25 +1658,11 @@ class FilterList(ItemList):
         if isinstance(self.parent, FilterList):
             parentSel = self.parent.selected
         # compile the items based on the parent
-        items = self._filterDict(self.allItems, parentSel)
-        
-        result = []
-        allValues = []
-        for item in items.values():
-            allValues.extend(item)
+        result = self._getSelectionItems(parentSel)
         if self._searchFilter and self.child is None:
-            for item in allValues:
-                searches = re.split('[; |,]',self._searchFilter)
-                found = False
-                for search in searches:
-                    if search in item:
-                        found = True
-                if found: result.append(item)
-        else:
-            result.extend(allValues)
-        result.sort()
-
-        return result
+            search = self._getSearchFilter()
+            return [item for item in result if search.match(item)]
+        return list(result)
 
     def _validate(self, value):
         ''' Validate the given value from self.data '''
@@ -1024,14 +1677,12 @@ class FilterList(ItemList):
     def _selectCommand(self):
         if self.selectCommand is not None:
             self.selectCommand()
-        if isinstance(self.child, FilterList):
-            self.child.update()
+        self.updateChild()
 
     def _doubleClickCommand(self):
         if self.doubleClickCommand is not None:
-            self._doubleClickCommand()
-        if isinstance(self.child, FilterList):
-            self.child.update()
+            self.doubleClickCommand()
+        self.updateChild()
 
 
 
@@ -1075,7 +1726,7 @@ class ManageableList(ItemList):
             self.addCommand(self)
 
     def onRemove(self):
-        self.items = [i for i in self.items if i not in self.selected]
+        self.items = self._withoutItems(asList(self._allItems), self.selected)
         if self.removeCommand is not None:
             self.removeCommand(self)
 
@@ -1085,22 +1736,173 @@ class ManageableList(ItemList):
             self.clearCommand(self)
 
 
+class NodeNameCache(object):
+    """
+    Caches the names of nodes by UUID. Uncached names are resolved in one batch
+    using cmds.ls, and the cache is cleared whenever nodes are renamed or removed.
+    Subscribers are notified of these changes once per idle using nodeNamesChanged.
+
+    The OpenMaya callbacks are installed while there are subscribers, and names
+    are only cached while they are installed. Long names are always resolved
+    since reparenting is not tracked, and UUIDs shared by several nodes, eg. in
+    duplicate references, are never cached.
+    """
+
+    NAMES = {}
+    SHARED = set()
+    SUBSCRIBERS = []
+    CALLBACK_IDS = []
+    PENDING = False
+
+    @staticmethod
+    def getUuid(node):
+        """ Return the UUID of the given PyNode, or None if it doesn't have one, eg. for attributes """
+        if not hasattr(node, '__apimfn__'):
+            return None
+        try:
+            return node.__apimfn__().uuid().asString()
+        except (AttributeError, RuntimeError):
+            return None
+
+    @staticmethod
+    def getNames(uuids, long=False):
+        """
+        Return the names of the nodes with the given UUIDs, or None for
+        any UUID that doesn't exist or is shared by several nodes
+        """
+        cache = NodeNameCache.NAMES
+        if long or not NodeNameCache.CALLBACK_IDS:
+            cache = {}
+        missing = set([u for u in uuids if u is not None and u not in cache and u not in NodeNameCache.SHARED])
+        if missing:
+            names = cmds.ls(list(missing), long=long) or []
+            ids = cmds.ls(names, uuid=True) or [] if names else []
+            resolved = {}
+            for uuid, name in zip(ids, names):
+                if uuid in resolved:
+                    NodeNameCache.SHARED.add(uuid)
+                resolved[uuid] = name
+            for uuid in NodeNameCache.SHARED:
+                resolved.pop(uuid, None)
+            cache.update(resolved)
+        return [cache.get(u) for u in uuids]
+
+    @staticmethod
+    def subscribe(obj):
+        """ Notify the given object of name changes by calling its nodeNamesChanged method """
+        subs = NodeNameCache.SUBSCRIBERS
+        if obj not in [ref() for ref in subs]:
+            subs.append(weakref.ref(obj))
+        NodeNameCache.ensureCallbacks()
+
+    @staticmethod
+    def unsubscribe(obj):
+        NodeNameCache.SUBSCRIBERS = [ref for ref in NodeNameCache.SUBSCRIBERS if ref() not in (None, obj)]
+        if not NodeNameCache.SUBSCRIBERS:
+            NodeNameCache.removeCallbacks()
+
+    @staticmethod
+    def ensureCallbacks():
+        """ Install the OpenMaya callbacks if they are not installed. Return True if they are installed """
+        if NodeNameCache.CALLBACK_IDS:
+            return True
+        try:
+            import maya.OpenMaya as om
+        except ImportError:
+            return False
+        fnc = NodeNameCache._onNodesChanged
+        ids = NodeNameCache.CALLBACK_IDS
+        try:
+            ids.append(om.MNodeMessage.addNameChangedCallback(om.MObject(), fnc))
+            ids.append(om.MDGMessage.addNodeRemovedCallback(fnc, 'dependNode'))
+        except RuntimeError as e:
+            LOG.warning('could not install node name callbacks: {0}'.format(e))
+            NodeNameCache.removeCallbacks()
+            return False
+        LOG.debug('installed node name callbacks')
+        return True
+
+    @staticmethod
+    def removeCallbacks():
+        """ Remove the OpenMaya callbacks and clear the cache """
+        if NodeNameCache.CALLBACK_IDS:
+            import maya.OpenMaya as om
+            for i in NodeNameCache.CALLBACK_IDS:
+                om.MMessage.removeCallback(i)
+            NodeNameCache.CALLBACK_IDS = []
+        NodeNameCache.clear()
+
+    @staticmethod
+    def clear():
+        NodeNameCache.NAMES.clear()
+        NodeNameCache.SHARED.clear()
+
+    @staticmethod
+    def _onNodesChanged(*args):
+        NodeNameCache.clear()
+        if not NodeNameCache.PENDING and NodeNameCache.SUBSCRIBERS:
+            NodeNameCache.PENDING = True
+            pm.evalDeferred(Callback(NodeNameCache.notify), lowestPriority=True)
+
+    @staticmethod
+    def notify():
+        """ Call nodeNamesChanged on all live subscribers """
+        NodeNameCache.PENDING = False
+        NodeNameCache.SUBSCRIBERS = [ref for ref in NodeNameCache.SUBSCRIBERS if ref() is not None]
+        if not NodeNameCache.SUBSCRIBERS:
+            NodeNameCache.removeCallbacks()
+        for ref in list(NodeNameCache.SUBSCRIBERS):
+            obj = ref()
+            if obj is not None:
+                obj.nodeNamesChanged()
+
+
 class NodeList(ItemList):
+    """
+    An ItemList of PyNodes. Unless a custom encode function is given, node
+    names are looked up by UUID in the NodeNameCache, and the list is refreshed
+    when nodes are renamed or deleted.
+    """
+
     def __init__(self, *args, **kwargs):
         kwargs['sc'] = Callback(self.onSelect)
         kwargs['dcc'] = Callback(self.onDoubleClick)
+        self._nodeUuids = {}
         super(NodeList, self).__init__(*args, **kwargs)
         self.doubleClick = False
         self.selectCommand = None
         self.doubleClickCommand = None
+        NodeNameCache.subscribe(self)
+
+    def getNodeNames(self, nodes, long=False):
+        """ Return the names of the given nodes, resolving them in batch """
+        uuids = []
+        for n in nodes:
+            if n not in self._nodeUuids:
+                self._nodeUuids[n] = NodeNameCache.getUuid(n)
+            uuids.append(self._nodeUuids[n])
+        names = NodeNameCache.getNames(uuids, long=long)
+        result = []
+        for n, name in zip(nodes, names):
+            if name is None:
+                name = n.longName() if long and hasattr(n, 'longName') else str(n)
+            result.append(name)
+        return result
 
-    @property
-    def items(self):
-        return self._items
-    @items.setter
-    def items(self, value):
-        value = asList(value)
-        self._allItems = value
+    def _encodeItems(self, items):
+        if self._customEncode is not None:
+            return super(NodeList, self)._encodeItems(items)
+        if items is self._allItems:
+            # forget the uuids of removed items
+            self._nodeUuids = dict([(n, self._nodeUuids[n]) for n in items if n in self._nodeUuids])
+        return self.getNodeNames(items)
+
+    def nodeNamesChanged(self):
+        """ Called by the NodeNameCache after nodes were renamed or deleted """
+        if not pm.textScrollList(self.control, q=True, ex=True):
+            NodeNameCache.unsubscribe(self)
+            return
+        self._invalidateNames()
         self.update()
 
     def onDoubleClick(self):
@@ -1126,11 +1928,13 @@ class NodeList(ItemList):
         if self.dragCallback is not None and hasattr(self.dragCallback, '__call__'):
             return self.dragCallback(s)
         else:
-            return [n.longName() for n in s]
+            return self.getNodeNames(s, long=True)
 
     def _dropCallback(self, dragCtrlName, dropCtrlName, messages, x, y, dragType):
-        for m in messages:
-            self.append(pm.PyNode(m))
+        # create all nodes in one call and update once
+        nodes = pm.ls(messages)
+        if len(nodes):
+            self.items = list(asList(self._allItems)) + nodes
         if self.dropCallback is not None and hasattr(self.dropCallback, '__call__'):
             self.dropCallback(messages)
 
@@ -1806,6 +2610,82 @@ def show(path):
         subprocess.Popen(['open', path])
 
 
+def scanDir(path, stats=False):
+    """
+    Return a list of (filename, isFile) for each entry in the given directory.
+    Uses scandir when available, which avoids a stat call for each entry.
+
+    `stats` -- if True, return (filename, isFile, size, mtime) for each entry
+    """
+    result = []
+    if scandir is not None:
+        for e in scandir(path):
+            f = os.path.join(path, e.name)
+            isFile = e.is_file()
+            if stats:
+                st = e.stat() if isFile else None
+                result.append((f, isFile, st.st_size if st else 0, st.st_mtime if st else 0))
+            else:
+                result.append((f, isFile))
+        return result
+    for f in [os.path.join(path, f) for f in os.listdir(path)]:
+        isFile = os.path.isfile(f)
+        if stats:
+            st = os.stat(f) if isFile else None
+            result.append((f, isFile, st.st_size if st else 0, st.st_mtime if st else 0))
+        else:
+            result.append((f, isFile))
+    return result
+
+# the state of the directory scan running in the current thread
+_SCAN = threading.local()
+_SCAN_POOL = None
+
+def isFile(filename):
+    """
+    Return True if the given filename is a file, using the
+    results of the current directory scan when available
+    """
+    files = getattr(_SCAN, 'files', None)
+    if files is not None and filename in files:
+        return files[filename]
+    return os.path.isfile(filename)
+
+def isScanCancelled():
+    """ Return True if the directory scan running in the current thread was cancelled """
+    isCancelled = getattr(_SCAN, 'isCancelled', None)
+    return isCancelled is not None and isCancelled()
+
+def getVerticalScrollBar(control):
+    """
+    Return the vertical QScrollBar of the given control, eg. a scrollLayout,
+    or None if it cannot be found or Qt is not available
+    """
+    try:
+        import maya.OpenMayaUI as omui
+        try:
+            from PySide2 import QtCore, QtWidgets
+            from shiboken2 import wrapInstance
+        except ImportError:
+            from PySide import QtCore, QtGui as QtWidgets
+            from shiboken import wrapInstance
+    except ImportError:
+        return None
+    ptr = omui.MQtUtil.findControl(str(control))
+    if ptr is None:
+        return None
+    widget = wrapInstance(int(ptr), QtWidgets.QWidget)
+    for bar in widget.findChildren(QtWidgets.QScrollBar):
+        if bar.orientation() == QtCore.Qt.Vertical:
+            return bar
+
+def getScanPool():
+    """ Return the thread pool used for scanning directories """
+    global _SCAN_POOL
+    if _SCAN_POOL is None:
+        _SCAN_POOL = ThreadPool(LibraryLayout.scanThreads)
+    return _SCAN_POOL
+
 def getSubDirs(path, excludes=None):
     if os.path.isdir(path):
         items = [os.path.join(path, f).replace('\\', '/') for f in os.listdir(path)]
@@ -1835,11 +2715,163 @@ def browse(files=True, existing=True, cap='Choose {item}', okc='Choose', dir=Non
 
 
 
+class LibraryIndex(object):
+    """
+    A cache of the files in library folders, stored as one json file per folder.
+    Each folder records its modification time, the item classes that were used,
+    and the name, size, modification time, item class and index data of each file.
+    A folder's items are only created from the index while its modification time
+    and the item classes are unchanged, otherwise it is scanned again.
+    """
+
+    defaultDir = os.path.join(os.path.expanduser('~'), '.viewGui', 'libraryIndex')
+    # folders modified more recently than this many seconds are not stored,
+    # since a change in the same mtime tick would go unnoticed
+    minAge = 2
+
+    def __init__(self, cacheDir=None):
+        self.cacheDir = cacheDir if cacheDir is not None else self.defaultDir
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<LibraryIndex {0}>'.format(self.cacheDir)
+
+    @staticmethod
+    def getClassKey(cls):
+        return '{0}.{1}'.format(cls.__module__, cls.__name__)
+
+    def getIndexFile(self, path):
+        path = os.path.normpath(path)
+        if not isinstance(path, bytes):
+            path = path.encode('utf-8')
+        key = hashlib.md5(path).hexdigest()
+        return os.path.join(self.cacheDir, '{0}.json'.format(key))
+
+    def load(self, path):
+        """ Return the index record for the given folder, or None if it isn't indexed """
+        with self._lock:
+            if path in self._records:
+                return self._records[path]
+        record = None
+        indexFile = self.getIndexFile(path)
+        if os.path.isfile(indexFile):
+            try:
+                with open(indexFile, 'r') as fp:
+                    record = json.load(fp)
+            except (IOError, OSError, ValueError) as e:
+                LOG.debug('could not read library index {0}: {1}'.format(indexFile, e))
+        with self._lock:
+            self._records[path] = record
+        return record
+
+    def save(self, path, mtime, classes, files):
+        """
+        Store the index record for the given folder.
+
+        `mtime` -- the modification time of the folder when it was scanned
+        `classes` -- the item classes used to create the items
+        `files` -- a list of (name, size, mtime, itemClass, indexData) for each file
+        """
+        if time.time() - mtime < self.minAge:
+            return
+        record = dict(
+            path=path,
+            mtime=mtime,
+            classes=[self.getClassKey(c) for c in classes],
+            files=[(n, sz, mt, self.getClassKey(c) if c else None, d) for n, sz, mt, c, d in files],
+        )
+        with self._lock:
+            self._records[path] = record
+        indexFile = self.getIndexFile(path)
+        tmp = '{0}.{1}.tmp'.format(indexFile, threading.current_thread().ident)
+        try:
+            if not os.path.isdir(self.cacheDir):
+                os.makedirs(self.cacheDir)
+            with open(tmp, 'w') as fp:
+                json.dump(record, fp)
+            if os.path.isfile(indexFile):
+                os.remove(indexFile)
+            os.rename(tmp, indexFile)
+        except (IOError, OSError, ValueError) as e:
+            LOG.debug('could not write library index {0}: {1}'.format(indexFile, e))
+
+    def getItems(self, path, mtime, classes):
+        """
+        Return the items for the given folder from the index,
+        or None if the folder is not indexed or has changed
+        """
+        record = self.load(path)
+        keys = [self.getClassKey(c) for c in classes]
+        if record is None or record.get('mtime') != mtime or record.get('classes') != keys:
+            return None
+        classMap = dict(zip(keys, classes))
+        items = []
+        for name, size, fileMtime, cls, data in record['files']:
+            if cls is None:
+                continue
+            if not isinstance(name, type(path)):
+                # json returns unicode names, keep them as bytes in python 2
+                name = name.encode(sys.getfilesystemencoding() or 'utf-8')
+            item = classMap[cls].fromIndex(os.path.join(path, name), data)
+            if item is not None:
+                items.append(item)
+        return items
+
+    def clear(self, path=None):
+        """ Remove the index of the given folder, or of all folders """
+        with self._lock:
+            if path is None:
+                self._records = {}
+            else:
+                self._records.pop(path, None)
+        files = [self.getIndexFile(path)] if path is not None else []
+        if path is None and os.path.isdir(self.cacheDir):
+            files = [os.path.join(self.cacheDir, f) for f in os.listdir(self.cacheDir) if f.endswith('.json')]
+        for f in files:
+            if os.path.isfile(f):
+                os.remove(f)
+
+
 class LibraryLayout(object):
     """
     Create a layout that shows icon items for files
     within one or more paths.
+
+    When asyncScan is enabled, paths are scanned in a thread pool and their
+    items are added once each path is done, so item classes must be able to
+    validate and create items outside of the main thread. A path's scan is
+    cancelled when it is removed from the paths or scanned again. scanCallback is called with
+    this layout, the path, the number of items found so far and whether the
+    path is done.
+
+    Set index to a LibraryIndex to cache the contents of each path on disk,
+    so that only paths modified since they were last scanned are listed again.
+    Set thumbnails to a ThumbnailCache to show downscaled copies of item icons.
+
+    Items are kept for files that did not change when a path is updated, and
+    updating the content only builds or deletes the widgets of items that
+    changed and attaches moved items again, reusing the section of each path.
+
+    In virtual mode, each section's grid is sized for all of its rows but only
+    the rows within overscanRows of the visible scroll region have widgets.
+    Widgets of rows scrolled out of view are recycled for the rows scrolled
+    into view. Scrolling is tracked with the Qt scroll bar when available,
+    otherwise by checking the scroll position every scrollPollInterval seconds.
     """
+
+    asyncScan = False
+    # number of threads shared by all layouts for scanning paths
+    scanThreads = 4
+    # number of items created between progress updates
+    scanChunkSize = 500
+    # number of rows built above and below the visible region in virtual mode
+    overscanRows = 2
+    scrollPollInterval = 0.25
+    # approximate height of a path title, and the space around sections
+    sectionTitleHeight = 30
+    sectionSpacing = 8
+
     def __init__(self, itemClasses=None, editable=True):
         if itemClasses is None:
             itemClasses = [LibraryIconItem]
@@ -1860,11 +2892,29 @@ class LibraryLayout(object):
         self.deselectCallback = None
         self.renameCallback = None
         self.deleteCallback = None
+        self.scanCallback = None
+        self.index = None
+        self.thumbnails = None
+        self._scanId = 0
+        self._scanning = {}
+        self._column = None
+        self._sections = {}
+        self._sectionOrder = []
+        self._sectionTops = {}
+        self._virtual = False
+        self._scrollWatched = False
+        self._scrollPending = False
+        self._viewRange = None
         self.build()
 
     def __str__(self):
         return str(self.layout)
 
+    @property
+    def scanning(self):
+        """ Return True if any paths are being scanned """
+        return len(self._scanning) > 0
+
     @property
     def paths(self):
         return self._paths
@@ -1902,6 +2952,15 @@ class LibraryLayout(object):
         self._columns = value
         self.updateContent()
 
+    @property
+    def virtual(self):
+        return self._virtual
+    @virtual.setter
+    def virtual(self, value):
+        if self._virtual != value:
+            self._virtual = value
+            self.rebuildContent()
+
     @property
     def multipleSelection(self):
         return self._multipleSelection
@@ -1916,7 +2975,8 @@ class LibraryLayout(object):
     @editable.setter
     def editable(self, value):
         self._editable = value
-        self.update()
+        self.updateItems()
+        self.rebuildContent()
     
     def items(self, path=None):
         """
@@ -1956,25 +3016,42 @@ class LibraryLayout(object):
     
     def buildLibraryContent(self):
         """ Build a path header and item grid for each of the current item lists """
-        with pm.columnLayout(adj=True, rs=8) as col:
-            for p in self.paths:
-                if self.pathFilter is not None:
-                    if not self.pathFilter(p):
-                        continue
-                if self._items.has_key(p):
-                    itms = self._items[p]
-                    if self.itemFilter is not None:
-                        itms = [i for i in itms if self.itemFilter(i)]
-                    self.buildItemLayout(itms, p)
+        self._sections = {}
+        self._sectionOrder = []
+        visible = self.getVisibleItems()
+        self.updateSectionTops(visible)
+        self._viewRange = self.getViewRange() if self.virtual else None
+        with pm.columnLayout(adj=True, rs=self.sectionSpacing) as col:
+            for p, itms in visible:
+                self.buildItemLayout(itms, p)
+        self._column = col
+        if self.virtual:
+            self.watchScroll()
         return col
 
+    def getVisibleItems(self):
+        """
+        Return a list of (path, items) for each path that passes the path filter,
+        including paths that are still being scanned, and the items that pass
+        the item filter
+        """
+        result = []
+        for p in self.paths:
+            if self.pathFilter is not None:
+                if not self.pathFilter(p):
+                    continue
+            if self._items.has_key(p):
+                itms = self._items[p]
+                if self.itemFilter is not None:
+                    itms = [i for i in itms if self.itemFilter(i)]
+            elif p in self._scanning:
+                itms = []
+            else:
+                continue
+            result.append((p, itms))
+        return result
+
     def buildItemLayout(self, items, path=None):
-        rows = []
-        i = 0
-        while i < len(items):
-            end = min(len(items), i+self.columns)
-            rows.append(items[i:end])
-            i = end
         with pm.frameLayout(lv=False, bv=False) as layout:
             if path is not None:
                 with pm.frameLayout(lv=False, bs='out'):
@@ -1983,13 +3060,185 @@ class LibraryLayout(object):
                     t = LibraryPathTitle(path, **kw)
                     t.dropCommand = self.onItemDropped
             with pm.frameLayout(lv=False, bv=False):
-                for row in rows:
-                    with pm.formLayout() as form:
-                        for item in row:
-                            item.build(editable=self.editable)
-                        layoutForm(form, [0] * len(row), spacing=0)
+                grid = pm.formLayout()
+        section = dict(path=path, layout=layout, grid=grid, items=[], attach={})
+        self.updateSection(section, items)
+        if path is not None:
+            self._sections[path] = section
+            self._sectionOrder.append(path)
         return layout
-        
+
+    def updateSection(self, section, items):
+        """
+        Update the grid of the given path section to show the given items.
+        Items are attached to the item before them in their row and the item
+        above them, so only the widgets of added or removed items are built or
+        deleted, and only items whose neighbors changed are attached again.
+        """
+        if self.virtual:
+            self.updateVirtualSection(section, items)
+            return
+        grid = section['grid']
+        wanted = set(items)
+        for item in section['items']:
+            if item not in wanted:
+                self.deleteItemWidget(item)
+        columns = max(int(self.columns), 1)
+        attach = {}
+        af, ac = [], []
+        for i, item in enumerate(items):
+            if item.widget is None:
+                with grid:
+                    item.build(editable=self.editable)
+            left = items[i-1] if i % columns else None
+            top = items[i-columns] if i >= columns else None
+            attach[item] = (left, top)
+            if section['attach'].get(item) == (left, top):
+                continue
+            w = str(item.widget)
+            if left is None:
+                af.append((w, 'left', 0))
+            else:
+                ac.append((w, 'left', 0, str(left.widget)))
+            if top is None:
+                af.append((w, 'top', 0))
+            else:
+                ac.append((w, 'top', 0, str(top.widget)))
+        if len(af) or len(ac):
+            pm.formLayout(grid, e=True, af=af, ac=ac)
+        section['items'] = list(items)
+        section['attach'] = attach
+
+    def updateVirtualSection(self, section, items):
+        """
+        Update the grid of the given path section so that it has the height
+        of all rows, and only the visible rows of items have widgets
+        """
+        grid = section['grid']
+        columns = max(int(self.columns), 1)
+        width, height = self.getCellSize()
+        rowCount = int(math.ceil(len(items) / float(columns)))
+        gridHeight = max(rowCount * height, 1)
+        if section.get('height') != gridHeight:
+            pm.formLayout(grid, e=True, h=gridHeight)
+            section['height'] = gridHeight
+        first, last = self.getVisibleRows(section, height, rowCount)
+        visible = items[first * columns:(last + 1) * columns]
+        wanted = set(visible)
+        released = [i for i in section['items'] if i not in wanted and i.widget is not None]
+        attach = {}
+        af = []
+        for i, item in enumerate(visible, first * columns):
+            if item.widget is None:
+                other = released.pop() if len(released) else None
+                if other is None or not item.recycle(other, editable=self.editable):
+                    if other is not None:
+                        self.deleteItemWidget(other)
+                    with grid:
+                        item.build(editable=self.editable)
+            pos = ((i % columns) * width, (i // columns) * height)
+            attach[item] = pos
+            if section['attach'].get(item) == pos:
+                continue
+            w = str(item.widget)
+            af.extend([(w, 'left', pos[0]), (w, 'top', pos[1])])
+        for item in released:
+            self.deleteItemWidget(item)
+        if len(af):
+            pm.formLayout(grid, e=True, af=af)
+        section['items'] = list(visible)
+        section['attach'] = attach
+
+    def getCellSize(self):
+        """ Return the width and height of each item in the grid """
+        for itms in self._items.values():
+            for i in itms:
+                size = i.getCellSize()
+                if size is not None:
+                    return [max(int(x), 1) for x in size]
+        return [max(int(self.itemSize), 1)] * 2
+
+    def updateSectionTops(self, visible):
+        """ Find the approximate position of the grid of each section in the scroll layout """
+        self._sectionTops = {}
+        if not self.virtual:
+            return
+        columns = max(int(self.columns), 1)
+        height = self.getCellSize()[1]
+        y = self.sectionSpacing
+        for p, itms in visible:
+            y += self.sectionTitleHeight
+            self._sectionTops[p] = y
+            y += int(math.ceil(len(itms) / float(columns))) * height + self.sectionSpacing
+
+    def getViewRange(self):
+        """ Return the top and bottom of the visible region of the scroll layout """
+        value = pm.scrollLayout(self.scrollLayout, q=True, sav=True)
+        height = pm.scrollLayout(self.scrollLayout, q=True, sah=True)
+        top = value[0] if value else 0
+        return top, top + (height or 0)
+
+    def getVisibleRows(self, section, rowHeight, rowCount):
+        """ Return the first and last row of the given section to build """
+        if self._viewRange is None:
+            self._viewRange = self.getViewRange()
+        top, bottom = self._viewRange
+        y = self._sectionTops.get(section['path'], 0)
+        first = int((top - y) // rowHeight) - self.overscanRows
+        last = int((bottom - y) // rowHeight) + self.overscanRows
+        first, last = max(first, 0), min(last, rowCount - 1)
+        # an empty range when the section is out of view
+        return first, max(last, first - 1)
+
+    def watchScroll(self):
+        """ Update the visible rows when the scroll layout is scrolled """
+        if self._scrollWatched:
+            return
+        self._scrollWatched = True
+        bar = getVerticalScrollBar(self.scrollLayout)
+        if bar is not None:
+            bar.valueChanged.connect(self._onScrolled)
+        else:
+            self._deferScrollPoll()
+
+    def _onScrolled(self, *args):
+        if not self._scrollPending:
+            self._scrollPending = True
+            pm.evalDeferred(Callback(self.updateVisibleRows), lowestPriority=True)
+
+    def _deferScrollPoll(self):
+        t = threading.Timer(self.scrollPollInterval, backend.executeDeferred, [Callback(self._pollScroll)])
+        t.daemon = True
+        t.start()
+
+    def _pollScroll(self):
+        if not self.virtual or not pm.scrollLayout(self.scrollLayout, q=True, ex=True):
+            self._scrollWatched = False
+            return
+        if self.getViewRange() != self._viewRange:
+            self.updateVisibleRows()
+        self._deferScrollPoll()
+
+    def updateVisibleRows(self):
+        """ Build the widgets for the rows that are now visible in virtual mode """
+        self._scrollPending = False
+        if self.virtual and pm.scrollLayout(self.scrollLayout, q=True, ex=True):
+            self.updateContent()
+
+    def deleteSection(self, path):
+        """ Delete the section of the given path and the widgets of its items """
+        section = self._sections.pop(path, None)
+        if section is None:
+            return
+        for item in section['items']:
+            item.clearBuild()
+        pm.deleteUI(section['layout'])
+
+    def deleteItemWidget(self, item):
+        if item.widget is not None:
+            pm.deleteUI(item.widget)
+        item.clearBuild()
+
     def update(self, path=None):
         """ Update the library to reflect the current paths and their items """
         self.updateItems(path)
@@ -1999,10 +3248,39 @@ class LibraryLayout(object):
         for itms in self.items().values():
             for i in itms:
                 i.size = self.itemSize
+        if self.virtual:
+            self.updateContent()
 
     def updateContent(self):
-        """ Update the content of the library to reflect the current items and filters """
+        """
+        Update the content of the library to reflect the current items and filters.
+        The content is only rebuilt when the order of the path sections changed.
+        """
+        visible = self.getVisibleItems()
+        paths = [p for p, itms in visible]
+        kept = [p for p in self._sectionOrder if p in paths]
+        self._viewRange = self.getViewRange() if self.virtual else None
+        if self._column is None or paths[:len(kept)] != kept or not pm.columnLayout(self._column, q=True, ex=True):
+            self.rebuildContent()
+            return
+        for p in self._sectionOrder:
+            if p not in paths:
+                self.deleteSection(p)
+        self._sectionOrder = kept
+        self.updateSectionTops(visible)
+        with self._column:
+            for p, itms in visible:
+                if p in self._sections:
+                    self.updateSection(self._sections[p], itms)
+                else:
+                    self.buildItemLayout(itms, p)
+
+    def rebuildContent(self):
+        """ Clear and rebuild the content of the library """
         self.contentLayout.clear()
+        for section in self._sections.values():
+            for i in section['items']:
+                i.clearBuild()
         for i in self.allItems():
             i.clearBuild()
         with self.contentLayout:
@@ -2016,7 +3294,7 @@ class LibraryLayout(object):
         toupdate = []
         # determine paths to update
         if path is not None:
-            if path not in paths:
+            if path not in self.paths:
                 return
             toupdate = [path]
         else:
@@ -2025,12 +3303,87 @@ class LibraryLayout(object):
         for k in self._items.keys():
             if k not in self.paths:
                 del self._items[k]
+        self.cancelScan([p for p in self._scanning if p not in self.paths])
+        if self.asyncScan:
+            self.scanPaths(toupdate)
+            return
+        self.cancelScan(toupdate)
         # update
         for p in toupdate:
-            items = self.getItemsForPath(p)
-            for i in items:
-                self.setupItem(i)
-            self._items[p] = items
+            self.setPathItems(p, self.getItemsForPath(p))
+
+    def setPathItems(self, path, items):
+        """
+        Set the items for the given path, keeping the current
+        items of files whose class and index data did not change
+        """
+        current = dict([(i.filename, i) for i in self._items.get(path, [])])
+        result = []
+        for item in items:
+            prev = current.get(item.filename)
+            if prev is not None and type(prev) is type(item) and prev.getIndexData() == item.getIndexData():
+                item = prev
+            else:
+                self.setupItem(item)
+            result.append(item)
+        self._items[path] = result
+
+    def scanPaths(self, paths):
+        """
+        Scan the given paths in the background, cancelling any current
+        scans of the same paths, and update the items of each path when it is done
+        """
+        pool = getScanPool()
+        for p in paths:
+            self._scanId += 1
+            self._scanning[p] = self._scanId
+            pool.apply_async(self._scanPath, (self._scanId, p))
+
+    def cancelScan(self, paths=None):
+        """ Cancel the current scans of the given paths, or of all paths """
+        if paths is None:
+            self._scanning = {}
+        else:
+            for p in paths:
+                self._scanning.pop(p, None)
+
+    def isScanCurrent(self, scanId, path):
+        """ Return True if the given scan of a path has not been cancelled or replaced """
+        return self._scanning.get(path) == scanId
+
+    def _scanPath(self, scanId, path):
+        """ Return the items for the given path. Runs in a scan thread """
+        if not self.isScanCurrent(scanId, path):
+            return
+        _SCAN.isCancelled = lambda: not self.isScanCurrent(scanId, path)
+        _SCAN.progress = lambda count: backend.executeDeferred(self._onScanProgress, scanId, path, count)
+        try:
+            items = self.getItemsForPath(path)
+        except Exception as e:
+            LOG.warning('could not scan {0}: {1}'.format(path, e))
+            items = []
+        finally:
+            _SCAN.isCancelled = None
+            _SCAN.progress = None
+        if self.isScanCurrent(scanId, path):
+            backend.executeDeferred(self._onPathScanned, scanId, path, items)
+
+    def _onScanProgress(self, scanId, path, count):
+        if self.isScanCurrent(scanId, path) and self.scanCallback is not None:
+            self.scanCallback(self, path, count, False)
+
+    def _onPathScanned(self, scanId, path, items):
+        """ Add the scanned items for the given path. Runs in the main thread """
+        if not self.isScanCurrent(scanId, path) or path not in self.paths:
+            return
+        del self._scanning[path]
+        if not pm.scrollLayout(self.scrollLayout, q=True, ex=True):
+            self.cancelScan()
+            return
+        self.setPathItems(path, items)
+        self.updateContent()
+        if self.scanCallback is not None:
+            self.scanCallback(self, path, len(items), True)
 
     def updateItemSelection(self, keep=None):
         """ Update item selection based on the multipleSelection property """
@@ -2050,15 +3403,39 @@ class LibraryLayout(object):
         # TODO: setup a regex:class map for associating files with item classes
         # TODO: add a filter regex to skip certain files, eg. .DS_Store, Thumbs.db, .*
         items = []
-        if os.path.isdir(path):
-            files = [os.path.join(path, f) for f in os.listdir(path)]
-            files = self.sortFiles(files)
+        if not os.path.isdir(path):
+            return items
+        mtime = os.stat(path).st_mtime
+        if self.index is not None:
+            indexed = self.index.getItems(path, mtime, self.itemClasses)
+            if indexed is not None:
+                return indexed
+        entries = scanDir(path, stats=self.index is not None)
+        _SCAN.files = dict([(e[0], e[1]) for e in entries])
+        stats = dict([(e[0], e[2:]) for e in entries])
+        progress = getattr(_SCAN, 'progress', None)
+        records = []
+        try:
+            files = self.sortFiles(_SCAN.files.keys())
             for f in files:
+                if isScanCancelled():
+                    return []
+                item, itemClass = None, None
                 for c in self.itemClasses:
                     item = c.fromFile(f)
                     if item is not None:
+                        itemClass = c
                         items.append(item)
+                        if progress is not None and len(items) % self.scanChunkSize == 0:
+                            progress(len(items))
                         break
+                if self.index is not None:
+                    data = item.getIndexData() if item is not None else None
+                    records.append((os.path.basename(f),) + stats[f] + (itemClass, data))
+        finally:
+            _SCAN.files = None
+        if self.index is not None:
+            self.index.save(path, mtime, self.itemClasses, records)
         return items
 
     def sortFiles(self, files):
@@ -2186,13 +3563,23 @@ class LibraryItem(object):
         if cls.validate(filename):
             return cls(filename)
 
+    @classmethod
+    def fromIndex(cls, filename, data):
+        """
+        Return a new LibraryItem for the given filename using the data
+        from a LibraryIndex. The file has already been validated.
+        """
+        item = cls(filename)
+        item.setIndexData(data)
+        return item
+
     @classmethod
     def validate(cls, filename):
         """
         Validate that the given filename can be used for this item class.
         Override this in subclasses to only create items from certain files.
         """
-        return os.path.isfile(filename)
+        return isFile(filename)
 
     def __init__(self, filename=None):
         self.itemName = 'file'
@@ -2213,6 +3600,26 @@ class LibraryItem(object):
         """ Clear all stored ui items """
         self.button = None
 
+    @property
+    def widget(self):
+        """
+        Return the top level control of this item, or None if it isn't built.
+        Override when build creates a layout for the item.
+        """
+        return self.button
+
+    def getCellSize(self):
+        """ Return the width and height of this item in a grid, or None if unknown """
+        return None
+
+    def recycle(self, other, editable=True):
+        """
+        Take the built widgets of another item and update them to represent this
+        item. Return False if the widgets could not be used, eg. if the other
+        item is a different class. Override to support recycling in virtual grids.
+        """
+        return False
+
     @property
     def filename(self):
         return self._filename
@@ -2266,6 +3673,17 @@ class LibraryItem(object):
         pm.menuItem(l='Rename', rp='N', c=Callback(self.rename))
         pm.menuItem(l='Delete', rp='S', c=Callback(self.delete))
 
+    def getIndexData(self):
+        """
+        Return a dict of data to store in a LibraryIndex for this item.
+        Override to cache information that is expensive to find from the file.
+        """
+        return {}
+
+    def setIndexData(self, data):
+        """ Restore the data returned by getIndexData """
+        pass
+
     def onFilenameChanged(self):
         if self.button is not None:
             self.button.setLabel(self.name)
@@ -2448,19 +3866,64 @@ class LibraryIconItem(LibraryItem):
         self._showLabel = showLabel
         self._size = size
         self._labelHeight = labelHeight
+        self._hasIcon = None
+        self.thumbnails = None
         self.defaultIcon = DEFAULT_ICON
 
     def clearBuild(self):
         self.button = None
         self.label = None
         self.layout = None
+        self.menu = None
+        self._builtEditable = None
+
+    @property
+    def widget(self):
+        return self.layout
 
     @property
     def icon(self):
-        if self.iconFilename is not None and os.path.isfile(self.iconFilename):
+        if self.hasIcon:
             return self.iconFilename
         return self.defaultIcon
 
+    def getIconImage(self):
+        """
+        Return the image to show for this item, which is a thumbnail of the icon
+        for the current size when a ThumbnailCache is used. The default icon is
+        shown until the thumbnail is created. Thumbnails are not cached per item,
+        so a modified icon gets a new thumbnail from the ThumbnailCache.
+        """
+        if not self.hasIcon:
+            return self.defaultIcon
+        if self.thumbnails is None:
+            return self.iconFilename
+        bucket = self.thumbnails.getBucket(self.size)
+        thumb = self.thumbnails.getThumbnail(self.iconFilename, self.size, CallbackWithArgs(self.onThumbnailCreated, self.iconFilename, bucket))
+        if thumb is None:
+            return self.defaultIcon
+        return thumb
+
+    def onThumbnailCreated(self, icon, bucket, filename):
+        if icon != self.iconFilename:
+            return
+        if self.button is not None and self.thumbnails.getBucket(self.size) == bucket:
+            pm.iconTextCheckBox(self.button, e=True, i=filename)
+
+    @property
+    def hasIcon(self):
+        """ Return True if the icon file exists. Only checked once per filename """
+        if self._hasIcon is None:
+            self._hasIcon = self.iconFilename is not None and isFile(self.iconFilename)
+        return self._hasIcon
+
+    def getIndexData(self):
+        return dict(icon=self.hasIcon)
+
+    def setIndexData(self, data):
+        if data and 'icon' in data:
+            self._hasIcon = data['icon']
+
     @property
     def iconFilename(self):
         if self.filename is not None:
@@ -2469,7 +3932,7 @@ class LibraryIconItem(LibraryItem):
     def build(self, editable=True):
         with pm.formLayout(w=self.size, h=self.size + self.labelHeight) as form:
             kw = dict(
-                i=self.icon,
+                i=self.getIconImage(),
                 cc=Callback(self.onClick),
                 w=self.size, h=self.size,
                 v=self.selected,
@@ -2485,16 +3948,42 @@ class LibraryIconItem(LibraryItem):
                 m=self.showLabel,
             )
             if editable:
-                pm.popupMenu(p=self.button, mm=True)
+                self.menu = pm.popupMenu(p=self.button, mm=True)
                 self.buildMenu()
             layoutForm(form, (0, 0), vertical=True)
         self.layout = form
+        self._builtEditable = editable
+
+    def getCellSize(self):
+        return (self.size, self.size + self.labelHeight)
+
+    def recycle(self, other, editable=True):
+        if type(other) is not type(self) or other.layout is None or other._builtEditable != editable:
+            return False
+        self.layout, self.button, self.label, self.menu = other.layout, other.button, other.label, other.menu
+        self._builtEditable = editable
+        otherSize = other.size
+        other.clearBuild()
+        kw = dict(i=self.getIconImage(), v=self.selected, ann=self.filename, cc=Callback(self.onClick))
+        if editable:
+            kw['dgc'] = self._dragCallback
+        pm.iconTextCheckBox(self.button, e=True, **kw)
+        pm.text(self.label, e=True, l=self.name, m=self.showLabel)
+        if self.menu is not None:
+            pm.popupMenu(self.menu, e=True, deleteAllItems=True)
+            pm.setParent(self.menu, menu=True)
+            self.buildMenu()
+        if otherSize != self.size:
+            self.size = self.size
+        return True
 
     def setup(self, lib):
         super(LibraryIconItem, self).setup(lib)
+        self.thumbnails = getattr(lib, 'thumbnails', None)
         self.size = lib.itemSize
 
     def onFilenameChanged(self):
+        self._hasIcon = None
         if self.label is not None:
             self.label.setLabel(self.name)
             self.button.setAnnotation(self.filename)
@@ -2529,8 +4018,11 @@ class LibraryIconItem(LibraryItem):
         return self._size
     @size.setter
     def size(self, value):
+        prev = self._size
         self._size = value
         if self.layout is not None:
+            if self.thumbnails is not None and self.thumbnails.getBucket(prev) != self.thumbnails.getBucket(value):
+                pm.iconTextCheckBox(self.button, e=True, i=self.getIconImage())
             self.button.setWidth(value)
             self.button.setHeight(value)
             self.layout.setWidth(value)
@@ -7,7 +7,7 @@ Created by Bohdon Sayre on 2010-01-01.
 Copyright (c) 2012 Bohdon Sayre. All rights reserved.
 """
 
-import pymel.core as pm
+from backend import pm
 import logging
 import os
 import utils
@@ -16,6 +16,7 @@ from utils import Callback
 __all__ = [
     'View',
     'IconCaptureView',
+    'ViewStatsView',
 ]
 
 class View(object):
@@ -34,12 +35,29 @@ class View(object):
     attributes, though the Gui can choose to ignore these.  The gui will
     also remember and restore the last size of the window when it was
     visible if rememberMetrics is set to True.
+    
+    Persistent views can set prebuild to True to be created during idle
+    time before they are first shown, if the gui has prebuilding enabled.
+    Views with a higher prebuildPriority are built first.
+    
+    Event handlers such as onSelectionChange are called once per idle cycle
+    no matter how many times the event fired. Handlers with a `count`
+    argument receive the number of events that were collapsed.
+    
+    Hidden views only receive events if trackHiddenEvents is True, in which
+    case the events are recorded and sent to onCatchUp when next shown.
+    
+    When the gui's profileViews is enabled, it times build, buildHeader and
+    buildBody along with creating, showing and hiding the view, see Gui.viewStats.
     """
     
     displayName = None
     rememberMetrics = False
     metrics = None
     persistent = True
+    prebuild = False
+    prebuildPriority = 0
+    trackHiddenEvents = False
     onSelectionChange = None
     onSceneChange = None
     onUndo = None
@@ -61,6 +79,7 @@ class View(object):
         self.showView = gui.showView
         self.viewName = self.__class__.__name__
         self.log = logging.getLogger('viewGui.view.{0}'.format(self.viewName))
+        self._dirtyEvents = {}
     
     def __del__(self):
         self.log.debug('destroyed')
@@ -79,6 +98,16 @@ class View(object):
         if self.exists:
             self._layout.setManage(value)
     
+    def controlCount(self, allControls):
+        """
+        Return an estimate of the number of controls in this view
+        given a list of all long control names, eg. from lsUI.
+        """
+        if self._layout is None:
+            return 0
+        prefix = '{0}|'.format(self._layout)
+        return len([c for c in allControls if c.startswith(prefix)])
+    
     def destroy(self):
         """ Delete the layout of this view"""
         try:
@@ -89,7 +118,7 @@ class View(object):
     def create(self):
         self.log.debug('building')
         with pm.formLayout() as self._layout:
-            self.build()
+            self.timed('build', self.build)
         self.hide()
     
     def hide(self):
@@ -98,20 +127,68 @@ class View(object):
     
     def show(self):
         self.visible = True
+        self.catchUp()
         self.onShow()
     
+    def timed(self, key, fnc, *args):
+        """ Call fnc and record how long it took in the gui's stats for this view """
+        timeView = getattr(self.gui, 'timeView', None)
+        if timeView is None:
+            return fnc(*args)
+        return timeView(self.viewName, key, fnc, *args)
+    
     def onHide(self):
         pass
     
     def onShow(self):
         pass
+    
+    @property
+    def isDirty(self):
+        """ Return True if any events occurred while this view was hidden """
+        return len(self._dirtyEvents) > 0
+    
+    def hasEventHandler(self, event):
+        return hasattr(getattr(self, event, None), '__call__')
+    
+    def handleEvent(self, event, count=1):
+        """
+        Call the handler for the given event. Handlers that have a `count`
+        argument receive the number of events that were collapsed into this call.
+        """
+        fnc = getattr(self, event, None)
+        if hasattr(fnc, '__call__'):
+            if utils.acceptsKeyword(fnc, 'count'):
+                fnc(count=count)
+            else:
+                fnc()
+    
+    def markDirty(self, event, count=1):
+        """ Record that the given event occurred while this view was hidden """
+        self._dirtyEvents[event] = self._dirtyEvents.get(event, 0) + count
+    
+    def catchUp(self):
+        """ Send all events that occurred while hidden to onCatchUp """
+        if self.isDirty:
+            events = self._dirtyEvents
+            self._dirtyEvents = {}
+            self.onCatchUp(events)
+    
+    def onCatchUp(self, events):
+        """
+        Called when the view is shown after events occurred while it was hidden.
+        `events` is a dict of {event: count}. Calls each event handler once
+        by default, override to refresh only what is needed instead.
+        """
+        for event, count in sorted(events.items()):
+            self.handleEvent(event, count)
 
     def build(self):
         """ Build the main header and body for this view. """
         with pm.frameLayout('%sHeadFrame' % self.viewName, mw=self._headMargins[0], mh=self._headMargins[1], lv=False, bv=False) as self._headFrame:
-            self.buildHeader()
+            self.timed('buildHeader', self.buildHeader)
         with pm.frameLayout('%sFrame' % self.viewName, mw=self._bodyMargins[0], mh=self._bodyMargins[1], lv=False, bv=False) as self._bodyFrame:
-            self.buildBody()
+            self.timed('buildBody', self.buildBody)
         utils.layoutForm(self._layout, (0, 1), spacing=2, vertical=True)
     
     def buildHeader(self):
@@ -189,6 +266,50 @@ class View(object):
 
 
 
+class ViewStatsView(View):
+    """
+    Debug view that lists the slowest views and event handlers of the gui.
+    Add it to the gui's view classes and enable the gui's profileViews
+    to inspect the gui's view stats.
+    """
+    displayName = 'View Stats'
+    persistent = True
+    limit = 20
+    
+    def buildBody(self):
+        with pm.formLayout() as form:
+            pm.text(l='Slowest Views', al='left', fn='boldLabelFont')
+            self.viewList = utils.ItemList(encode=self.encodeView)
+            pm.text(l='Slowest Handlers', al='left', fn='boldLabelFont')
+            self.handlerList = utils.ItemList(encode=self.encodeHandler)
+            pm.button(l='Refresh', c=Callback(self.refresh))
+            utils.layoutForm(form, (0, 1, 0, 1, 0), vertical=True)
+    
+    def onShow(self):
+        self.refresh()
+    
+    def refresh(self):
+        self.viewList.items = self.gui.slowestViews(self.limit)
+        self.handlerList.items = self.gui.slowestHandlers(self.limit)
+    
+    def formatTime(self, stats):
+        return '{0:.1f}ms avg, {1:.1f}ms max, {2} calls'.format(stats.mean * 1000, stats.max * 1000, stats.calls)
+    
+    def encodeView(self, item):
+        viewName, stats = item
+        parts = ['{0}: create {1}'.format(viewName, self.formatTime(stats))]
+        show = self.gui.viewStats(viewName).get('show')
+        if show is not None:
+            parts.append('show {0:.1f}ms avg'.format(show.mean * 1000))
+        return ' | '.join(parts)
+    
+    def encodeHandler(self, item):
+        viewName, event, stats = item
+        return '{0}.{1}: {2}'.format(viewName, event, self.formatTime(stats))
+
+
+
+
 class IconCaptureView(View):
     @property
     def iconSize(self):